@@ -152,6 +152,19 @@ SESSION_COOKIE_AGE = 10800  # 以秒為單位
 # 這樣才能實現「不活躍超過 X 秒」的邏輯
 SESSION_SAVE_EVERY_REQUEST = True
 
+# 每次搜尋的爬取時間預算（秒），新聞與貼文共用；None 表示不限時
+# 超過預算的來源只會使用已抓到的部分，並記錄在 AnalysisResult.partial_sources
+CRAWL_TIME_BUDGET = None
+
+# 啟動時預先載入 jieba / SnowNLP 模型（可先執行 python -m analyzer.nlp_warmup 建立快取）
+NLP_WARMUP = True
+
+# 伺服器啟動時即在背景爬取 PTT 熱門文章快照，第一個搜尋不必等待冷啟動
+PTT_SNAPSHOT_AT_STARTUP = True
+
+# 伺服器啟動時即在背景啟動並登入 Threads 瀏覽器（需要 Chrome 與 Threads 帳號）
+THREADS_BROWSER_AT_STARTUP = True
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,137 @@
+# 直接對 News / Posts 原始資料表做 GROUP BY 的統計函式庫，本身不接在任何頁面上。
+# 頁面的歷史圖表讀的是 SentimentRollup（rollups.py）；rollups 的 rebuild_rollups 以 filtered_rows 重新彙總，
+# 其餘函式是可信的對照查詢：在 manage.py shell 做臨時分析、檢查彙總表是否與原始資料一致時使用。
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import News, Posts
+
+# 資料庫的情緒標籤 → sentiment_feq 使用的鍵
+SENTIMENT_KEYS = {'正面': 'positive', '中立': 'neutral', '負面': 'negative'}
+
+
+def last_days(days, today=None):
+    """
+    最近 days 天（含今天）的日期範圍，回傳 (start, end)。
+    """
+    today = today or timezone.localdate()
+    return today - timedelta(days=days - 1), today
+
+
+def _as_aware(value):
+    if timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def filtered_rows(model, keyword=None, start=None, end=None, sources=None):
+    """
+    依條件篩選 News / Posts 的 QuerySet（不會載入資料）。
+    :param keyword: 主題關鍵字，None 表示不限
+    :param start: 起始日（date 或 datetime，含）
+    :param end: 結束日（date 含當天整天；datetime 則為精確時間點，含）
+    :param sources: 來源名稱列表，None 表示不限
+    """
+    rows = model.objects.all()
+    if keyword is not None:
+        rows = rows.filter(keyword=keyword)
+    if sources is not None:
+        rows = rows.filter(source__in=list(sources))
+    if start is not None:
+        if not isinstance(start, datetime):
+            start = datetime.combine(start, time.min)
+        rows = rows.filter(publish_date__gte=_as_aware(start))
+    if end is not None:
+        if isinstance(end, datetime):
+            rows = rows.filter(publish_date__lte=_as_aware(end))
+        else:
+            rows = rows.filter(publish_date__lt=_as_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    return rows
+
+
+def sentiment_counts(model, **filters):
+    """
+    以 GROUP BY 計算情緒分類數量，格式與 utils.count_sentiment 相同：{'正面': n, '負面': n, '中立': n}。
+    """
+    counts = {'正面': 0, '負面': 0, '中立': 0}
+    rows = filtered_rows(model, **filters).values('sentiment').annotate(n=Count('id')).order_by()
+    for row in rows:
+        if row['sentiment'] in counts:
+            counts[row['sentiment']] = row['n']
+    return counts
+
+
+def sentiment_matrix(model, column, **filters):
+    """
+    依欄位（News 的 category、News / Posts 的 source）分組的情緒數量，
+    格式與 utils.sentiment_feq 相同：{欄位值: {'positive': n, 'neutral': n, 'negative': n}}。
+    """
+    matrix = {}
+    rows = filtered_rows(model, **filters).values(column, 'sentiment').annotate(n=Count('id')).order_by()
+    for row in rows:
+        key = SENTIMENT_KEYS.get(row['sentiment'])
+        if key is None:
+            continue
+        cell = matrix.setdefault(row[column], {'positive': 0, 'neutral': 0, 'negative': 0})
+        cell[key] += row['n']
+    return matrix
+
+
+def daily_trend(model, **filters):
+    """
+    每日文章數（依發布日期，以目前時區切日），格式與 utils.news_post_counter 相同：(日期字串列表, 數量列表)。
+    """
+    rows = (filtered_rows(model, **filters)
+            .annotate(day=TruncDate('publish_date', tzinfo=timezone.get_current_timezone()))
+            .values('day').annotate(n=Count('id')).order_by('day'))
+    trend_labels, trend_values = [], []
+    for row in rows:
+        trend_labels.append(row['day'].strftime('%Y-%m-%d'))
+        trend_values.append(row['n'])
+    return trend_labels, trend_values
+
+
+def daily_sentiment_trend(model, **filters):
+    """
+    每日各情緒的文章數：{日期字串: {'positive': n, 'neutral': n, 'negative': n}}，依日期排序。
+    """
+    trend = {}
+    rows = (filtered_rows(model, **filters)
+            .annotate(day=TruncDate('publish_date', tzinfo=timezone.get_current_timezone()))
+            .values('day', 'sentiment').annotate(n=Count('id')).order_by('day'))
+    for row in rows:
+        key = SENTIMENT_KEYS.get(row['sentiment'])
+        if key is None:
+            continue
+        cell = trend.setdefault(row['day'].strftime('%Y-%m-%d'), {'positive': 0, 'neutral': 0, 'negative': 0})
+        cell[key] += row['n']
+    return trend
+
+
+def keyword_history(keyword, start=None, end=None):
+    """
+    某關鍵字在資料庫中累積的新聞與貼文統計，全部由資料庫彙總，不會把文章載入 Python。
+    :return: dict，欄位命名與 news_work / posts_work 的分析結果相同
+    """
+    filters = {'keyword': keyword, 'start': start, 'end': end}
+    news_count = sentiment_counts(News, **filters)
+    post_count = sentiment_counts(Posts, **filters)
+    trend_labels, trend_values = daily_trend(News, **filters)
+    post_trend_labels, post_trend_values = daily_trend(Posts, **filters)
+    return {
+        'positive_count': news_count['正面'],
+        'negative_count': news_count['負面'],
+        'neutral_count': news_count['中立'],
+        'cate_count': sentiment_matrix(News, 'category', **filters),
+        'trend_labels': trend_labels,
+        'trend_values': trend_values,
+        'pos_count': post_count['正面'],
+        'neg_count': post_count['負面'],
+        'neu_count': post_count['中立'],
+        'sour_count': sentiment_matrix(Posts, 'source', **filters),
+        'post_trend_labels': post_trend_labels,
+        'post_trend_values': post_trend_values,
+    }
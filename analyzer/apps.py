@@ -1,5 +1,36 @@
 from django.apps import AppConfig
+from django.conf import settings
 import os
+import sys
+import time
+
+
+# 已載入這些模組即表示由對應的 WSGI / ASGI 伺服器啟動
+SERVER_MODULES = ('gunicorn.app.base', 'uvicorn.server', 'daphne.server', 'hypercorn.run')
+
+
+def _is_server_process():
+    """
+    是否為實際處理請求的行程：runserver 自動重載的子行程（RUN_MAIN=true），
+    或由 gunicorn / uvicorn / daphne / hypercorn 載入。
+    pytest、django-admin、manage.py 的其他指令、celery 與 notebook 都不是，不做預先載入。
+    ANALYZER_SERVER=1 可強制視為伺服器行程（其他伺服器使用）。
+    """
+    if os.environ.get('RUN_MAIN', None) == 'true' or os.environ.get('ANALYZER_SERVER') == '1':
+        return True
+    return any(name in sys.modules for name in SERVER_MODULES)
+
+
+def _start_in_workers(start):
+    """
+    啟動背景執行緒類的資源。gunicorn 可能以 --preload 在 master 載入應用程式後才 fork 出 worker，
+    執行緒不會跟著 fork，因此在 gunicorn 下改為在每個 fork 出的 worker 內啟動；
+    未使用 --preload 時 worker 不會再 fork，由第一個請求按需啟動。其他伺服器立即啟動。
+    """
+    if 'gunicorn.app.base' in sys.modules and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=start)
+    else:
+        start()
 
 class AnalyzerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -10,9 +41,13 @@ class AnalyzerConfig(AppConfig):
         當應用程式準備好時，執行此函式。
         在這裡預先載入 Embedding 模型，以避免 Web 請求時的延遲。
         """
+        # News / Posts 儲存時同步更新每日情緒彙總表（每個行程都需要連接）
+        from .rollups import connect_signals
+        connect_signals()
+
         # 確保這段程式碼只在主進程中執行，避免在多線程或多進程環境中重複執行
         # 'RUN_MAIN' 環境變數在 Django 啟動時的子進程中會被設定為 'true'
-        if os.environ.get('RUN_MAIN', None) != 'true':
+        if not _is_server_process():
             return
         
         print("📢 Django 應用程式啟動中...")
@@ -29,5 +64,48 @@ class AnalyzerConfig(AppConfig):
         except Exception as e:
             print(f"❌ SentenceTransformer 模型載入失敗：{e}")
             print("請確認已安裝 'sentence-transformers' 套件，並檢查網路連線。")
-        
-        
\ No newline at end of file
+
+        if getattr(settings, 'NLP_WARMUP', True):
+            self._warm_up_nlp()
+
+        if getattr(settings, 'PTT_SNAPSHOT_AT_STARTUP', True):
+            _start_in_workers(self._start_ptt_refresher)
+
+        if getattr(settings, 'THREADS_BROWSER_AT_STARTUP', True):
+            _start_in_workers(self._warm_threads_browsers)
+
+    def _warm_up_nlp(self):
+        """
+        預先載入 jieba 與 SnowNLP 模型（讀取 .crawler_cache/nlp 下預先建好的快取）。
+        gunicorn --preload 時在 master 行程執行，之後 fork 出的 worker 以 copy-on-write 共用。
+        """
+        start = time.perf_counter()
+        try:
+            from .nlp_warmup import warm_up
+            warm_up(freeze=True)
+        except Exception as e:
+            print(f"❌ NLP 模型預熱失敗：{e}")
+            return
+        print(f"⏱️ 啟動預熱耗時 {time.perf_counter() - start:.2f} 秒")
+
+    def _start_ptt_refresher(self):
+        """
+        啟動 PTT 熱門文章快照的背景更新執行緒（啟動後立即爬取第一份快照）。
+        """
+        try:
+            from .ptt_crawler import start_ptt_snapshot_refresher
+            start_ptt_snapshot_refresher()
+            print("📸 PTT 快照背景更新已啟動")
+        except Exception as e:
+            print(f"❌ PTT 快照背景更新啟動失敗：{e}")
+
+    def _warm_threads_browsers(self):
+        """
+        建立 Threads 瀏覽器池，並在背景預先啟動、登入 BROWSER_WARM_SIZE 個瀏覽器。
+        """
+        try:
+            from .threads_crawler import get_threads_browser_pool
+            get_threads_browser_pool()
+            print("🌐 Threads 瀏覽器池預熱中（背景）")
+        except Exception as e:
+            print(f"❌ Threads 瀏覽器池建立失敗：{e}")
@@ -0,0 +1,207 @@
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from .sentiment import NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD, get_sentiment_service, sentiment_text
+
+# ========= 可依需求修改的參數 =========
+BENCHMARK_POSTS = 10000     # 基準測試的合成貼文數
+
+# 情緒代碼：0 負面、1 中立、2 正面（bincount 的欄位順序）
+SENTIMENT_LABELS = ('負面', '中立', '正面')
+
+
+class ArticleBatch:
+    """
+    一批文章的欄狀（columnar）表示：每個欄位一個 list 或 NumPy 陣列，統計一律以向量運算完成。
+    原本的文章 dict 仍保留在 rows（不複製），情緒結果以 write_back() 寫回，
+    儲存（_batch_save_news / _batch_save_posts）與頁面顯示照舊使用 dict。
+    """
+    __slots__ = ('rows', 'url_key', 'sources', 'categories', 'days', 'scores', 'codes')
+
+    def __init__(self, rows, url_key='news_url'):
+        # 標題、摘要與網址只在計分時用到一次，直接從 rows 讀取，不另外保留整欄的 list
+        self.rows = rows
+        self.url_key = url_key
+        self.sources = np.array([row.get('source') or '' for row in rows], dtype=object)
+        self.categories = np.array([row.get('category') or '' for row in rows], dtype=object)
+        self.days = np.array([row.get('date') or '' for row in rows], dtype=str)  # 'YYYY-MM-DD'，沒有日期為空字串
+        self.scores = np.full(len(rows), np.nan)
+        self.codes = np.ones(len(rows), dtype=np.int8)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # ----- 情緒 -----
+    def sentiment_texts(self):
+        return [sentiment_text(row) for row in self.rows]
+
+    def urls(self):
+        return [row.get(self.url_key) for row in self.rows]
+
+    def set_scores(self, scores):
+        """
+        設定情緒分數並以門檻一次換算成情緒代碼（與 sentiment.sentiment_label 相同的切法）。
+        """
+        self.scores = np.asarray(scores, dtype=np.float64)
+        codes = np.ones(len(self.scores), dtype=np.int8)
+        codes[self.scores <= NEGATIVE_THRESHOLD] = 0
+        codes[self.scores >= POSITIVE_THRESHOLD] = 2
+        self.codes = codes
+        return self
+
+    def score_sentiment(self, service=None):
+        """
+        透過 SentimentService 批次取得分數（同樣走快取），並寫回文章 dict。
+        """
+        service = service or get_sentiment_service()
+        self.set_scores(service.score_texts(self.sentiment_texts(), self.urls()))
+        service.print_stats()
+        return self.write_back()
+
+    def write_back(self):
+        """
+        把 sentiment_score / sentiment 寫回原本的文章 dict，回傳 rows。
+        """
+        for row, score, code in zip(self.rows, self.scores.tolist(), self.codes.tolist()):
+            row['sentiment_score'] = score
+            row['sentiment'] = SENTIMENT_LABELS[code]
+        return self.rows
+
+    # ----- 統計（與 utils 的 dict 版函式輸出格式相同） -----
+    def sentiment_counts(self):
+        """
+        同 utils.count_sentiment：{'正面': n, '負面': n, '中立': n}。
+        """
+        counts = np.bincount(self.codes, minlength=3).tolist()
+        return {'正面': counts[2], '負面': counts[0], '中立': counts[1]}
+
+    def sentiment_matrix(self, column):
+        """
+        同 utils.sentiment_feq：{欄位值: {'positive': n, 'neutral': n, 'negative': n}}，column 為 'source' 或 'category'。
+        欄位值依第一次出現的順序排列（與 sentiment_feq 相同，圖表的 X 軸順序不變）。
+        """
+        values = self.sources if column == 'source' else self.categories
+        if not len(values):
+            return {}
+        keys, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+        counts = np.bincount(inverse.ravel() * 3 + self.codes, minlength=len(keys) * 3).reshape(-1, 3)
+        order = np.argsort(first)
+        return {
+            key: {'positive': row[2], 'neutral': row[1], 'negative': row[0]}
+            for key, row in zip(keys[order].tolist(), counts[order].tolist())
+        }
+
+    def daily_counts(self):
+        """
+        同 utils.news_post_counter：(排序後的日期字串列表, 每日文章數列表)。
+        """
+        days = self.days[self.days != '']
+        labels, counts = np.unique(days, return_counts=True)
+        return labels.tolist(), counts.tolist()
+
+
+# ========= 基準測試：dict 版與欄狀版的峰值記憶體與各階段耗時 =========
+def _synthetic_posts(count, seed=0):
+    rng = random.Random(seed)
+    words = ['颱風', '停班', '停課', '物價', '選舉', '股市', '疫苗', '捷運', '房價', '天氣', '政策', '油價']
+    sources = ['PTT', 'Threads']
+    categories = ['政治', '生活', '財經', '社會', '國際']
+    posts = []
+    for i in range(count):
+        summary = ''.join(rng.choice(words) for _ in range(rng.randint(20, 80)))
+        posts.append({
+            'title': summary[:12],
+            'date': f'2026-10-{rng.randint(1, 28):02d}',
+            'post_url': f'https://example.com/post/{i}',
+            'summary': summary,
+            'comments': [],
+            'category': rng.choice(categories),
+            'source': rng.choice(sources),
+        })
+    scores = [rng.random() for _ in range(count)]
+    return posts, scores
+
+
+def _measure(stages):
+    """
+    依序執行 [(名稱, 函式)]，前一階段的回傳值作為下一階段的輸入。
+    :return: (各階段耗時 dict, tracemalloc 峰值 bytes)
+    """
+    timings = {}
+    value = None
+    tracemalloc.start()
+    try:
+        for name, stage in stages:
+            start = time.perf_counter()
+            value = stage(value)
+            timings[name] = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return timings, peak
+
+
+def benchmark_pipeline(count=BENCHMARK_POSTS):
+    """
+    以合成貼文比較 dict 版（utils 的 count_sentiment / sentiment_feq / news_post_counter）
+    與 ArticleBatch 的情緒標記與統計階段。情緒分數預先產生，兩者不含實際計分（計分共用 SentimentService）。
+    """
+    from .sentiment import sentiment_label
+    from .utils import count_sentiment, news_post_counter, sentiment_feq
+
+    posts, scores = _synthetic_posts(count)
+
+    def dict_label(_):
+        rows = [dict(post) for post in posts]
+        for row, score in zip(rows, scores):
+            row['sentiment_score'] = score
+            row['sentiment'] = sentiment_label(score)
+        return rows
+
+    def dict_stats(rows):
+        return count_sentiment(rows), sentiment_feq(rows, 'source'), sentiment_feq(rows, 'category'), news_post_counter(rows)
+
+    def batch_build(_):
+        return ArticleBatch([dict(post) for post in posts], url_key='post_url')
+
+    def batch_label(batch):
+        batch.set_scores(scores).write_back()
+        return batch
+
+    def batch_stats(batch):
+        return batch.sentiment_counts(), batch.sentiment_matrix('source'), batch.sentiment_matrix('category'), batch.daily_counts()
+
+    dict_timings, dict_peak = _measure([('sentiment', dict_label), ('stats', dict_stats)])
+    batch_timings, batch_peak = _measure([('build', batch_build), ('sentiment', batch_label), ('stats', batch_stats)])
+
+    # 確認兩種做法的統計結果相同
+    rows = dict_label(None)
+    batch = batch_label(batch_build(None))
+    assert dict_stats(rows) == batch_stats(batch), "欄狀版統計結果與 dict 版不一致"
+
+    return {
+        'posts': count,
+        'dict': {'timings': dict_timings, 'peak': dict_peak},
+        'batch': {'timings': batch_timings, 'peak': batch_peak},
+    }
+
+
+if __name__ == "__main__":
+    # python -m analyzer.article_batch [貼文數]
+    import os
+    import sys
+
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'FinalProject.settings')
+    django.setup()
+
+    report = benchmark_pipeline(int(sys.argv[1]) if len(sys.argv) > 1 else BENCHMARK_POSTS)
+    print(f"📄 {report['posts']} 篇合成貼文")
+    for name, label in (('dict', 'dict 版'), ('batch', '欄狀版')):
+        result = report[name]
+        stages = '、'.join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in result['timings'].items())
+        print(f"   {label:6}峰值記憶體 {result['peak'] / 1024 / 1024:6.1f} MB｜{stages}")
@@ -0,0 +1,112 @@
+import asyncio
+import atexit
+import os
+import threading
+
+
+class CrawlerRuntime:
+    """
+    常駐的非同步爬蟲執行環境：在專屬執行緒上跑一個長期存在的 event loop，
+    同步程式（views、posts_work）透過 submit / run 把協程排進這個 loop，
+    不必每次呼叫都建立、拆除 event loop，也不需要 nest_asyncio。
+    loop 上可掛長期存在的 aiohttp session，讓連線在多次爬取之間重用。
+    """
+    def __init__(self, name='crawler-loop'):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._pid = os.getpid()
+
+    def _reset_after_fork(self):
+        """
+        fork 後的子行程沒有 loop 執行緒；父行程的 loop 與 session 不能沿用，鎖也可能停在被持有的狀態。
+        """
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._pid = os.getpid()
+
+    def start(self):
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # 舊 loop 上的 session 綁在已停止的 loop，不能在新 loop 使用
+            self._sessions = {}
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def in_loop_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """
+        把協程排進常駐 loop，回傳 concurrent.futures.Future（可 result(timeout) / cancel）。
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """
+        同步等待協程完成並回傳結果。不可在 loop 執行緒內呼叫（會互相等待而卡死）。
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("不可在爬蟲 loop 執行緒內同步等待協程")
+        return self.submit(coro).result(timeout)
+
+    async def session(self, name, factory):
+        """
+        取得掛在 loop 上、以 name 區分的長期 aiohttp session，不存在或已關閉時以 factory() 建立。
+        只能在 loop 內（協程中）呼叫。
+        """
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            session = self._sessions[name] = factory()
+        return session
+
+    async def _close_sessions(self):
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+    def shutdown(self, timeout=5):
+        """
+        關閉所有 session 並停止 loop。
+        """
+        with self._lock:
+            thread, loop = self._thread, self.loop
+            if thread is None or not thread.is_alive():
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_sessions(), loop).result(timeout)
+            except Exception:
+                pass
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            self._thread = None
+            if not thread.is_alive():
+                loop.close()
+
+
+_runtime = CrawlerRuntime()
+atexit.register(_runtime.shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_runtime._reset_after_fork)
+
+
+def get_runtime():
+    return _runtime
@@ -0,0 +1,312 @@
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ========= 可依需求修改的參數 =========
+BROWSER_POOL_SIZE = 2           # 最多同時存在的瀏覽器數（含使用中與閒置）
+BROWSER_WARM_SIZE = 1           # 建立瀏覽器池時預先啟動並登入的數量
+BROWSER_MAX_USES = 20           # 每個瀏覽器使用幾次後回收重建（避免記憶體持續成長）
+BROWSER_MAX_AGE = 3600          # 瀏覽器存活超過此秒數後回收重建
+BROWSER_ACQUIRE_TIMEOUT = 120   # 等待可用瀏覽器的秒數上限
+BROWSER_COOKIE_DIR = os.path.join(BASE_DIR, '.crawler_cache', 'cookies')
+
+
+class BrowserUnavailable(RuntimeError):
+    """
+    無法在時限內取得已登入的瀏覽器。
+    """
+
+
+class PooledBrowser:
+    __slots__ = ('driver', 'uses', 'created_at')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+    def worn_out(self, max_uses, max_age):
+        return self.uses >= max_uses or time.monotonic() - self.created_at >= max_age
+
+
+class BrowserPool:
+    """
+    預先啟動並登入的 Selenium 瀏覽器池：
+    - factory()：建立新的 WebDriver
+    - login(driver)：登入，成功回傳 True
+    - home_url：套用 cookie 用的網域首頁；登入後的 cookie 存在 cookie 檔，重啟後先嘗試沿用，失效時才重新登入
+    - is_logged_in(driver)：可選，判斷套用 cookie 後是否仍為登入狀態
+    借出前做健康檢查，使用 max_uses 次或存活超過 max_age 秒後回收重建。
+    """
+    def __init__(self, name, factory, login, home_url, is_logged_in=None,
+                 size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES, max_age=BROWSER_MAX_AGE):
+        self.name = name
+        self.factory = factory
+        self.login = login
+        self.home_url = home_url
+        self.is_logged_in = is_logged_in
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.cookie_path = os.path.join(BROWSER_COOKIE_DIR, f'{name}.json')
+        self._idle = queue.LifoQueue()     # 後進先出：優先使用最近用過、頁面仍在快取中的瀏覽器
+        self._slots = threading.BoundedSemaphore(size)
+        self._cookie_lock = threading.Lock()
+        self.stats = {'started': 0, 'reused': 0, 'recycled': 0, 'cookie_logins': 0, 'password_logins': 0}
+
+    # ----- cookie -----
+    def _load_cookies(self):
+        try:
+            with open(self.cookie_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cookies(self, driver):
+        try:
+            cookies = driver.get_cookies()
+        except Exception:
+            return
+        os.makedirs(BROWSER_COOKIE_DIR, exist_ok=True)
+        tmp_path = f"{self.cookie_path}.{threading.get_ident()}.tmp"
+        with self._cookie_lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(cookies, f)
+                os.replace(tmp_path, self.cookie_path)
+            except OSError:
+                pass
+
+    def _login_with_cookies(self, driver):
+        cookies = self._load_cookies()
+        if not cookies or self.is_logged_in is None:
+            return False
+        try:
+            driver.get(self.home_url)
+            for cookie in cookies:
+                if cookie.get('sameSite') not in ('Strict', 'Lax', 'None'):
+                    cookie.pop('sameSite', None)
+                if 'expiry' in cookie:
+                    cookie['expiry'] = int(cookie['expiry'])
+                try:
+                    driver.add_cookie(cookie)
+                except Exception:
+                    continue
+            driver.get(self.home_url)
+            return self.is_logged_in(driver)
+        except Exception:
+            return False
+
+    # ----- 建立與回收 -----
+    def _start_browser(self):
+        driver = self.factory()
+        try:
+            if self._login_with_cookies(driver):
+                self.stats['cookie_logins'] += 1
+                print(f"🍪 {self.name} 以保存的 cookie 登入")
+            elif self.login(driver):
+                self.stats['password_logins'] += 1
+                self._save_cookies(driver)
+            else:
+                raise BrowserUnavailable(f"{self.name} 登入失敗")
+        except BaseException:
+            _quit(driver)
+            raise
+        self.stats['started'] += 1
+        return PooledBrowser(driver)
+
+    def _healthy(self, browser):
+        if browser.worn_out(self.max_uses, self.max_age):
+            return False
+        try:
+            browser.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, browser):
+        """
+        歸還前關閉多餘分頁，回到第一個分頁。
+        """
+        driver = browser.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+    def _discard(self, browser):
+        self.stats['recycled'] += 1
+        _quit(browser.driver)
+        self._slots.release()
+
+    # ----- 借出與歸還 -----
+    def acquire(self, timeout=BROWSER_ACQUIRE_TIMEOUT):
+        """
+        取得一個已登入的瀏覽器：優先使用健康的閒置瀏覽器，沒有時在名額內新建。
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                browser = None
+            if browser is not None:
+                if self._healthy(browser):
+                    self.stats['reused'] += 1
+                    browser.uses += 1
+                    return browser
+                self._discard(browser)
+                continue
+
+            if self._slots.acquire(timeout=0.2):
+                try:
+                    browser = self._start_browser()
+                except BaseException:
+                    self._slots.release()
+                    raise
+                browser.uses += 1
+                return browser
+            if time.monotonic() >= deadline:
+                raise BrowserUnavailable(f"{timeout} 秒內沒有可用的 {self.name} 瀏覽器")
+
+    def release(self, browser, healthy=True):
+        """
+        歸還瀏覽器；healthy=False（例如操作中發生例外）或已達使用上限時直接回收。
+        """
+        if healthy:
+            try:
+                self._reset(browser)
+            except Exception:
+                healthy = False
+        if healthy and not browser.worn_out(self.max_uses, self.max_age):
+            self._save_cookies(browser.driver)  # 保存更新過的 session cookie
+            self._idle.put(browser)
+        else:
+            self._discard(browser)
+
+    @contextmanager
+    def lease(self, timeout=BROWSER_ACQUIRE_TIMEOUT):
+        browser = self.acquire(timeout)
+        healthy = False
+        try:
+            yield browser.driver
+            healthy = True
+        finally:
+            self.release(browser, healthy)
+
+    def warm(self, count=BROWSER_WARM_SIZE):
+        """
+        在背景執行緒預先啟動並登入 count 個瀏覽器放入閒置佇列。
+        """
+        def _warm_one():
+            if not self._slots.acquire(blocking=False):
+                return
+            try:
+                self._idle.put(self._start_browser())
+            except Exception as e:
+                self._slots.release()
+                print(f"⚠️ {self.name} 瀏覽器預熱失敗：{e}")
+
+        for _ in range(count):
+            threading.Thread(target=_warm_one, name=f'{self.name}-warm', daemon=True).start()
+
+    def close(self):
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(browser)
+
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+# ========= 瀏覽器記憶體用量 =========
+def _proc_children(pid):
+    children = []
+    try:
+        for tid in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{tid}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _proc_rss(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid):
+    """
+    pid 及其所有子行程的 RSS 總和（bytes）。有 psutil 時使用 psutil，否則讀取 /proc；
+    共用的記憶體頁會重複計入，數值為近似的上限。
+    """
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            total = 0
+            for proc in [root] + root.children(recursive=True):
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total
+        except psutil.Error:
+            return 0
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _proc_rss(current)
+        stack.extend(_proc_children(current))
+    return total
+
+
+def browser_rss(driver):
+    """
+    chromedriver 與其啟動的 Chrome 行程樹的 RSS（bytes），無法取得時回傳 0。
+    """
+    try:
+        return process_tree_rss(driver.service.process.pid)
+    except Exception:
+        return 0
+
+
+class PeakRss:
+    """
+    記錄一次爬取期間瀏覽器 RSS 的峰值，sample() 在每次滾動後呼叫。
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.peak = 0
+
+    def sample(self):
+        self.peak = max(self.peak, browser_rss(self.driver))
+        return self.peak
+
+    def report(self, name):
+        if self.peak:
+            print(f"🧠 {name} 瀏覽器峰值 RSS：{self.peak / 1024 / 1024:.0f} MB")
@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from .http_client import http_get, print_pool_stats
+from .http_cache import print_cache_stats
+from .host_guard import HostUnavailable, guard_status
+from .deadline import Deadline
+
+# ========= 可依需求修改的參數 =========
+CRAWL_MAX_WORKERS = 8           # 全域同時進行的頁面請求上限（所有來源共用）
+CRAWL_SOURCE_CONCURRENCY = 3    # 單一來源同時預抓的頁數上限
+DEADLINE_GRACE = 2              # 時間到後等待各來源收尾（交出已抓到的結果）的秒數
+
+
+class NewsSource:
+    """
+    單一新聞來源的爬取規格。
+    name: 來源名稱（僅用於日誌）
+    build_url: 函式 (keyword, page, days) -> 該頁的搜尋網址
+    parse_page: 函式 (html_text, keyword, cutoff) -> (本頁文章列表, 是否停止往後翻頁)
+    max_pages: 預設最多翻幾頁
+    days: 預設只抓最近幾天的新聞
+    headers: 請求標頭
+    concurrency: 此來源同時預抓的頁數上限，None 時使用 CRAWL_SOURCE_CONCURRENCY
+    """
+    def __init__(self, name, build_url, parse_page, max_pages, days=7, headers=None, concurrency=None):
+        self.name = name
+        self.build_url = build_url
+        self.parse_page = parse_page
+        self.max_pages = max_pages
+        self.days = days
+        self.headers = headers or {}
+        self.concurrency = concurrency
+
+    def __repr__(self):
+        return f"NewsSource({self.name})"
+
+
+def fetch_page(url, headers=None, timeout=None):
+    """
+    以共用連線池抓取單一頁面，成功回傳 HTML 字串，失敗（連線錯誤或非 200）回傳 None。
+    主機斷路時拋出 HostUnavailable，讓呼叫端停止抓取該來源。
+    """
+    try:
+        response = http_get(url, headers=headers, timeout=timeout)
+    except HostUnavailable:
+        raise
+    except Exception as e:
+        print(f"連線失敗：{e}")
+        return None
+    if response.status_code != 200:
+        print(f"跳過 {url}：回應錯誤 {response.status_code}")
+        return None
+    return response.text
+
+
+def crawl_source(source, keyword, days=None, max_pages=None, concurrency=None, executor=None, known_urls=None,
+                 deadline=None, partial_sources=None):
+    """
+    爬取單一來源的所有分頁。
+    以滑動視窗同時預抓最多 concurrency 頁，但仍依頁碼順序解析，
+    一旦某頁遇到過舊的新聞（parse_page 回傳停止旗標），就取消尚未完成的預抓並結束，
+    因此結果與逐頁爬取完全相同。
+    executor: 共用的執行緒池，None 時自行建立一個大小為 concurrency 的池。
+    known_urls: 已儲存過的新聞網址，遇到其中任一篇即停止（增量爬取）。
+        此時視窗從 1 頁開始、每頁加倍，避免只需要一頁時仍預抓多頁。
+    deadline: Deadline 或秒數，時間到時放棄尚未抓到的頁面，回傳目前已解析的結果，
+        並把來源名稱加入 partial_sources（set）。
+    """
+    deadline = Deadline.coerce(deadline)
+    days = source.days if days is None else days
+    max_pages = source.max_pages if max_pages is None else max_pages
+    concurrency = max(1, concurrency or source.concurrency or CRAWL_SOURCE_CONCURRENCY)
+    cutoff = datetime.now() - timedelta(days=days)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'crawl-{source.name}')
+
+    window = 1 if known_urls else concurrency
+    results = []
+    pending = deque()
+    next_page = 1
+    try:
+        while True:
+            # 補滿預抓視窗
+            while next_page <= max_pages and len(pending) < window:
+                url = source.build_url(keyword, next_page, days)
+                pending.append((next_page, executor.submit(fetch_page, url, source.headers)))
+                next_page += 1
+            if not pending:
+                break
+
+            page, future = pending.popleft()
+            try:
+                html_text = future.result(timeout=deadline.remaining())
+            except FutureTimeout:
+                print(f"⏰ {source.name} 超過時間預算，停止於第 {page} 頁")
+                if partial_sources is not None:
+                    partial_sources.add(source.name)
+                break
+            except HostUnavailable as e:
+                print(f"⛔ {source.name} 主機斷路，停止此來源：{e}")
+                break
+            if html_text is None:
+                continue  # 與原本逐頁爬取相同：失敗的頁面直接跳過
+
+            try:
+                items, stop_crawling = source.parse_page(html_text, keyword, cutoff)
+            except Exception as e:
+                print(f"❌ {source.name} 第 {page} 頁解析失敗，停止此來源：{e}")
+                break
+            if known_urls:
+                for index, item in enumerate(items):
+                    if item.get('news_url') in known_urls:
+                        items = items[:index]
+                        stop_crawling = True
+                        break
+                window = min(window * 2, concurrency)
+            results.extend(items)
+            if stop_crawling:
+                break
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def crawl_sources(sources, keyword, days=None, max_workers=None, source_concurrency=None,
+                  known_urls=None, postprocess=None, deadline=None, partial_sources=None):
+    """
+    同時爬取多個來源，結果依 sources 的順序合併（每個來源內部維持頁碼與條目順序）。
+    max_workers: 全域同時請求上限，None 時使用 CRAWL_MAX_WORKERS
+    source_concurrency: 單一來源的頁數並行上限，可為整數或 {來源名稱: 上限} 的 dict
+    known_urls: {來源名稱: 已知網址集合}，用於增量爬取
+    postprocess: 函式 (source, items) -> items，在合併前處理每個來源的結果
+    deadline: Deadline 或秒數；時間到時各來源只回傳已抓到的部分，來源名稱會加入 partial_sources（set）
+    """
+    if not sources:
+        return []
+    max_workers = max_workers or CRAWL_MAX_WORKERS
+    deadline = Deadline.coerce(deadline)
+    if partial_sources is None:
+        partial_sources = set()
+
+    def _limit_for(source):
+        if isinstance(source_concurrency, dict):
+            return source_concurrency.get(source.name)
+        return source_concurrency
+
+    start_time = datetime.now()
+    results = []
+    fetch_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='news-fetch')
+    source_pool = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='news-source')
+    try:
+        futures = [
+            source_pool.submit(crawl_source, source, keyword, days, None, _limit_for(source), fetch_pool,
+                               (known_urls or {}).get(source.name), deadline, partial_sources)
+            for source in sources
+        ]
+        for source, future in zip(sources, futures):
+            remaining = deadline.remaining()
+            try:
+                items = future.result(timeout=None if remaining is None else remaining + DEADLINE_GRACE)
+            except FutureTimeout:
+                print(f"⏰ {source.name} 未能在時間預算內交出結果，略過")
+                partial_sources.add(source.name)
+                items = []
+            except Exception as e:
+                print(f"❌ {source.name} 爬取失敗：{e}")
+                continue
+            try:
+                if postprocess:
+                    items = postprocess(source, items)
+            except Exception as e:
+                print(f"❌ {source.name} 後處理失敗：{e}")
+            print(f"📰 {source.name}：{len(items)} 篇{'（部分）' if source.name in partial_sources else ''}")
+            results.extend(items)
+    finally:
+        # 不等待逾時的請求跑完，讓呼叫端能在時間預算內拿到結果
+        source_pool.shutdown(wait=False, cancel_futures=True)
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(f"📊 新聞並行爬取完成，共 {len(results)} 篇，耗時 {elapsed:.1f} 秒")
+    print_pool_stats()
+    print_cache_stats()
+    for host, status in guard_status().items():
+        if status['state'] != 'closed':
+            print(f"⛔ {host} 斷路器狀態：{status['state']}（連續失敗 {status['failures']} 次）")
+    return results
@@ -0,0 +1,47 @@
+import time
+
+
+class Deadline:
+    """
+    爬取流程的時間預算。budget 為秒數，None 表示不限時。
+    同一個 Deadline 可以傳給多個爬蟲，所有爬蟲共用同一個截止時間。
+    """
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.expires_at = None if budget is None else time.monotonic() + budget
+
+    @classmethod
+    def coerce(cls, value):
+        """
+        接受 Deadline、秒數或 None，統一轉成 Deadline。
+        """
+        if isinstance(value, cls):
+            return value
+        return cls(value)
+
+    def remaining(self):
+        """
+        剩餘秒數，不限時回傳 None。
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def capped(self, seconds):
+        """
+        回傳截止時間為「原截止時間」與「現在 + seconds」較早者的新 Deadline，seconds 為 None 時不另設上限。
+        """
+        if seconds is None:
+            return self
+        capped = Deadline(seconds)
+        if self.expires_at is not None and self.expires_at < capped.expires_at:
+            capped.expires_at = self.expires_at
+        return capped
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def __repr__(self):
+        if self.expires_at is None:
+            return "Deadline(不限時)"
+        return f"Deadline(剩餘 {self.remaining():.1f} 秒)"
@@ -0,0 +1,180 @@
+import math
+import os
+import time
+
+import numpy as np
+from snownlp import sentiment as snow_sentiment
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ========= 可依需求修改的參數 =========
+BENCHMARK_DOCS = 3000       # 基準測試的文件數（爬到的文章不足時重複使用）
+VECTOR_MODEL_CACHE = os.path.join(BASE_DIR, '.crawler_cache', 'nlp', 'sentiment_vectors.npz')  # 向量化模型快取
+
+
+def tokenize_for_sentiment(text):
+    """
+    與 SnowNLP 情緒分析相同的前處理：SnowNLP 分詞後移除停用詞。
+    """
+    return snow_sentiment.classifier.handle(text)
+
+
+class VectorizedBayes:
+    """
+    以 NumPy 陣列重現 SnowNLP 的單純貝氏情緒模型（snownlp.classification.bayes.Bayes）。
+
+    SnowNLP 對每個類別 k 計算
+        score_k = log(total_k) - log(total) + Σ log(count_k(w) / total_k)
+    （未出現在類別詞典的詞 count 以 none 代替，即 add-one smoothing），
+    二元分類下 P(pos) = 1 / (1 + exp(score_neg - score_pos)) = sigmoid(score_pos - score_neg)。
+    這裡預先算好每個詞的 log 機率差（pos - neg），整批文件以 np.bincount 一次加總。
+    """
+    def __init__(self, vocab, word_diff, prior_diff):
+        self.vocab = vocab              # {詞: 索引}，索引 len(vocab) 為未知詞
+        self.word_diff = word_diff      # shape (len(vocab) + 1,)，每個詞的 log P(w|pos) - log P(w|neg)
+        self.prior_diff = prior_diff    # log P(pos) - log P(neg)
+
+    @classmethod
+    def from_snownlp(cls, bayes=None):
+        """
+        從 SnowNLP 已載入的模型建立（預設為 snownlp.sentiment 內建的模型）。
+        """
+        bayes = bayes or snow_sentiment.classifier.classifier
+        pos, neg = bayes.d['pos'], bayes.d['neg']
+        words = sorted(set(pos.d) | set(neg.d))
+        vocab = {word: i for i, word in enumerate(words)}
+
+        def log_probs(prob):
+            counts = np.fromiter((prob.d.get(word, prob.none) for word in words), dtype=np.float64, count=len(words))
+            counts = np.append(counts, prob.none)  # 未知詞
+            return np.log(counts) - math.log(prob.total)
+
+        word_diff = log_probs(pos) - log_probs(neg)
+        prior_diff = math.log(pos.total) - math.log(neg.total)
+        return cls(vocab, word_diff, prior_diff)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        words = np.array(sorted(self.vocab, key=self.vocab.__getitem__))
+        np.savez(tmp_path, words=words, word_diff=self.word_diff, prior_diff=np.array(self.prior_diff))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            vocab = {word: i for i, word in enumerate(data['words'].tolist())}
+            return cls(vocab, data['word_diff'], float(data['prior_diff']))
+
+    def score_tokens(self, documents):
+        """
+        :param documents: list of 詞列表（已經過 tokenize_for_sentiment）
+        :return: np.ndarray，每篇文件為正面的機率（0~1），與 SnowNLP(text).sentiments 相同
+        """
+        unknown = len(self.vocab)
+        lengths = np.fromiter((len(words) for words in documents), dtype=np.int64, count=len(documents))
+        token_ids = np.fromiter(
+            (self.vocab.get(word, unknown) for words in documents for word in words),
+            dtype=np.int64, count=int(lengths.sum()),
+        )
+        doc_ids = np.repeat(np.arange(len(documents)), lengths)
+        logits = self.prior_diff + np.bincount(doc_ids, weights=self.word_diff[token_ids], minlength=len(documents))
+        # 數值穩定的 sigmoid：1 / (1 + exp(-x)) = exp(-log(1 + exp(-x)))
+        return np.exp(-np.logaddexp(0.0, -logits))
+
+    def score_texts(self, texts):
+        return self.score_tokens([tokenize_for_sentiment(text) for text in texts])
+
+
+_model = None
+
+
+def _snownlp_model_mtime():
+    # SnowNLP 在 Python 3 會讀取 sentiment.marshal.3
+    path = snow_sentiment.data_path
+    for candidate in (path + '.3', path):
+        if os.path.exists(candidate):
+            return os.path.getmtime(candidate)
+    return None
+
+
+def get_vectorized_model(cache_path=VECTOR_MODEL_CACHE):
+    """
+    取得向量化模型：快取檔比 SnowNLP 模型檔新時直接載入，否則從 SnowNLP 模型建立並寫入快取。
+    """
+    global _model
+    if _model is None:
+        source_mtime = _snownlp_model_mtime()
+        try:
+            if source_mtime is not None and os.path.getmtime(cache_path) >= source_mtime:
+                _model = VectorizedBayes.load(cache_path)
+        except (OSError, ValueError, KeyError):
+            _model = None
+        if _model is None:
+            _model = VectorizedBayes.from_snownlp()
+            try:
+                _model.save(cache_path)
+            except OSError as e:
+                print(f"⚠️ 向量化情緒模型快取寫入失敗：{e}")
+    return _model
+
+
+def numpy_scores(texts):
+    """
+    SentimentService 可用的批次計分函式，回傳 list of float。
+    """
+    if not texts:
+        return []
+    return get_vectorized_model().score_texts(texts).tolist()
+
+
+def benchmark_sentiment(texts):
+    """
+    比較 SnowNLP 逐篇計算與向量化批次計算的耗時與分數差異。
+    分詞兩者相同，另外計時；計分部分 SnowNLP 以逐詞 log 的 classify 計算。
+    :return: dict
+    """
+    model = get_vectorized_model()
+    bayes = snow_sentiment.classifier.classifier
+
+    start = time.perf_counter()
+    documents = [tokenize_for_sentiment(text) for text in texts]
+    tokenize_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = []
+    for words in documents:
+        label, prob = bayes.classify(words)
+        reference.append(prob if label == 'pos' else 1 - prob)
+    snownlp_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = model.score_tokens(documents)
+    numpy_seconds = time.perf_counter() - start
+
+    return {
+        'docs': len(texts),
+        'tokens': sum(len(words) for words in documents),
+        'tokenize_seconds': tokenize_seconds,
+        'snownlp_seconds': snownlp_seconds,
+        'numpy_seconds': numpy_seconds,
+        'max_abs_diff': float(np.max(np.abs(scores - np.array(reference)))) if texts else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    # 以 PTT 文章比較計分速度：python -m analyzer.fast_sentiment [文章數]
+    import sys
+    from .ptt_crawler import get_ptt_posts
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else BENCHMARK_DOCS
+    bodies = [post['summary'] or post['title'] for post in get_ptt_posts()]
+    if not bodies:
+        sys.exit("❌ 沒有爬到 PTT 文章")
+    texts = [bodies[i % len(bodies)] for i in range(count)]
+    report = benchmark_sentiment(texts)
+    print(f"📄 {report['docs']} 篇，共 {report['tokens']} 詞（平均 {report['tokens'] / report['docs']:.0f} 詞／篇）")
+    print(f"   ✂️ 分詞        {report['tokenize_seconds']:8.2f} 秒")
+    print(f"   ⏱️ SnowNLP    {report['snownlp_seconds']:8.3f} 秒（{report['docs'] / report['snownlp_seconds']:,.0f} 篇/秒）")
+    print(f"   ⏱️ NumPy      {report['numpy_seconds']:8.3f} 秒（{report['docs'] / report['numpy_seconds']:,.0f} 篇/秒）")
+    print(f"   🎯 最大分數差  {report['max_abs_diff']:.2e}")
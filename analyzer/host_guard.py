@@ -0,0 +1,204 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+# ========= 可依需求修改的參數 =========
+HOST_RATE = 5.0                 # 每個主機每秒最多發出幾個請求（token bucket 補充速度）
+HOST_BURST = 5                  # token bucket 容量（允許的瞬間突發請求數）
+HOST_MAX_CONCURRENCY = 6        # 每個主機同時請求數的上限
+HOST_MIN_CONCURRENCY = 1        # 退避後的同時請求數下限
+BREAKER_FAILURES = 5            # 連續失敗幾次後斷路
+BREAKER_COOLDOWN = 60           # 斷路後冷卻秒數，之後放行一個試探請求
+HOST_RETRIES = 2                # 連線錯誤、逾時與 429 / 5xx 的重試次數（每次重試都重新經過限速與斷路器）
+HOST_BACKOFF = 0.5              # 重試間隔的指數退避係數（第 n 次重試前等待 HOST_BACKOFF * 2^(n-1) 秒）
+HOST_OVERRIDES = {              # 個別主機的參數，例如已知會擋爬的中時只允許慢速抓取
+    'www.chinatimes.com': {'rate': 1.0, 'burst': 1, 'max_concurrency': 1, 'failures': 2},
+}
+# 視為「主機過載 / 擋爬」的狀態碼：觸發退避並計入斷路失敗
+BACKOFF_STATUS = {429, 500, 502, 503, 504}
+
+
+class HostUnavailable(requests.ConnectionError):
+    """
+    主機處於斷路狀態時直接拋出，不發送請求。
+    繼承 requests.ConnectionError，既有的 except Exception 仍可接住。
+    """
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0  # 收到 Retry-After 時暫停發送
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 同時請求上限：成功時緩慢增加（每輪 +1），遇到 429 / 5xx 時減半。
+    """
+    def __init__(self, max_limit, min_limit=HOST_MIN_CONCURRENCY):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, overloaded):
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """
+    closed：正常放行；連續失敗達門檻後轉為 open，冷卻期間直接拒絕；
+    冷卻結束後轉為 half_open，只放行一個試探請求，成功則恢復、失敗則重新冷卻。
+    """
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record(self, success):
+        with self._lock:
+            if success:
+                self.state = 'closed'
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                if self.state != 'open':
+                    print(f"⛔ 連續失敗 {self.failures} 次，斷路 {self.cooldown} 秒")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class HostGuard:
+    """
+    單一主機的流量控制：token bucket 限速 + 自適應同時請求數 + 斷路器。
+    """
+    def __init__(self, host, rate=HOST_RATE, burst=HOST_BURST, max_concurrency=HOST_MAX_CONCURRENCY,
+                 failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.breaker = CircuitBreaker(failures, cooldown)
+
+    def _attempt(self, fetch, url, **kwargs):
+        """
+        送出一次請求：取得 token 與同時請求名額，結果回報給 AIMD 與斷路器。
+        """
+        if not self.breaker.allow():
+            raise HostUnavailable(f"{self.host} 斷路中，略過 {url}")
+        self.bucket.acquire()
+        self.limiter.acquire()
+        overloaded = True
+        try:
+            response = fetch(url, **kwargs)
+            overloaded = response.status_code in BACKOFF_STATUS
+            if response.status_code == 429:
+                self.bucket.pause(_retry_after(response))
+            return response
+        finally:
+            self.limiter.release(overloaded)
+            self.breaker.record(not overloaded)
+
+    def call(self, fetch, url, **kwargs):
+        """
+        經由限速與斷路器發送請求；連線錯誤、逾時與 429 / 5xx 以指數退避重試，
+        每次重試都是一次獨立的 _attempt（消耗 token、計入斷路失敗）。斷路後不再重試。
+        """
+        for attempt in range(HOST_RETRIES + 1):
+            if attempt:
+                time.sleep(HOST_BACKOFF * 2 ** (attempt - 1))
+            last_try = attempt == HOST_RETRIES
+            try:
+                response = self._attempt(fetch, url, **kwargs)
+            except HostUnavailable:
+                raise
+            except (requests.ConnectionError, requests.Timeout):
+                if last_try or self.breaker.state == 'open':
+                    raise
+                continue
+            if response.status_code not in BACKOFF_STATUS or last_try or self.breaker.state == 'open':
+                return response
+
+    def status(self):
+        return {
+            'state': self.breaker.state,
+            'failures': self.breaker.failures,
+            'concurrency': int(self.limiter.limit),
+        }
+
+
+def _retry_after(response, default=5.0):
+    try:
+        return float(response.headers.get('Retry-After', default))
+    except ValueError:
+        return default
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def guard_for(url):
+    host = urlsplit(url).hostname or ''
+    guard = _guards.get(host)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(host)
+            if guard is None:
+                guard = _guards[host] = HostGuard(host, **HOST_OVERRIDES.get(host, {}))
+    return guard
+
+
+def guard_status():
+    """
+    回傳各主機目前的斷路狀態與同時請求上限。
+    """
+    with _guards_lock:
+        return {host: guard.status() for host, guard in _guards.items()}
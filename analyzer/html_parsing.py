@@ -0,0 +1,210 @@
+import time
+
+from bs4 import BeautifulSoup
+
+# ========= 可依需求修改的參數 =========
+# 解析器後端：None 表示自動選擇（selectolax > lxml > bs4），也可指定 'selectolax' / 'lxml' / 'bs4'
+HTML_PARSER_BACKEND = None
+
+try:
+    from selectolax.parser import HTMLParser as _SelectolaxParser
+except ImportError:
+    _SelectolaxParser = None
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    CSSSelector = None
+
+
+def available_backends():
+    backends = []
+    if _SelectolaxParser is not None:
+        backends.append('selectolax')
+    if CSSSelector is not None:
+        backends.append('lxml')
+    backends.append('bs4')  # html.parser，永遠可用的備援
+    return backends
+
+
+def default_backend():
+    if HTML_PARSER_BACKEND:
+        return HTML_PARSER_BACKEND
+    return available_backends()[0]
+
+
+# ========= 各後端的節點包裝，提供一致的介面 =========
+class _Bs4Node:
+    __slots__ = ('el',)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [_Bs4Node(el) for el in self.el.select(css)]
+
+    def select_one(self, css):
+        el = self.el.select_one(css)
+        return _Bs4Node(el) if el is not None else None
+
+    def text(self, separator=''):
+        return self.el.get_text(separator)
+
+    def attr(self, name, default=''):
+        value = self.el.get(name)
+        if value is None:
+            return default
+        return ' '.join(value) if isinstance(value, list) else value
+
+    def classes(self):
+        return self.el.get('class') or []
+
+    def remove(self):
+        self.el.decompose()
+
+
+_lxml_selectors = {}
+
+
+def _lxml_select(el, css):
+    selector = _lxml_selectors.get(css)
+    if selector is None:
+        selector = _lxml_selectors[css] = CSSSelector(css)
+    return selector(el)
+
+
+class _LxmlNode:
+    __slots__ = ('el',)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [_LxmlNode(el) for el in _lxml_select(self.el, css)]
+
+    def select_one(self, css):
+        found = _lxml_select(self.el, css)
+        return _LxmlNode(found[0]) if found else None
+
+    def text(self, separator=''):
+        return separator.join(self.el.itertext())
+
+    def attr(self, name, default=''):
+        value = self.el.get(name)
+        return default if value is None else value
+
+    def classes(self):
+        return (self.el.get('class') or '').split()
+
+    def remove(self):
+        if self.el.getparent() is not None:
+            self.el.drop_tree()  # 保留尾端文字，與 bs4 的 decompose 行為一致
+
+
+class _SelectolaxNode:
+    __slots__ = ('el',)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [_SelectolaxNode(el) for el in self.el.css(css)]
+
+    def select_one(self, css):
+        el = self.el.css_first(css)
+        return _SelectolaxNode(el) if el is not None else None
+
+    def text(self, separator=''):
+        return self.el.text(deep=True, separator=separator)
+
+    def attr(self, name, default=''):
+        value = self.el.attributes.get(name)
+        return default if value is None else value
+
+    def classes(self):
+        return (self.el.attributes.get('class') or '').split()
+
+    def remove(self):
+        self.el.decompose()
+
+
+def parse_html(html_text, backend=None):
+    """
+    解析 HTML，回傳具有 select / select_one / text / attr / remove 介面的根節點。
+    """
+    backend = backend or default_backend()
+    if backend == 'selectolax' and _SelectolaxParser is not None:
+        return _SelectolaxNode(_SelectolaxParser(html_text).root)
+    if backend == 'lxml' and CSSSelector is not None:
+        try:
+            root = lxml.html.document_fromstring(html_text)
+        except ValueError:
+            # 含 XML 編碼宣告的字串需以 bytes 解析
+            root = lxml.html.document_fromstring(html_text.encode('utf-8'))
+        return _LxmlNode(root)
+    return _Bs4Node(BeautifulSoup(html_text, 'html.parser'))
+
+
+# ========= 宣告式擷取規則 =========
+def _extract_field(node, rule):
+    """
+    rule: (CSS 選擇器, 取值方式)，取值方式為 'text' 或 '@屬性名稱'。
+    選擇器為 None 時作用在條目本身。找不到元素時回傳 None，元素沒有該屬性時回傳 ''。
+    """
+    css, how = rule
+    target = node if css is None else node.select_one(css)
+    if target is None:
+        return None
+    if how == 'text':
+        return target.text().strip()
+    return target.attr(how[1:]).strip()
+
+
+def extract_items(root, spec):
+    """
+    依 spec 擷取條目清單：
+    spec = {
+        'items': 條目的 CSS 選擇器,
+        'fields': {欄位名稱: (CSS 選擇器, 'text' 或 '@屬性')},
+    }
+    :return: list of dict，每個條目一個 dict，值為原始字串（或 None）
+    """
+    items = []
+    for node in root.select(spec['items']):
+        items.append({name: _extract_field(node, rule) for name, rule in spec['fields'].items()})
+    return items
+
+
+def extract_from_html(html_text, spec, backend=None):
+    return extract_items(parse_html(html_text, backend), spec)
+
+
+def benchmark_parsers(html_text, spec, rounds=20):
+    """
+    比較各後端解析同一頁並依 spec 擷取條目的平均耗時。
+    :return: {後端名稱: (每頁毫秒數, 擷取條目數)}
+    """
+    report = {}
+    for backend in available_backends():
+        count = 0
+        start = time.perf_counter()
+        for _ in range(rounds):
+            count = len(extract_from_html(html_text, spec, backend))
+        report[backend] = ((time.perf_counter() - start) / rounds * 1000, count)
+    return report
+
+
+if __name__ == "__main__":
+    # 以實際頁面比較各解析器：python -m analyzer.html_parsing [tvbs|ettoday|ltn|ptt]
+    import sys
+    from .http_client import http_get
+    from .parse_specs import BENCHMARK_PAGES
+
+    names = sys.argv[1:] or list(BENCHMARK_PAGES)
+    for name in names:
+        spec, url = BENCHMARK_PAGES[name]
+        page = http_get(url, use_cache=False, cookies={'over18': '1'}).text
+        print(f"📄 {name}（{len(page) / 1024:.0f} KB）")
+        for backend, (ms, count) in benchmark_parsers(page, spec).items():
+            print(f"   ⏱️ {backend:<10} {ms:8.2f} ms/頁，擷取 {count} 筆")
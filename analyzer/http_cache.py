@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ========= 可依需求修改的參數 =========
+HTTP_CACHE_DIR = os.path.join(BASE_DIR, '.crawler_cache', 'http')
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024    # 快取總容量上限，超過時淘汰最久未使用的項目
+HTTP_CACHE_TTLS = {                         # 各來源（主機）的快取秒數，未列出的主機不快取
+    'news.tvbs.com.tw': 600,
+    'www.ettoday.net': 600,
+    'search.ltn.com.tw': 600,
+}
+# 存進快取時保留的回應標頭
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def cache_ttl_for(url):
+    """
+    回傳該網址所屬來源的快取秒數，不快取時回傳 0。
+    """
+    return HTTP_CACHE_TTLS.get(urlsplit(url).hostname or '', 0)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResponseCache:
+    """
+    以內容定址的磁碟回應快取：
+    - entries/<網址雜湊>.json：回應的 metadata（狀態碼、標頭、編碼、存入時間、內容雜湊）
+    - blobs/<內容雜湊>：回應本文，相同內容的頁面只存一份
+    以 entry 檔的修改時間當作最後使用時間，總容量超過 max_bytes 時淘汰最久未使用的項目。
+    """
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entry_dir = os.path.join(cache_dir, 'entries')
+        self.blob_dir = os.path.join(cache_dir, 'blobs')
+        os.makedirs(self.entry_dir, exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = None        # {key: [最後使用時間, 大小, 內容雜湊]}
+        self._blob_refs = {}      # {內容雜湊: 引用次數}
+        self._total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+
+    # ----- 索引 -----
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        for name in os.listdir(self.entry_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.entry_dir, name)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    entry = json.load(f)
+                atime = os.path.getmtime(path)
+            except (OSError, ValueError):
+                continue
+            self._add_to_index(name[:-5], atime, entry['size'], entry['body'])
+
+    def _add_to_index(self, key, atime, size, body_hash):
+        self._index[key] = [atime, size, body_hash]
+        self._total_bytes += size
+        self._blob_refs[body_hash] = self._blob_refs.get(body_hash, 0) + 1
+
+    def _remove_from_index(self, key):
+        _, size, body_hash = self._index.pop(key)
+        self._total_bytes -= size
+        self._blob_refs[body_hash] -= 1
+        if self._blob_refs[body_hash] <= 0:
+            del self._blob_refs[body_hash]
+            return body_hash  # 已無其他項目引用，可刪除內容
+        return None
+
+    def _entry_path(self, key):
+        return os.path.join(self.entry_dir, key + '.json')
+
+    def _blob_path(self, body_hash):
+        return os.path.join(self.blob_dir, body_hash)
+
+    # ----- 讀寫 -----
+    def lookup(self, url):
+        """
+        取得網址的快取 metadata，不存在時回傳 None。
+        """
+        key = _sha256(url.encode('utf-8'))
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            try:
+                with open(self._entry_path(key), encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._drop(key)
+                return None
+        entry['key'] = key
+        return entry
+
+    @staticmethod
+    def is_fresh(entry, ttl):
+        return time.time() - entry['stored_at'] < ttl
+
+    def to_response(self, entry):
+        """
+        把快取項目還原成 requests.Response，並更新其最後使用時間。
+        """
+        try:
+            with open(self._blob_path(entry['body']), 'rb') as f:
+                body = f.read()
+        except OSError:
+            with self._lock:
+                self._drop(entry['key'])
+            return None
+        self._touch(entry['key'])
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response._content = body
+        response.url = entry['url']
+        response.encoding = entry['encoding']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.from_cache = True
+        return response
+
+    def store(self, url, response):
+        """
+        寫入（或覆蓋）一筆回應，寫檔採先寫暫存檔再 rename，避免讀到寫一半的檔案。
+        """
+        key = _sha256(url.encode('utf-8'))
+        body = response.content
+        body_hash = _sha256(body)
+        entry = {
+            'url': url,
+            'status': response.status_code,
+            'headers': {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+            'encoding': response.encoding,
+            'body': body_hash,
+            'size': len(body),
+            'stored_at': time.time(),
+        }
+        with self._lock:
+            self._load_index()
+            blob_path = self._blob_path(body_hash)
+            if not os.path.exists(blob_path):
+                self._atomic_write(blob_path, body)
+            if key in self._index:
+                stale_blob = self._remove_from_index(key)
+                if stale_blob and stale_blob != body_hash:
+                    self._unlink(self._blob_path(stale_blob))
+            self._atomic_write(self._entry_path(key), json.dumps(entry).encode('utf-8'))
+            self._add_to_index(key, time.time(), entry['size'], body_hash)
+            self.stats['stores'] += 1
+            self._evict()
+
+    def mark_revalidated(self, entry):
+        """
+        伺服器回 304 時，重設存入時間讓快取重新取得一段 TTL。
+        """
+        entry = {k: v for k, v in entry.items() if k != 'key'}
+        entry['stored_at'] = time.time()
+        key = _sha256(entry['url'].encode('utf-8'))
+        with self._lock:
+            self._atomic_write(self._entry_path(key), json.dumps(entry).encode('utf-8'))
+            if key in self._index:
+                self._index[key][0] = time.time()
+            self.stats['revalidated'] += 1
+
+    def count(self, name):
+        """
+        統計計數加一（多個爬蟲執行緒共用同一個快取，需在鎖內更新）。
+        """
+        with self._lock:
+            self.stats[name] += 1
+
+    def _touch(self, key):
+        now = time.time()
+        with self._lock:
+            if key in self._index:
+                self._index[key][0] = now
+        try:
+            os.utime(self._entry_path(key), (now, now))
+        except OSError:
+            pass
+
+    # ----- 淘汰 -----
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self._index.items(), key=lambda kv: kv[1][0]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._drop(key)
+            self.stats['evictions'] += 1
+
+    def _drop(self, key):
+        if key not in self._index:
+            return
+        orphan_blob = self._remove_from_index(key)
+        self._unlink(self._entry_path(key))
+        if orphan_blob:
+            self._unlink(self._blob_path(orphan_blob))
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _atomic_write(path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        with self._lock:
+            self._load_index()
+            return {**self.stats, 'entries': len(self._index), 'bytes': self._total_bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def cached_get(fetch, url, ttl, headers=None, **kwargs):
+    """
+    帶快取的 GET：
+    1. TTL 內的快取直接回傳，不發送請求
+    2. 過期但有 ETag / Last-Modified 時送出條件式請求，304 則沿用快取
+    3. 其餘情況正常抓取，200 的回應寫入快取
+    fetch: 實際發送請求的函式，簽名同 requests.get
+    """
+    cache = get_response_cache()
+    entry = cache.lookup(url)
+    if entry and cache.is_fresh(entry, ttl):
+        response = cache.to_response(entry)
+        if response is not None:
+            cache.count('hits')
+            return response
+        entry = None
+
+    request_headers = dict(headers or {})
+    if entry:
+        if 'ETag' in entry['headers']:
+            request_headers['If-None-Match'] = entry['headers']['ETag']
+        if 'Last-Modified' in entry['headers']:
+            request_headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+    response = fetch(url, headers=request_headers, **kwargs)
+    if entry and response.status_code == 304:
+        cached = cache.to_response(entry)
+        if cached is not None:
+            cache.mark_revalidated(entry)
+            return cached
+        # 快取內容已被淘汰或刪除：304 沒有本文，改送一般請求重新取得完整頁面
+        response = fetch(url, headers=dict(headers or {}), **kwargs)
+
+    cache.count('misses')
+    if response.status_code == 200:
+        cache.store(url, response)
+    return response
+
+
+def print_cache_stats():
+    stats = get_response_cache().summary()
+    print(f"🗄️ HTTP 快取：命中 {stats['hits']}、未命中 {stats['misses']}、304 重新驗證 {stats['revalidated']}、"
+          f"淘汰 {stats['evictions']}，共 {stats['entries']} 筆 / {stats['bytes'] / 1024 / 1024:.1f} MB")
@@ -0,0 +1,156 @@
+import threading
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from .http_cache import cache_ttl_for, cached_get
+from . import host_guard
+from .host_guard import guard_for
+
+# ========= 可依需求修改的參數 =========
+HTTP_TIMEOUT = 10               # 預設逾時秒數（可為 (連線, 讀取) tuple）
+HTTP_POOL_HOSTS = 16            # 最多保留幾個主機的連線池
+HTTP_POOL_MAXSIZE = 10          # 每個主機最多保留的 keep-alive 連線數
+
+# urllib3 會依已安裝的套件決定可解壓的編碼（安裝 brotli 後包含 br）
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+}
+
+_session = None
+_session_lock = threading.Lock()
+_retired_stats = {}  # 被淘汰的連線池的累計統計，避免遺失
+
+
+def _record_pool(stats, pool):
+    host = f"{pool.scheme}://{pool.host}:{pool.port}"
+    entry = stats.setdefault(host, {'opened': 0, 'requests': 0})
+    entry['opened'] += pool.num_connections
+    entry['requests'] += pool.num_requests
+
+
+class _CountingAdapter(HTTPAdapter):
+    """
+    與 HTTPAdapter 相同，只是在連線池被淘汰時保留其統計數字。
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pools = self.poolmanager.pools
+
+        def _dispose(pool):
+            with _session_lock:
+                _record_pool(_retired_stats, pool)
+            pool.close()
+
+        pools.dispose_func = _dispose
+
+
+def _build_session():
+    # urllib3 不重試：重試與退避都交給 host_guard，每次請求才會經過限速、AIMD 與斷路器
+    adapter = _CountingAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=Retry(total=0, raise_on_status=False),
+    )
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """
+    取得全程序共用的 requests.Session（每個主機一個 keep-alive 連線池）。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def http_get(url, headers=None, timeout=None, use_cache=True, **kwargs):
+    """
+    以共用連線池發送 GET 請求，用法與 requests.get 相同。
+    headers 會與預設標頭合併；timeout 未指定時使用 HTTP_TIMEOUT。
+    網址所屬來源在 http_cache.HTTP_CACHE_TTLS 中有設定時，會先查磁碟快取（use_cache=False 可略過）。
+    實際送出的請求會經過該主機的限速與斷路器（host_guard），斷路中的主機會直接拋出 HostUnavailable。
+    """
+    session = get_session()
+    timeout = timeout or HTTP_TIMEOUT
+    fetch = partial(guard_for(url).call, session.get)
+    ttl = cache_ttl_for(url) if use_cache else 0
+    if ttl:
+        return cached_get(fetch, url, ttl, headers=headers, timeout=timeout, **kwargs)
+    return fetch(url, headers=headers, timeout=timeout, **kwargs)
+
+
+def configure_http_client(timeout=None, retries=None, backoff=None, pool_hosts=None, pool_maxsize=None):
+    """
+    調整 HTTP 參數並重建共用連線池（只會影響之後的請求）。
+    retries / backoff 為 host_guard 的重試次數與退避係數。
+    """
+    global HTTP_TIMEOUT, HTTP_POOL_HOSTS, HTTP_POOL_MAXSIZE
+    if timeout is not None:
+        HTTP_TIMEOUT = timeout
+    if retries is not None:
+        host_guard.HOST_RETRIES = retries
+    if backoff is not None:
+        host_guard.HOST_BACKOFF = backoff
+    if pool_hosts is not None:
+        HTTP_POOL_HOSTS = pool_hosts
+    if pool_maxsize is not None:
+        HTTP_POOL_MAXSIZE = pool_maxsize
+    close_session()
+
+
+def close_session():
+    """
+    關閉共用連線池，下次請求時會重新建立。
+    """
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def pool_stats():
+    """
+    回傳連線池統計，用來確認 keep-alive 是否生效：
+    {
+        'hosts': {'https://host:443': {'opened': 新建連線數, 'requests': 請求數, 'reused': 重用次數}},
+        'opened': ..., 'requests': ..., 'reused': ...,
+    }
+    """
+    with _session_lock:
+        stats = {host: dict(entry) for host, entry in _retired_stats.items()}
+        session = _session
+    if session is not None:
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    _record_pool(stats, pool)
+
+    total = {'opened': 0, 'requests': 0, 'reused': 0}
+    for entry in stats.values():
+        entry['reused'] = max(entry['requests'] - entry['opened'], 0)
+        for k in total:
+            total[k] += entry[k]
+    return {'hosts': stats, **total}
+
+
+def print_pool_stats():
+    stats = pool_stats()
+    print(f"🔌 HTTP 連線池：{stats['requests']} 次請求，新建 {stats['opened']} 條連線，重用 {stats['reused']} 次")
+    for host, entry in stats['hosts'].items():
+        print(f"   {host}: 請求 {entry['requests']}、新建 {entry['opened']}、重用 {entry['reused']}")
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_sentimentcache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['keyword', 'publish_date'], name='news_keyword_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['keyword', 'publish_date'], name='posts_keyword_date_idx'),
+        ),
+    ]
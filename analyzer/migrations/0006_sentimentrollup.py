@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    # 以既有的 News / Posts 建立初始彙總，之後由 rollups.py 的訊號增量更新
+    SentimentRollup = apps.get_model('analyzer', 'SentimentRollup')
+    rollups = []
+    for model_name, group_by in (('News', ['category']), ('Posts', [])):
+        model = apps.get_model('analyzer', model_name)
+        rows = (model.objects
+                .annotate(day=TruncDate('publish_date', tzinfo=timezone.get_current_timezone()))
+                .values('keyword', 'source', 'day', 'sentiment', *group_by)
+                .annotate(n=Count('id'), score=Sum('sentiment_score')).order_by())
+        for row in rows:
+            rollups.append(SentimentRollup(
+                keyword=row['keyword'], source=row['source'], category=row.get('category') or '',
+                day=row['day'], sentiment=row['sentiment'], count=row['n'], score_sum=row['score'] or 0.0,
+            ))
+    SentimentRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_keyword_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentimentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=20)),
+                ('source', models.CharField(max_length=20)),
+                ('category', models.CharField(blank=True, default='', max_length=100)),
+                ('day', models.DateField()),
+                ('sentiment', models.CharField(max_length=2)),
+                ('count', models.IntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'SentimentRollup',
+                'unique_together': {('keyword', 'source', 'category', 'day', 'sentiment')},
+                'indexes': [models.Index(fields=['keyword', 'day'], name='rollup_keyword_day_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
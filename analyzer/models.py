@@ -1,8 +1,20 @@
 from django.db import models
 from django.conf import settings
 
+class RollupSnapshotMixin:
+    # 從資料庫載入時記下彙總相關欄位的值，rollups 的 post_save 以此扣掉舊的貢獻，不必在 pre_save 再查詢一次
+    ROLLUP_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in cls.ROLLUP_FIELDS):  # only() / defer() 延遲載入時不記錄
+            instance._rollup_previous = {field: loaded[field] for field in cls.ROLLUP_FIELDS}
+        return instance
+
 # Create your models here.
-class News(models.Model):
+class News(RollupSnapshotMixin, models.Model):
     keyword = models.CharField(max_length=20,db_index=True, default='新聞') # 對應的主題關鍵字
     source = models.CharField(max_length=20)                # 資料來源
     title = models.CharField(max_length=255)                # 新聞標題
@@ -15,11 +27,13 @@ class News(models.Model):
     sentiment_score = models.FloatField()                   # 情緒分數
     created_at = models.DateTimeField(auto_now_add=True)    # 寫入時間
     searches = models.ManyToManyField('HistorySearch', related_name='related_news', blank=True)
+    ROLLUP_FIELDS = ('keyword', 'source', 'category', 'publish_date', 'sentiment', 'sentiment_score')
     class Meta:
         db_table = 'News'
+        indexes = [models.Index(fields=['keyword', 'publish_date'], name='news_keyword_date_idx')]  # aggregates 依關鍵字與日期範圍彙總
     def __str__(self):
         return f"[{self.source}] {self.title}"
-class Posts(models.Model):
+class Posts(RollupSnapshotMixin, models.Model):
     keyword = models.CharField(max_length=20, db_index=True)
     source = models.CharField(max_length=20)
     title = models.CharField(max_length=255)   
@@ -31,8 +45,10 @@ class Posts(models.Model):
     sentiment_score = models.FloatField()
     created_at = models.DateTimeField(auto_now_add=True)
     searches = models.ManyToManyField('HistorySearch', related_name='related_posts', blank=True)
+    ROLLUP_FIELDS = ('keyword', 'source', 'publish_date', 'sentiment', 'sentiment_score')
     class Meta:
         db_table = 'Posts'
+        indexes = [models.Index(fields=['keyword', 'publish_date'], name='posts_keyword_date_idx')]
 
     def __str__(self):
         return f"[{self.source}] {self.title}" 
@@ -57,6 +73,7 @@ class AnalysisResult(models.Model):
     post_trend_labels = models.JSONField(default=list)  # 折線圖日期軸
     post_trend_values = models.JSONField(default=list)  # 折線圖對應數值
     post_report = models.TextField(default='')      # AI 生成功能摘要
+    partial_sources = models.JSONField(default=list)  # 超過時間預算、只取得部分資料的來源
     created_at = models.DateTimeField(auto_now_add=True)
     search = models.ForeignKey('HistorySearch', on_delete=models.SET_NULL, null=True, blank=True, verbose_name="相關搜尋")
     class Meta:
@@ -83,5 +100,44 @@ class HistorySearch(models.Model):
     
     def __str__(self):
         return f"{self.user.username} 搜尋「{self.keyword}」@{self.created_at}"
+class CrawlWatermark(models.Model):
+    # 每個 (來源, 關鍵字) 已存進 News 表的最新位置，供增量爬取時判斷何時停止翻頁
+    source = models.CharField(max_length=20)
+    keyword = models.CharField(max_length=20)
+    known_urls = models.JSONField(default=list)                 # 上次爬取範圍內已儲存的所有網址
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        db_table = 'CrawlWatermark'
+        unique_together = ('source', 'keyword')
+
+    def __str__(self):
+        return f"[{self.source}] {self.keyword} @{self.updated_at}"
+class SentimentCache(models.Model):
+    # 以內容雜湊記住已計算過的情緒分數，同一段文字在整個系統中只計算一次
+    content_hash = models.CharField(max_length=64, unique=True)   # 分析文字的 SHA-256
+    sentiment_score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        db_table = 'SentimentCache'
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} → {self.sentiment_score:.3f}"
+class SentimentRollup(models.Model):
+    # 每個 (關鍵字, 來源, 類別, 日期, 情緒) 的文章數與情緒分數總和，News / Posts 儲存時以增量更新（見 rollups.py）
+    keyword = models.CharField(max_length=20)
+    source = models.CharField(max_length=20)
+    category = models.CharField(max_length=100, blank=True, default='')  # 貼文沒有類別，為空字串
+    day = models.DateField()                                            # 發布日期（本地時區）
+    sentiment = models.CharField(max_length=2)
+    count = models.IntegerField(default=0)
+    score_sum = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        db_table = 'SentimentRollup'
+        unique_together = ('keyword', 'source', 'category', 'day', 'sentiment')
+        indexes = [models.Index(fields=['keyword', 'day'], name='rollup_keyword_day_idx')]
+
+    def __str__(self):
+        return f"[{self.source}] {self.keyword} {self.day} {self.sentiment}：{self.count}"
 # python manage.py makemigrations
 # python manage.py migrate
@@ -0,0 +1,192 @@
+# 斷詞、關鍵字與情緒計分的多行程批次處理。
+# 本模組不匯入 Django，讓 spawn 出來的工作行程可以直接載入，也能在沒有 Django 的環境單獨使用。
+import atexit
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import jieba
+import jieba.analyse
+from snownlp import SnowNLP
+
+from .fast_sentiment import numpy_scores
+from .nlp_warmup import warm_up
+
+# ========= 可依需求修改的參數 =========
+NLP_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # 工作行程數，0 表示一律在目前行程內計算
+NLP_CHUNK_SIZE = 32         # 每個工作單位的文件數
+NLP_MIN_PARALLEL = 64       # 文件數少於此值時直接在目前行程內計算（省去行程間傳輸成本）
+NLP_START_METHOD = 'spawn'  # 工作行程啟動方式；Django 行程內有多個執行緒，避免使用 fork
+ANALYSIS_TOP_K = 20         # 文件分析保留的 TF-IDF 排名詞數
+TAGS_TOP_K = 10             # 文件標籤取 TF-IDF 前幾名
+
+STOPWORDS = {
+    '的', '了', '是', '我', '你', '他', '她', '它', '我們', '你們', '他們', '這', '那', '和', '與',
+    '在', '不', '有', '也', '就', '都', '很', '而', '及', '或', '被', '還', '能', '會','核稿','編輯',
+    '內容','請見','發布','訂閱','進行','根據','報導','新聞','針對','一名','發現','結果','記得',
+}
+_CHINESE_WORD = re.compile(r'^[\u4e00-\u9fff]+$')
+_CHINESE_CHAR = re.compile(r'[\u4e00-\u9fff]')
+
+
+def _filter_tags(words):
+    # 過濾標點、空字元、停用詞
+    filtered_tags = []
+    for word in words:
+        word = word.strip()
+        if word and _CHINESE_WORD.match(word) and word not in STOPWORDS:
+            filtered_tags.append(word)
+    return filtered_tags
+
+
+# ========= 文件分析：每段文字只斷詞一次 =========
+def char_stats(text):
+    """
+    字元統計：總字數與中文字數。
+    """
+    return {'chars': len(text), 'chinese_chars': len(_CHINESE_CHAR.findall(text))}
+
+
+def tfidf_rank(tokens, top_k=ANALYSIS_TOP_K):
+    """
+    以已斷好的詞計算 TF-IDF 排名，與 jieba.analyse.extract_tags 的計算方式相同
+    （使用同一份 idf 表、median idf 與停用詞），因此不必再對原文斷詞一次。
+    """
+    tfidf = jieba.analyse.default_tfidf
+    freq = {}
+    for word in tokens:
+        if len(word.strip()) < 2 or word.lower() in tfidf.stop_words:
+            continue
+        freq[word] = freq.get(word, 0.0) + 1.0
+    total = sum(freq.values())
+    for word in freq:
+        freq[word] *= tfidf.idf_freq.get(word, tfidf.median_idf) / total
+    return sorted(freq, key=freq.__getitem__, reverse=True)[:top_k]
+
+
+def analyze_text(text):
+    """
+    對一段文字做一次完整分析（jieba 只斷詞一次）：
+    - ranked：TF-IDF 排名前 ANALYSIS_TOP_K 的詞（未過濾）
+    - tags：TF-IDF 前 TAGS_TOP_K 名，過濾標點、非中文與 STOPWORDS 後的標籤
+    - chars / chinese_chars：字元統計
+    完整的斷詞結果不保留：分析結果會跟著文章放進快取與模板，只留下游會用到的部分。
+    """
+    ranked = tfidf_rank(jieba.lcut(text))
+    analysis = {'ranked': ranked, 'tags': _filter_tags(ranked[:TAGS_TOP_K])}
+    analysis.update(char_stats(text))
+    return analysis
+
+
+def snownlp_scores(texts):
+    """
+    以 SnowNLP 逐篇計算分數（0~1，愈接近 1 越正面）。
+    """
+    return [SnowNLP(text).sentiments for text in texts]
+
+
+# ========= 工作行程執行的函式（需為模組層級才能被 pickle） =========
+def _init_worker():
+    """
+    工作行程啟動時從預先建好的快取載入 jieba 詞典、TF-IDF 模型與情緒模型，避免第一批文件付出載入成本。
+    """
+    warm_up(report=False)
+
+
+def _analysis_chunk(args):
+    texts, _ = args
+    return [analyze_text(text) for text in texts]
+
+
+def _sentiment_chunk(args):
+    texts, engine = args
+    return numpy_scores(texts) if engine == 'numpy' else snownlp_scores(texts)
+
+
+class NlpStage:
+    """
+    以常駐的行程池分批處理 CPU 密集的 NLP 工作，不佔用請求執行緒的 GIL。
+    結果依輸入順序回傳（結果具決定性）；行程池無法建立或中途損毀時，退回在目前行程內計算。
+    """
+    def __init__(self, workers=NLP_WORKERS, chunk_size=NLP_CHUNK_SIZE, min_parallel=NLP_MIN_PARALLEL):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.min_parallel = min_parallel
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None and self.workers > 0:
+                try:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(NLP_START_METHOD),
+                        initializer=_init_worker,
+                    )
+                except (OSError, ValueError, NotImplementedError) as e:
+                    print(f"⚠️ 無法建立 NLP 行程池，改在目前行程內計算：{e}")
+                    self.workers = 0
+            return self._pool
+
+    def _map(self, func, texts, extra):
+        chunks = [(texts[i:i + self.chunk_size], extra) for i in range(0, len(texts), self.chunk_size)]
+        pool = self._get_pool() if len(texts) >= self.min_parallel else None
+        if pool is None:
+            results = map(func, chunks)
+        else:
+            try:
+                results = list(pool.map(func, chunks))
+            except BrokenProcessPool:
+                print("⚠️ NLP 行程池已損毀，本批改在目前行程內計算")
+                with self._lock:
+                    self._pool = None
+                results = map(func, chunks)
+        return [value for chunk in results for value in chunk]
+
+    def analyze_documents(self, items, text_key='summary'):
+        """
+        批次分析尚未分析過的文章，結果存在各 item['analysis']，回傳 items。
+        """
+        pending = [item for item in items if item.get('analysis') is None]
+        results = self._map(_analysis_chunk, [item.get(text_key) or '' for item in pending], None)
+        for item, analysis in zip(pending, results):
+            item['analysis'] = analysis
+        return items
+
+    def score_sentiments(self, texts, engine='numpy'):
+        """
+        批次計算情緒分數，engine 為 'numpy'（向量化，與 SnowNLP 分數相同）或 'snownlp'。
+        """
+        return self._map(_sentiment_chunk, list(texts), engine)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_stage = None
+_stage_lock = threading.Lock()
+
+
+def get_nlp_stage():
+    global _stage
+    if _stage is None:
+        with _stage_lock:
+            if _stage is None:
+                _stage = NlpStage()
+                atexit.register(_stage.shutdown)
+    return _stage
+
+
+def score_sentiments(texts, engine='numpy'):
+    return get_nlp_stage().score_sentiments(texts, engine)
+
+
+def analyze_documents(items, text_key='summary'):
+    return get_nlp_stage().analyze_documents(items, text_key)
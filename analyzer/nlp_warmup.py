@@ -0,0 +1,77 @@
+# 啟動時預先載入 jieba / SnowNLP 模型，避免第一個請求付出載入成本。
+# 本模組不匯入 Django：Django 的 AppConfig.ready 與 nlp_stage 的工作行程都會呼叫 warm_up()。
+import gc
+import os
+import time
+
+import jieba
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ========= 可依需求修改的參數 =========
+NLP_CACHE_DIR = os.path.join(BASE_DIR, '.crawler_cache', 'nlp')  # 預先建好的模型快取目錄（部署時可一併打包）
+JIEBA_CACHE_FILE = 'jieba.cache'    # jieba 前綴詞典快取（marshal），放在 NLP_CACHE_DIR 下
+
+_warmed = False
+
+
+def use_prebuilt_jieba_cache():
+    """
+    讓 jieba 的前綴詞典快取讀寫在 NLP_CACHE_DIR（預設為系統暫存目錄，容器重啟後就會消失）。
+    必須在 jieba 初始化之前呼叫；快取比詞典檔舊時 jieba 會自動重建並寫回。
+    """
+    os.makedirs(NLP_CACHE_DIR, exist_ok=True)
+    jieba.dt.tmp_dir = NLP_CACHE_DIR
+    jieba.dt.cache_file = JIEBA_CACHE_FILE
+
+
+def warm_up(report=True, freeze=False):
+    """
+    依序載入 jieba 詞典、jieba.analyse 的 TF-IDF 模型、SnowNLP 與向量化情緒模型。
+    同一行程只會執行一次。
+    :param report: 是否印出各步驟耗時
+    :param freeze: 載入後呼叫 gc.freeze()，讓預先 fork 的 worker（如 gunicorn --preload）
+                   以 copy-on-write 共用這些物件，不會因垃圾回收寫入引用資訊而複製記憶體分頁
+    :return: dict，各步驟耗時（秒）；已預熱過時回傳空 dict
+    """
+    global _warmed
+    if _warmed:
+        return {}
+    timings = {}
+
+    start = time.perf_counter()
+    jieba.setLogLevel(60)
+    use_prebuilt_jieba_cache()
+    jieba.initialize()
+    timings['jieba'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from jieba import analyse as jieba_analyse
+    jieba_analyse.extract_tags('預先載入')
+    timings['tfidf'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from snownlp import SnowNLP
+    SnowNLP('預先載入').sentiments
+    timings['snownlp'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from .fast_sentiment import get_vectorized_model
+    get_vectorized_model()
+    timings['vectorized'] = time.perf_counter() - start
+
+    if freeze and hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+    _warmed = True
+
+    if report:
+        print(f"🔥 NLP 模型預熱完成，共 {sum(timings.values()):.2f} 秒（jieba 詞典 {timings['jieba']:.2f}、"
+              f"TF-IDF {timings['tfidf']:.2f}、SnowNLP {timings['snownlp']:.2f}、向量化情緒模型 {timings['vectorized']:.2f}）")
+    return timings
+
+
+if __name__ == "__main__":
+    # 部署時預先建立快取：python -m analyzer.nlp_warmup
+    warm_up()
+    print(f"📦 模型快取位於 {NLP_CACHE_DIR}")
@@ -0,0 +1,96 @@
+# 各爬蟲的宣告式擷取規則（格式見 html_parsing.extract_items）
+# 網站改版時只需要調整這裡的選擇器
+
+# TVBS 搜尋結果頁
+TVBS_SPEC = {
+    'items': 'main div.list li',
+    'fields': {
+        'date': ('div.time', 'text'),
+        'link': ('a', '@href'),
+        'title': ('h2.txt', 'text'),
+        'summary': ('div.summary', 'text'),
+        'tags': ('a', '@data-news_tag'),
+        'category': ('div.type a', 'text'),
+    },
+}
+
+# ETtoday 搜尋結果頁
+ET_SPEC = {
+    'items': 'div.archive.clearfix',
+    'fields': {
+        'date': ('.date', 'text'),
+        'link': ('a', '@href'),
+        'title': ('h2', 'text'),
+        'summary': ('p', 'text'),
+        'category': ('span.date a', 'text'),
+    },
+}
+
+# 自由時報搜尋結果頁
+LTN_SPEC = {
+    'items': 'section.Searchnews div.page-name li',
+    'fields': {
+        'date': ('span.time', 'text'),
+        'link': ('a', '@href'),
+        'title': ('a', '@title'),
+        'summary': ('p', 'text'),
+        'category': ('i', 'text'),
+    },
+}
+
+# 中時搜尋結果頁
+CHDTV_SPEC = {
+    'items': 'div.wrapper ul.vertical-list.list-style-none li',
+    'fields': {
+        'link': ('a', '@href'),
+        'title': ('h3.title', 'text'),
+        'date': ('span.date', 'text'),
+        'summary': ('p.intro', 'text'),
+    },
+}
+
+# PTT 看板列表頁
+PTT_BOARD_SPEC = {
+    'items': 'div.r-ent',
+    'fields': {
+        'push': ('div.nrec', 'text'),
+        'href': ('div.title a', '@href'),
+    },
+}
+
+# PTT 看板搜尋結果頁（/bbs/<看板>/search?q=），多擷取列表上的日期以便提早停止翻頁
+PTT_SEARCH_SPEC = {
+    'items': 'div.r-ent',
+    'fields': {
+        'push': ('div.nrec', 'text'),
+        'href': ('div.title a', '@href'),
+        'date': ('div.meta div.date', 'text'),
+    },
+}
+
+# PTT 看板列表頁的翻頁按鈕
+PTT_PAGING_SPEC = {
+    'items': 'a.btn.wide',
+    'fields': {
+        'label': (None, 'text'),
+        'href': (None, '@href'),
+    },
+}
+
+# PTT 文章頁的推文
+PTT_PUSH_SPEC = {
+    'items': 'div.push',
+    'fields': {
+        'tag': ('span.push-tag', 'text'),
+        'user': ('span.push-userid', 'text'),
+        'content': ('span.push-content', 'text'),
+    },
+}
+
+# 供 html_parsing 基準測試使用：{名稱: (規則, 範例網址)}
+BENCHMARK_PAGES = {
+    'tvbs': (TVBS_SPEC, "https://news.tvbs.com.tw/news/searchresult/新聞/news/1"),
+    'ettoday': (ET_SPEC, "https://www.ettoday.net/news_search/doSearch.php?keywords=新聞&idx=1&page=1"),
+    'ltn': (LTN_SPEC, "https://search.ltn.com.tw/list?keyword=新聞&sort=date&type=all&page=1"),
+    'ptt': (PTT_BOARD_SPEC, "https://www.ptt.cc/bbs/Gossiping/index.html"),
+}
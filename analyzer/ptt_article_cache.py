@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ========= 可依需求修改的參數 =========
+PTT_ARTICLE_CACHE_DIR = os.path.join(BASE_DIR, '.crawler_cache', 'ptt')
+PTT_ARTICLE_TTL = 6 * 3600          # 推文數沒變時，快取文章最長沿用秒數
+PTT_SATURATED_TTL = 30 * 60         # 列表顯示「爆」時推文數不再變動，改用較短的沿用秒數
+PTT_ARTICLE_MAX_AGE = 8 * 86400     # 存入超過此秒數的快取檔會在 prune 時刪除
+
+
+def _key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+class PttArticleCache:
+    """
+    PTT 文章的磁碟快取：每個網址一個 JSON 檔，內容為解析後的文章、
+    看板列表上看到的推文數（div.nrec）、發文時間與存入時間。
+    列表上的推文數與快取相同且未超過 TTL 時直接沿用，不重新下載與解析文章。
+    """
+    def __init__(self, cache_dir=PTT_ARTICLE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'changed': 0, 'expired': 0, 'stores': 0}
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, _key(url) + '.json')
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def lookup(self, url, push):
+        """
+        回傳 (文章 dict, 發文時間 timestamp)；沒有快取、推文數改變或已過期時回傳 None。
+        push: 看板列表上的推文數字串（'' / 數字 / '爆' / 'X1' ...），None 表示未知，一律視為需重抓。
+        """
+        if push is None:
+            self._count('misses')
+            return None
+        try:
+            with open(self._path(url), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+
+        if entry['push'] != push:
+            self._count('changed')
+            return None
+        ttl = PTT_SATURATED_TTL if push == '爆' else PTT_ARTICLE_TTL
+        if time.time() - entry['stored_at'] >= ttl:
+            self._count('expired')
+            return None
+        self._count('hits')
+        return entry['post'], entry['published']
+
+    def store(self, url, push, post, published):
+        """
+        寫入解析後的文章，先寫暫存檔再 rename，避免讀到寫一半的檔案。
+        """
+        if push is None:
+            return
+        entry = {'url': url, 'push': push, 'published': published, 'stored_at': time.time(), 'post': post}
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._count('stores')
+
+    def prune(self, max_age=PTT_ARTICLE_MAX_AGE):
+        """
+        刪除存入超過 max_age 秒的快取檔（這些文章早已超出 DAYS_LIMIT 的範圍）。
+        """
+        cutoff = time.time() - max_age
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+_article_cache = None
+_article_cache_lock = threading.Lock()
+
+
+def get_article_cache():
+    global _article_cache
+    if _article_cache is None:
+        with _article_cache_lock:
+            if _article_cache is None:
+                _article_cache = PttArticleCache()
+    return _article_cache
+
+
+def print_article_cache_stats():
+    stats = get_article_cache().stats
+    print(f"🗃️ PTT 文章快取：命中 {stats['hits']}，推文數變動 {stats['changed']}，"
+          f"過期 {stats['expired']}，未快取 {stats['misses']}，寫入 {stats['stores']}")
@@ -1,13 +1,18 @@
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
-from bs4.element import Tag
 from datetime import datetime, timedelta
+from urllib.parse import quote
+import os
 import re
-import nest_asyncio
+import threading
+import time
 
+from .html_parsing import parse_html, extract_items
+from .parse_specs import PTT_BOARD_SPEC, PTT_PAGING_SPEC, PTT_PUSH_SPEC, PTT_SEARCH_SPEC
+from .deadline import Deadline
+from .ptt_article_cache import get_article_cache, print_article_cache_stats
+from .async_runtime import get_runtime
 
-nest_asyncio.apply()
 
 
 def convert_time_format(time_string):
@@ -44,6 +49,11 @@ PUSH_LIMIT = 20            # 推文數門檻（爆 or ≥ 數字）
 DAYS_LIMIT = 7              # 只抓最近 N 天的文章
 SLEEP_SECONDS = 0.1         # 每頁抓完後延遲秒數
 MAX_POSTS_PER_BOARD = 5    # 每個看板最多抓幾篇文章
+PTT_MAX_CONCURRENCY = 8     # 所有看板共用的同時連線上限
+PTT_BOARD_CONCURRENCY = 6   # 同時爬取的看板數
+SEARCH_PAGES = 3            # 關鍵字模式下每個看板最多翻幾頁搜尋結果
+PTT_KEYWORD_MODE = 'snapshot'  # 'snapshot'：只過濾背景更新的熱門文章快照（請求內不爬 PTT）；
+                               # 'search'：另外在各看板搜尋關鍵字，較完整但每次搜尋都要爬取（受請求的時間預算限制）
 PTT_BOARDS = ["Gossiping", "Military", "PublicIssue",
     "Stock", "Finance", "Bank_Service", "Tech_Job", 
     "Soft_Job", "Salary","Boy-Girl", "WomenTalk", 
@@ -65,7 +75,10 @@ PTT_BOARDS = ["Gossiping", "Military", "PublicIssue",
     ]  # 預設要爬的看板清單
 """
 headers = {"User-Agent": "Mozilla/5.0"}
-DATE_LIMIT = datetime.today() - timedelta(days=DAYS_LIMIT)
+
+def _date_limit():
+    # 每次爬取時重新計算：常駐的 loop 與快照更新執行緒會存活數天，不能在匯入時固定
+    return datetime.now() - timedelta(days=DAYS_LIMIT)
 
 # ========= 清洗文章內容 =========
 def clean_content(raw_text: str) -> str:
@@ -79,10 +92,26 @@ def clean_content(raw_text: str) -> str:
     return re.sub(r'\n{3,}', '\n\n', "\n".join(cleaned)).strip()
 
 # ========= 抓單篇文章 =========
-async def fetch_post(session, href, visited_urls):
+async def fetch_post(session, href, visited_urls, push=None, date_limit=None):
+    """
+    push: 看板列表上的推文數（div.nrec）；與文章快取記錄的推文數相同且未過期時直接沿用快取，不重新下載。
+    date_limit: 早於此時間的文章不收錄，None 時為現在往前 DAYS_LIMIT 天。
+    """
+    date_limit = date_limit or _date_limit()
     url = PTT_URL + href
     if url in visited_urls:
         return None
+    # 先登記再抓取：多個看板同時進行時，同一篇文章只會被抓一次
+    visited_urls.add(url)
+
+    # 快取讀寫是阻塞的檔案 I/O，交給執行緒池，避免卡住共用 loop 上其他看板的抓取
+    article_cache = get_article_cache()
+    cached = await asyncio.to_thread(article_cache.lookup, url, push)
+    if cached:
+        post, published = cached
+        if published < date_limit.timestamp():
+            return None
+        return post
 
     try:
         async with session.get(url, cookies={'over18': '1'}, headers=headers) as resp:
@@ -91,56 +120,42 @@ async def fetch_post(session, href, visited_urls):
                 return None
 
             html = await resp.text()
-            soup = BeautifulSoup(html, 'html.parser')
-           
+            root = parse_html(html)
 
             date_str = ''
-            for tag, val in zip(soup.select('span.article-meta-tag'), soup.select('span.article-meta-value')):
-                if tag.text == '時間':
-                    date_str = val.text
+            for tag, val in zip(root.select('span.article-meta-tag'), root.select('span.article-meta-value')):
+                if tag.text() == '時間':
+                    date_str = val.text()
                     try:
                         parsed_time = datetime.strptime(date_str, "%a %b %d %H:%M:%S %Y")
-                        if parsed_time < DATE_LIMIT:
+                        if parsed_time < date_limit:
                             return None
                     except:
                         return None
                     break
 
-            main_content = soup.find(id='main-content')
+            main_content = root.select_one('#main-content')
             if not main_content:
                 return None
 
             # 擷取留言
             comments = []
-            for push in main_content.find_all("div", class_="push"):
-                try:
-                    tag = push.find("span", class_="push-tag")
-                    user = push.find("span", class_="push-userid")
-                    content = push.find("span", class_="push-content")
-                    if tag and user and content:
-                        comments.append(f"{tag.text.strip()} {user.text.strip()}: {content.text.strip().lstrip(':')}")
-                except:
-                    continue
+            for item in extract_items(main_content, PTT_PUSH_SPEC):
+                if item['tag'] is not None and item['user'] is not None and item['content'] is not None:
+                    comments.append(f"{item['tag']} {item['user']}: {item['content'].lstrip(':')}")
 
-            # 移除非留言的 tag
-            for tag in main_content.find_all(['div', 'span']):
-                if not isinstance(tag, Tag):
-                    continue
-                try:
-                    tag_class = tag.get('class') or []
-                    if 'push' not in tag_class:
-                        tag.decompose()
-                except:
-                    continue
+            # 移除非留言的 tag（由後往前移除，子元素會先於父元素被處理）
+            for tag in reversed(main_content.select('div, span')):
+                if 'push' not in tag.classes():
+                    tag.remove()
 
-            content_raw = main_content.get_text('\n').strip()
+            content_raw = main_content.text('\n').strip()
             content_cleaned = clean_content(content_raw)
 
-            title_tag = soup.find('title')
-            title = title_tag.text.strip() if title_tag else '(無標題)'
+            title_tag = root.select_one('title')
+            title = title_tag.text().strip() if title_tag else '(無標題)'
 
-            visited_urls.add(url)
-            return {
+            post = {
                 'title': title,
                 'date': convert_time_format(date_str),
                 'post_url': url,
@@ -148,85 +163,281 @@ async def fetch_post(session, href, visited_urls):
                 'comments': comments, # 若要改用「｜」分隔可改成："｜".join(comments)
                 'source': 'PTT',
             }
+            await asyncio.to_thread(article_cache.store, url, push, post, parsed_time.timestamp())
+            return post
 
     except:
         return None
 
 # ========= 抓一個看板 =========
-async def crawl_board(board_name, visited_urls):
+async def crawl_board(board_name, visited_urls, session=None, date_limit=None):
+    """
+    session: 共用的 aiohttp.ClientSession，None 時自行建立一個（單獨爬一個看板時使用）。
+    date_limit: 早於此時間的文章不收錄，None 時為現在往前 DAYS_LIMIT 天。
+    """
+    if session is None:
+        async with _new_session() as own_session:
+            return await crawl_board(board_name, visited_urls, own_session, date_limit)
+    date_limit = date_limit or _date_limit()
+
     posts = []
     collected = 0
     page_index = ''
 
-    async with aiohttp.ClientSession() as session:
-        for _ in range(PAGES_TO_CHECK):
-            page_url = f"{PTT_URL}/bbs/{board_name}/index{page_index}.html" if page_index else f"{PTT_URL}/bbs/{board_name}/index.html"
+    for _ in range(PAGES_TO_CHECK):
+        page_url = f"{PTT_URL}/bbs/{board_name}/index{page_index}.html" if page_index else f"{PTT_URL}/bbs/{board_name}/index.html"
 
-            try:
-                async with session.get(page_url, cookies={'over18': '1'}, headers=headers) as resp:
-                    if resp.status != 200:
-                        continue
-                    html = await resp.text()
-            except:
-                continue
+        try:
+            async with session.get(page_url, cookies={'over18': '1'}, headers=headers) as resp:
+                if resp.status != 200:
+                    continue
+                html = await resp.text()
+        except:
+            continue
 
-            soup = BeautifulSoup(html, 'html.parser')
-            if not soup:
-                print('PTT,board無資料')
+        root = parse_html(html)
+        tasks = []
+
+        for entry in extract_items(root, PTT_BOARD_SPEC):
+            push_text = entry['push']
+            if push_text is None or not entry['href']:
+                continue
+            is_hot = (push_text == '爆') or (push_text.isdigit() and int(push_text) >= PUSH_LIMIT)
+            if not is_hot:
                 continue
-            tasks = []
 
-            for entry in soup.select('div.r-ent'):
-                try:
-                    push_text = entry.select_one('div.nrec').text.strip()
-                    is_hot = (push_text == '爆') or (push_text.isdigit() and int(push_text) >= PUSH_LIMIT)
-                    if not is_hot:
-                        continue
+            tasks.append(fetch_post(session, entry['href'], visited_urls, push_text, date_limit))
 
-                    link_tag = entry.select_one('div.title a')
-                    if not link_tag:
-                        continue
+            if len(tasks) >= MAX_POSTS_PER_BOARD - collected:
+                break
 
-                    href = link_tag['href']
-                    tasks.append(fetch_post(session, href, visited_urls))
+        results = await asyncio.gather(*tasks)
+        for post in results:
+            if post:
+                posts.append(post)
+                collected += 1
+                if collected >= MAX_POSTS_PER_BOARD:
+                    return posts
 
-                    if len(tasks) >= MAX_POSTS_PER_BOARD - collected:
-                        break
-                except:
-                    continue
+        # 下一頁
+        for btn in extract_items(root, PTT_PAGING_SPEC):
+            if '上頁' in btn['label']:
+                m = re.search(r'index(\d+)\.html', btn['href'])
+                if m:
+                    page_index = m.group(1)
 
-            results = await asyncio.gather(*tasks)
-            for post in results:
-                if post:
-                    posts.append(post)
-                    collected += 1
-                    if collected >= MAX_POSTS_PER_BOARD:
-                        return posts
+        await asyncio.sleep(SLEEP_SECONDS)  # 每頁之間延遲
 
-            # 下一頁
-            prev_btns = soup.find_all('a', class_='btn wide')
-            for btn in prev_btns:
-                if '上頁' in btn.text:
-                    m = re.search(r'index(\d+)\.html', btn['href'])
-                    if m:
-                        page_index = m.group(1)
+    return posts
 
-            await asyncio.sleep(SLEEP_SECONDS)  # 每頁之間延遲
+# ========= 以看板搜尋抓取符合關鍵字的文章 =========
+def _listing_date(text):
+    """
+    把列表上的 " 7/27" 轉成 date（列表不含年份，晚於今天者視為去年）。無法解析時回傳 None。
+    """
+    try:
+        month, day = (int(part) for part in text.strip().split('/'))
+        today = datetime.today().date()
+        listed = today.replace(month=month, day=day)
+    except (AttributeError, ValueError):
+        return None
+    if listed > today:
+        listed = listed.replace(year=today.year - 1)
+    return listed
 
-    return posts
+async def search_board(board_name, keyword, visited_urls, session, date_limit=None):
+    """
+    用 PTT 看板搜尋（標題比對）找出候選文章，只下載符合條件的文章全文。
+    搜尋結果由新到舊排列，遇到早於 date_limit（預設為 DAYS_LIMIT 天前）的文章即停止翻頁。
+    """
+    date_limit = date_limit or _date_limit()
+    posts = []
+    for page in range(1, SEARCH_PAGES + 1):
+        page_url = f"{PTT_URL}/bbs/{board_name}/search?page={page}&q={quote(keyword)}"
+        try:
+            async with session.get(page_url, cookies={'over18': '1'}, headers=headers) as resp:
+                if resp.status != 200:
+                    break  # 沒有搜尋結果時 PTT 回傳 404
+                html = await resp.text()
+        except:
+            break
+
+        entries = extract_items(parse_html(html), PTT_SEARCH_SPEC)
+        if not entries:
+            break
+
+        tasks = []
+        too_old = False
+        for entry in entries:
+            listed = _listing_date(entry['date'] or '')
+            if listed and listed < date_limit.date():
+                too_old = True
+                break
+            push_text = entry['push']
+            if push_text is None or not entry['href']:
+                continue
+            is_hot = (push_text == '爆') or (push_text.isdigit() and int(push_text) >= PUSH_LIMIT)
+            if not is_hot:
+                continue
+            tasks.append(fetch_post(session, entry['href'], visited_urls, push_text, date_limit))
+            if len(tasks) >= MAX_POSTS_PER_BOARD - len(posts):
+                break
+
+        for post in await asyncio.gather(*tasks):
+            if post:
+                posts.append(post)
+        if too_old or len(posts) >= MAX_POSTS_PER_BOARD:
+            break
+        await asyncio.sleep(SLEEP_SECONDS)
+    return posts[:MAX_POSTS_PER_BOARD]
 
 # ========= 主爬蟲流程 =========
-async def _main():
+def _new_session(max_concurrency=None):
+    # 連線池上限即所有看板共用的同時請求上限，keep-alive 連線在看板之間重用
+    connector = aiohttp.TCPConnector(limit=max_concurrency or PTT_MAX_CONCURRENCY)
+    return aiohttp.ClientSession(connector=connector)
+
+async def _main(all_posts=None, max_concurrency=None, board_concurrency=None, keyword=None):
+    """
+    以共用的 session 同時爬取多個看板（最多 board_concurrency 個），
+    結果依 PTT_BOARDS 的順序合併；被取消時（例如超過時間預算）仍會放入已完成看板的文章。
+    keyword: 有值時改用看板搜尋（search_board），只抓符合關鍵字的文章。
+    max_concurrency: None 時使用常駐 loop 上長期存在的 session（連線在多次爬取之間重用），
+                     指定時另建一個該連線上限的 session，爬完即關閉。
+    """
     visited_urls = set()
-    all_posts = []
-    for board in PTT_BOARDS:
-        posts = await crawl_board(board, visited_urls)
-        all_posts.extend(posts)
+    date_limit = _date_limit()  # 同一次爬取的所有看板使用相同的截止時間
+    all_posts = [] if all_posts is None else all_posts
+    board_posts = {}
+    board_semaphore = asyncio.Semaphore(board_concurrency or PTT_BOARD_CONCURRENCY)
+
+    async def _crawl(board, session):
+        async with board_semaphore:
+            if keyword:
+                board_posts[board] = await search_board(board, keyword, visited_urls, session, date_limit)
+            else:
+                board_posts[board] = await crawl_board(board, visited_urls, session, date_limit)
+
+    try:
+        if max_concurrency is None:
+            session = await get_runtime().session('ptt', _new_session)
+            await asyncio.gather(*(_crawl(board, session) for board in PTT_BOARDS), return_exceptions=True)
+        else:
+            async with _new_session(max_concurrency) as session:
+                await asyncio.gather(*(_crawl(board, session) for board in PTT_BOARDS), return_exceptions=True)
+    finally:
+        for board in PTT_BOARDS:
+            all_posts.extend(board_posts.get(board, []))
     return all_posts
 
 # ========= 外部匯入的主函式 =========
-def get_ptt_posts():
-    return asyncio.run(_main())
+def get_ptt_posts(deadline=None, partial_sources=None, max_concurrency=None, keyword=None):
+    """
+    deadline: Deadline 或秒數；時間到時取消爬取，回傳已完成看板的文章，並把 'PTT' 加入 partial_sources（set）。
+    max_concurrency: 同時連線上限，None 時使用 PTT_MAX_CONCURRENCY。
+    keyword: 有值時以看板搜尋只抓符合關鍵字（標題）的文章，否則抓各看板的熱門文章。
+    """
+    deadline = Deadline.coerce(deadline)
+    all_posts = []
+
+    async def _run():
+        try:
+            await asyncio.wait_for(_main(all_posts, max_concurrency, keyword=keyword), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            print(f"⏰ PTT 超過時間預算，僅取得 {len(all_posts)} 篇")
+            if partial_sources is not None:
+                partial_sources.add('PTT')
+
+    # 在常駐的爬蟲 loop 上執行；逾時由 wait_for 在 loop 內處理，確保已完成看板的文章都已合併
+    get_runtime().run(_run())
+    print_article_cache_stats()
+    return all_posts
+# ========= 跨搜尋共用的熱門文章快照 =========
+PTT_SNAPSHOT_TTL = 900        # 快照最長可用秒數，超過（或尚無快照）時由搜尋同步爬取
+PTT_SNAPSHOT_REFRESH = 300    # 背景執行緒每隔幾秒重新爬取一次快照
+
+_snapshot = {'posts': None, 'fetched_at': 0.0}
+_snapshot_lock = threading.Lock()     # 保護 _snapshot 的讀寫
+_refresh_lock = threading.Lock()      # 同一時間只有一個執行緒在爬取快照
+_refresher = None
+_refresher_pid = None                 # 啟動背景執行緒的程序；fork 出的子程序沒有這個執行緒，需要重新啟動
+
+def _refresh_snapshot(deadline=None, partial_sources=None):
+    get_article_cache().prune()
+    partial = set()
+    posts = get_ptt_posts(deadline, partial)
+    if partial:
+        # 不完整的結果不寫入快照，避免之後的搜尋都拿到殘缺資料
+        if partial_sources is not None:
+            partial_sources.update(partial)
+        return posts
+    with _snapshot_lock:
+        _snapshot['posts'] = posts
+        _snapshot['fetched_at'] = time.monotonic()
+    print(f"📸 PTT 快照已更新，共 {len(posts)} 篇")
+    return posts
+
+def _snapshot_age():
+    with _snapshot_lock:
+        if _snapshot['posts'] is None:
+            return float('inf')
+        return time.monotonic() - _snapshot['fetched_at']
+
+def _refresher_loop():
+    # 啟動後立即爬取一次（伺服器啟動時呼叫，第一個搜尋就能使用快照）；
+    # 之後每 PTT_SNAPSHOT_REFRESH 秒更新，期間已由搜尋同步更新過則略過這一輪
+    while True:
+        with _refresh_lock:
+            if _snapshot_age() >= PTT_SNAPSHOT_REFRESH:
+                try:
+                    _refresh_snapshot()
+                except Exception as e:
+                    print(f"❌ PTT 快照背景更新失敗：{e}")
+        time.sleep(PTT_SNAPSHOT_REFRESH)
+
+def start_ptt_snapshot_refresher():
+    """
+    啟動背景更新執行緒（每個程序一個）。fork 出的子程序（如 gunicorn worker）會繼承 _refresher，
+    但執行緒本身不會跟著 fork，因此以程序 ID 與 is_alive() 判斷是否需要重新啟動。
+    """
+    global _refresher, _refresher_pid
+    with _snapshot_lock:
+        if _refresher is None or _refresher_pid != os.getpid() or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresher_loop, name='ptt-snapshot', daemon=True)
+            _refresher_pid = os.getpid()
+            _refresher.start()
+
+def _fresh_snapshot():
+    with _snapshot_lock:
+        posts = _snapshot['posts']
+        if posts is not None and time.monotonic() - _snapshot['fetched_at'] < PTT_SNAPSHOT_TTL:
+            return posts
+    return None
+
+def get_ptt_snapshot(deadline=None, partial_sources=None):
+    """
+    取得與關鍵字無關的近期熱門文章快照（各看板的熱門文章），供每次搜尋在記憶體中過濾。
+    快照由背景執行緒定期更新，搜尋不需要等待爬取；只有在程序剛啟動或快照過期時才會同步爬取。
+    回傳的是每篇文章的淺拷貝，後續分析修改欄位不會影響快照本身。
+    """
+    start_ptt_snapshot_refresher()
+    posts = _fresh_snapshot()
+    if posts is None:
+        deadline = Deadline.coerce(deadline)
+        remaining = deadline.remaining()
+        if not _refresh_lock.acquire(timeout=-1 if remaining is None else remaining):
+            if partial_sources is not None:
+                partial_sources.add('PTT')
+            return []
+        try:
+            # 等待鎖的期間可能已由其他執行緒更新完成
+            posts = _fresh_snapshot()
+            if posts is None:
+                posts = _refresh_snapshot(deadline, partial_sources)
+        finally:
+            _refresh_lock.release()
+    return [dict(post) for post in posts]
+
 def ptt_keyword(keyword,posts):
     ptt_post = []
     for post in posts:
@@ -241,6 +452,27 @@ def ptt_keyword(keyword,posts):
                     break
     return ptt_post
 
+def get_ptt_posts_for_keyword(keyword, deadline=None, partial_sources=None):
+    """
+    取得與關鍵字相關的 PTT 文章。
+    snapshot 模式（預設）：只過濾熱門文章快照，快照由背景執行緒更新，搜尋請求內不爬取 PTT。
+    search 模式（選用）：用看板搜尋只下載候選文章，再併入快照中（內文或留言）符合的文章；
+        看板搜尋在請求內進行，受 deadline 限制，超時時只回傳已取得的部分。
+    """
+    if not keyword.strip():
+        return get_ptt_snapshot(deadline, partial_sources)
+    if PTT_KEYWORD_MODE != 'search':
+        return ptt_keyword(keyword, get_ptt_snapshot(deadline, partial_sources))
+
+    start_ptt_snapshot_refresher()
+    posts = get_ptt_posts(deadline, partial_sources, keyword=keyword)
+    seen = {post['post_url'] for post in posts}
+    for post in ptt_keyword(keyword, _fresh_snapshot() or []):
+        if post['post_url'] not in seen:
+            posts.append(dict(post))
+    print(f"🔎 PTT 關鍵字搜尋「{keyword}」：共 {len(posts)} 篇")
+    return posts
+
 if __name__ == "__main__":
     posts = get_ptt_posts()
     print(f"\n🎯 共獲取 {len(posts)} 篇文章")
@@ -58,7 +58,10 @@ class RAGService:
                 # 檢查必要的欄位是否存在，以防 KeyError
                 if 'summary' in d and 'title' in d:
                     documents.append(d['summary'])
-                    metadatas.append({'title': d['title'], 'sentiment': d.get('sentiment'), 'category': d.get('category')})
+                    # 關鍵詞沿用文件分析的結果（ChromaDB 的 metadata 值不能是 list，以字串保存）
+                    tags = d['analysis']['tags'] if d.get('analysis') else d.get('news_tag') or []
+                    metadatas.append({'title': d['title'], 'sentiment': d.get('sentiment'), 'category': d.get('category'),
+                                      'tags': '、'.join(tags)})
                     ids.append(article_id)
                     # 💡 將 ID 加入到當前批次的追蹤集合中
                     ids_in_current_batch.add(article_id)
@@ -0,0 +1,178 @@
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .aggregates import SENTIMENT_KEYS, filtered_rows
+from .models import News, Posts, SentimentRollup
+
+
+# ========= 增量更新 =========
+def _local_day(value):
+    if isinstance(value, datetime):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return timezone.localtime(value).date()
+    return value
+
+
+def _contribution(row):
+    """
+    一篇文章對彙總表的貢獻：((keyword, source, category, day, sentiment), 分數)；資料不完整時回傳 None。
+    """
+    if row is None or not row.get('publish_date') or not row.get('sentiment'):
+        return None
+    key = (row['keyword'], row['source'], row.get('category') or '', _local_day(row['publish_date']), row['sentiment'])
+    return key, row.get('sentiment_score') or 0.0
+
+
+def _apply_delta(key, count, score):
+    """
+    以 F() 原地加減一列彙總值，列不存在時建立（同時建立的競爭以 unique_together 擋下後改為更新）。
+    """
+    if not count and not score:
+        return
+    keyword, source, category, day, sentiment = key
+    rows = SentimentRollup.objects.filter(keyword=keyword, source=source, category=category, day=day, sentiment=sentiment)
+    delta = {'count': F('count') + count, 'score_sum': F('score_sum') + score, 'updated_at': timezone.now()}
+    if rows.update(**delta):
+        return
+    try:
+        with transaction.atomic():
+            SentimentRollup.objects.create(keyword=keyword, source=source, category=category, day=day,
+                                           sentiment=sentiment, count=count, score_sum=score)
+    except IntegrityError:
+        rows.update(**delta)
+
+
+def apply_change(previous, current):
+    """
+    依文章儲存前後的欄位值更新彙總表：扣掉舊的貢獻、加上新的貢獻；鍵相同時只更新分數差。
+    previous / current 為欄位 dict，新增時 previous 為 None，刪除時 current 為 None。
+    """
+    old, new = _contribution(previous), _contribution(current)
+    if old and new and old[0] == new[0]:
+        _apply_delta(new[0], 0, new[1] - old[1])
+        return
+    if old:
+        _apply_delta(old[0], -1, -old[1])
+    if new:
+        _apply_delta(new[0], 1, new[1])
+
+
+def _values(instance):
+    return {field: getattr(instance, field) for field in instance.ROLLUP_FIELDS}
+
+
+def _remember_previous(sender, instance, raw=False, **kwargs):
+    """
+    舊值由 RollupSnapshotMixin.from_db 在載入時記下（update_or_create 也是先載入再儲存），這裡不需查詢。
+    只有自行指定 pk 建立的物件、或以 only() / defer() 載入的物件沒有快照，才向資料庫讀一次。
+    """
+    if raw or hasattr(instance, '_rollup_previous'):
+        return
+    instance._rollup_previous = (
+        sender.objects.filter(pk=instance.pk).values(*sender.ROLLUP_FIELDS).first() if instance.pk else None
+    )
+
+
+def _update_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = _values(instance)
+    apply_change(getattr(instance, '_rollup_previous', None), current)
+    instance._rollup_previous = current  # 同一個物件再次儲存時以這次的值為舊值
+
+
+def _update_on_delete(sender, instance, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    apply_change(previous if previous is not None else _values(instance), None)
+
+
+def connect_signals():
+    """
+    在 AnalyzerConfig.ready 呼叫：News / Posts 經由 save() / delete() 寫入時同步更新彙總表。
+    QuerySet.update() 與 bulk_create() 不會觸發訊號，使用後需呼叫 rebuild_rollups()。
+    """
+    for model in (News, Posts):
+        pre_save.connect(_remember_previous, sender=model, dispatch_uid=f'rollup_pre_save_{model.__name__}')
+        post_save.connect(_update_on_save, sender=model, dispatch_uid=f'rollup_post_save_{model.__name__}')
+        post_delete.connect(_update_on_delete, sender=model, dispatch_uid=f'rollup_post_delete_{model.__name__}')
+
+
+# ========= 重建 =========
+def rebuild_rollups(keyword=None):
+    """
+    從 News / Posts 重新彙總（keyword 為 None 時重建全部），回傳寫入的列數。
+    """
+    with transaction.atomic():
+        existing = SentimentRollup.objects.all()
+        if keyword is not None:
+            existing = existing.filter(keyword=keyword)
+        existing.delete()
+
+        rollups = []
+        for model in (News, Posts):
+            group_by = ['keyword', 'source', 'day', 'sentiment'] + (['category'] if model is News else [])
+            rows = (filtered_rows(model, keyword=keyword)
+                    .annotate(day=TruncDate('publish_date', tzinfo=timezone.get_current_timezone()))
+                    .values(*group_by).annotate(n=Count('id'), score=Sum('sentiment_score')).order_by())
+            for row in rows:
+                rollups.append(SentimentRollup(
+                    keyword=row['keyword'], source=row['source'], category=row.get('category') or '',
+                    day=row['day'], sentiment=row['sentiment'], count=row['n'], score_sum=row['score'] or 0.0,
+                ))
+        SentimentRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+# ========= 查詢 =========
+def _rollup_rows(keyword, start=None, end=None, sources=None):
+    rows = SentimentRollup.objects.filter(keyword=keyword)
+    if start is not None:
+        rows = rows.filter(day__gte=start)
+    if end is not None:
+        rows = rows.filter(day__lte=end)
+    if sources is not None:
+        rows = rows.filter(source__in=list(sources))
+    return rows
+
+
+def daily_sentiment(keyword, start=None, end=None, sources=None):
+    """
+    每日各情緒文章數與平均分數，只讀彙總表（每天最多 來源×類別×3 列）。
+    :return: {日期字串: {'positive': n, 'neutral': n, 'negative': n, 'total': n, 'avg_score': float}}，依日期排序
+    """
+    days = {}
+    rows = (_rollup_rows(keyword, start, end, sources)
+            .values('day', 'sentiment').annotate(n=Sum('count'), score=Sum('score_sum')).order_by('day'))
+    for row in rows:
+        cell = days.setdefault(row['day'].strftime('%Y-%m-%d'),
+                               {'positive': 0, 'neutral': 0, 'negative': 0, 'total': 0, 'score_sum': 0.0})
+        key = SENTIMENT_KEYS.get(row['sentiment'])
+        if key is not None:
+            cell[key] += row['n']
+        cell['total'] += row['n']
+        cell['score_sum'] += row['score'] or 0.0
+    for cell in days.values():
+        cell['avg_score'] = cell.pop('score_sum') / cell['total'] if cell['total'] else None
+    return days
+
+
+def sentiment_ratio(keyword, start=None, end=None, sources=None):
+    """
+    期間內的正面 / 中立 / 負面比例（0~1）與文章總數。
+    """
+    totals = {'positive': 0, 'neutral': 0, 'negative': 0}
+    rows = _rollup_rows(keyword, start, end, sources).values('sentiment').annotate(n=Sum('count')).order_by()
+    for row in rows:
+        key = SENTIMENT_KEYS.get(row['sentiment'])
+        if key is not None:
+            totals[key] += row['n']
+    total = sum(totals.values())
+    ratio = {key: (value / total if total else 0.0) for key, value in totals.items()}
+    ratio['total'] = total
+    return ratio
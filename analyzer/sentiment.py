@@ -0,0 +1,145 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from .models import News, Posts, SentimentCache
+from .nlp_stage import score_sentiments
+
+# ========= 可依需求修改的參數 =========
+SENTIMENT_MEMORY_SIZE = 20000   # 行程內最多記住幾筆「內容雜湊 → 分數」
+POSITIVE_THRESHOLD = 0.6        # 分數 ≥ 此值為正面
+NEGATIVE_THRESHOLD = 0.4        # 分數 ≤ 此值為負面，介於兩者之間為中立
+SENTIMENT_ENGINE = 'numpy'      # 'numpy'：向量化批次計分（分數與 SnowNLP 相同）；'snownlp'：逐篇使用 SnowNLP
+
+
+def sentiment_text(article):
+    """
+    情緒分析使用的文字：先使用 summary，若為空則用 title。
+    """
+    return article['summary'] if article.get('summary') else article.get('title', '')
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def sentiment_label(score):
+    # 0~0.4 負面、0.4~0.6 中立、0.6~1 正面
+    if score >= POSITIVE_THRESHOLD:
+        return '正面'
+    if score <= NEGATIVE_THRESHOLD:
+        return '負面'
+    return '中立'
+
+
+class SentimentService:
+    """
+    情緒分數服務：同一段文字在整個系統中只計算一次。
+    查詢順序：行程內 LRU → SentimentCache 表（以內容雜湊為鍵）→ News / Posts 已存的 sentiment_score
+    （網址相同且內容未變時沿用）→ 以上都沒有才實際計算（交給 nlp_stage 的行程池），並寫回 SentimentCache。
+    """
+    def __init__(self, scorer=None, memory_size=SENTIMENT_MEMORY_SIZE):
+        self.scorer = scorer or partial(score_sentiments, engine=SENTIMENT_ENGINE)
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory': 0, 'cache_table': 0, 'stored_rows': 0, 'computed': 0}
+
+    # ----- 行程內 LRU -----
+    def _remember(self, scores):
+        with self._lock:
+            for key, score in scores.items():
+                self._memory[key] = score
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _from_memory(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+        return found
+
+    # ----- 資料庫 -----
+    @staticmethod
+    def _from_cache_table(keys):
+        return dict(SentimentCache.objects.filter(content_hash__in=keys).values_list('content_hash', 'sentiment_score'))
+
+    @staticmethod
+    def _from_stored_rows(url_by_key, text_by_key):
+        """
+        沿用 News / Posts 已計算過的分數：網址相同，且當時計算所用的文字與現在相同。
+        """
+        urls = {url: key for key, url in url_by_key.items() if url}
+        found = {}
+        if not urls:
+            return found
+        for model in (News, Posts):
+            rows = model.objects.filter(url__in=list(urls)).values_list('url', 'summary', 'title', 'sentiment_score')
+            for url, summary, title, score in rows:
+                key = urls[url]
+                if score is not None and sentiment_text({'summary': summary, 'title': title}) == text_by_key[key]:
+                    found[key] = score
+        return found
+
+    @staticmethod
+    def _store(scores):
+        SentimentCache.objects.bulk_create(
+            [SentimentCache(content_hash=key, sentiment_score=score) for key, score in scores.items()],
+            ignore_conflicts=True,
+        )
+
+    # ----- 對外介面 -----
+    def score_texts(self, texts, urls=None):
+        """
+        批次取得分數，回傳與 texts 同順序的 list。
+        urls: 與 texts 對應的網址（可為 None），用來沿用 News / Posts 已存的分數。
+        """
+        keys = [content_hash(text) for text in texts]
+        text_by_key = dict(zip(keys, texts))
+        url_by_key = dict(zip(keys, urls)) if urls else {}
+
+        scores = self._from_memory(text_by_key)
+        self.stats['memory'] += len(scores)
+
+        missing = [key for key in text_by_key if key not in scores]
+        if missing:
+            cached = self._from_cache_table(missing)
+            self.stats['cache_table'] += len(cached)
+            scores.update(cached)
+
+            missing = [key for key in missing if key not in scores]
+            reused = self._from_stored_rows({key: url_by_key.get(key) for key in missing}, text_by_key)
+            self.stats['stored_rows'] += len(reused)
+            scores.update(reused)
+
+            missing = [key for key in missing if key not in scores]
+            computed = dict(zip(missing, self.scorer([text_by_key[key] for key in missing])))
+            self.stats['computed'] += len(computed)
+            scores.update(computed)
+
+            self._store({**reused, **computed})
+        self._remember(scores)
+        return [scores[key] for key in keys]
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"🧮 情緒分數：記憶體 {stats['memory']}，快取表 {stats['cache_table']}，"
+              f"沿用已存文章 {stats['stored_rows']}，新計算 {stats['computed']}")
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_sentiment_service():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SentimentService()
+    return _service
@@ -1,3 +1,541 @@
-from django.test import TestCase
+import itertools
+import os
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from requests.structures import CaseInsensitiveDict
+
+from . import host_guard, http_cache, ptt_article_cache
+from .aggregates import sentiment_counts, sentiment_matrix
+from .article_batch import ArticleBatch, _synthetic_posts
+from .crawl_engine import NewsSource, crawl_source
+from .deadline import Deadline
+from .host_guard import AdaptiveLimiter, CircuitBreaker, HostGuard, HostUnavailable
+from .http_cache import ResponseCache, cached_get
+from .models import CrawlWatermark, News, Posts, SentimentCache, SentimentRollup
+from .nlp_stage import NlpStage
+from .ptt_article_cache import PTT_ARTICLE_TTL, PTT_SATURATED_TTL, PttArticleCache
+from .rollups import rebuild_rollups
+from .sentiment import SentimentService, content_hash, sentiment_label
+from .utils import _batch_save_news, count_sentiment, news_post_counter, sentiment_feq
 
 # Create your tests here.
+
+
+def _aware(year, month, day, hour=12):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+def _news(url, sentiment, score, category='生活', source='TVBS', keyword='颱風', publish_date=None, summary='颱風來襲'):
+    return News(keyword=keyword, source=source, title=f'標題 {url}', publish_date=publish_date or _aware(2026, 10, 1),
+                summary=summary, tags=[], url=url, category=category, sentiment=sentiment, sentiment_score=score)
+
+
+# ========= HTTP 回應快取 =========
+def _http_response(body, status=200, headers=None, url='https://news.tvbs.com.tw/search/1'):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.url = url
+    response.encoding = 'utf-8'
+    response.headers = CaseInsensitiveDict(headers or {})
+    return response
+
+
+class _StubFetch:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.headers = []
+
+    def __call__(self, url, headers=None, **kwargs):
+        self.headers.append(headers)
+        return self.responses.pop(0)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    URL = 'https://news.tvbs.com.tw/search/1'
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = ResponseCache(cache_dir=tmp.name, max_bytes=1024)
+        patcher = mock.patch.object(http_cache, '_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fresh_entry_is_served_without_request(self):
+        cached_get(_StubFetch(_http_response(b'page')), self.URL, ttl=600)
+        fetch = _StubFetch()
+        self.assertEqual(cached_get(fetch, self.URL, ttl=600).content, b'page')
+        self.assertEqual(fetch.headers, [])
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+    def test_stale_entry_is_revalidated_with_304(self):
+        cached_get(_StubFetch(_http_response(b'page', headers={'ETag': '"v1"'})), self.URL, ttl=600)
+        fetch = _StubFetch(_http_response(b'', status=304))
+        response = cached_get(fetch, self.URL, ttl=0)
+        self.assertEqual(response.content, b'page')
+        self.assertEqual(fetch.headers[0]['If-None-Match'], '"v1"')
+        self.assertEqual(self.cache.stats['revalidated'], 1)
+
+    def test_304_with_missing_blob_refetches_unconditionally(self):
+        cached_get(_StubFetch(_http_response(b'page', headers={'ETag': '"v1"'})), self.URL, ttl=600)
+        for name in os.listdir(self.cache.blob_dir):
+            os.remove(os.path.join(self.cache.blob_dir, name))
+        fetch = _StubFetch(_http_response(b'', status=304), _http_response(b'new page', headers={'ETag': '"v2"'}))
+        self.assertEqual(cached_get(fetch, self.URL, ttl=0).content, b'new page')
+        self.assertIn('If-None-Match', fetch.headers[0])
+        self.assertNotIn('If-None-Match', fetch.headers[1])
+        self.assertEqual(self.cache.lookup(self.URL)['headers']['ETag'], '"v2"')
+
+    def test_evicts_least_recently_used(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = ResponseCache(cache_dir=tmp.name, max_bytes=10)
+        clock = itertools.count(1000)
+        with mock.patch.object(http_cache.time, 'time', lambda: next(clock)):
+            cache.store('https://example.com/a', _http_response(b'aaaa'))
+            cache.store('https://example.com/b', _http_response(b'bbbb'))
+            cache.to_response(cache.lookup('https://example.com/a'))     # a 變成最近使用
+            cache.store('https://example.com/c', _http_response(b'cccc'))
+        self.assertIsNotNone(cache.lookup('https://example.com/a'))
+        self.assertIsNone(cache.lookup('https://example.com/b'))
+        self.assertIsNotNone(cache.lookup('https://example.com/c'))
+        self.assertEqual(cache.stats['evictions'], 1)
+
+
+# ========= 主機限速與斷路器 =========
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failures=2, cooldown=60)
+        breaker.record(False)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failures=2, cooldown=60)
+        breaker.record(False)
+        breaker.record(True)
+        breaker.record(False)
+        self.assertEqual((breaker.state, breaker.failures), ('closed', 1))
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker(failures=1, cooldown=60)
+        breaker.record(False)
+        breaker.opened_at -= 61  # 冷卻結束
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertFalse(breaker.allow())  # 試探請求尚未回來前不再放行
+
+        breaker.record(False)
+        self.assertEqual(breaker.state, 'open')
+        breaker.opened_at -= 61
+        self.assertTrue(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(breaker.state, 'closed')
+
+
+class AdaptiveLimiterTests(SimpleTestCase):
+    def test_halves_on_overload_and_grows_additively(self):
+        limiter = AdaptiveLimiter(4, min_limit=1)
+        for expected in (2, 1, 1):
+            limiter.acquire()
+            limiter.release(overloaded=True)
+            self.assertEqual(limiter.limit, expected)
+        limiter.acquire()
+        limiter.release(overloaded=False)
+        self.assertEqual(limiter.limit, 2)
+        for _ in range(10):
+            limiter.acquire()
+            limiter.release(overloaded=False)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_blocks_at_limit(self):
+        limiter = AdaptiveLimiter(1)
+        limiter.acquire()
+        acquired = threading.Event()
+        worker = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+        worker.start()
+        self.assertFalse(acquired.wait(0.2))
+        limiter.release(overloaded=False)
+        self.assertTrue(acquired.wait(5))
+        worker.join()
+        self.assertEqual(limiter.in_flight, 1)
+
+
+class HostGuardTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(host_guard, 'HOST_BACKOFF', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_overloaded_responses(self):
+        fetch = _StubFetch(_http_response(b'', status=503), _http_response(b'ok'))
+        guard = HostGuard('example.com', rate=100, burst=10, failures=5)
+        self.assertEqual(guard.call(fetch, 'https://example.com/').content, b'ok')
+        self.assertEqual(len(fetch.headers), 2)
+        self.assertEqual(guard.breaker.state, 'closed')
+
+    def test_open_breaker_stops_retrying(self):
+        fetch = _StubFetch(_http_response(b'', status=503), _http_response(b'ok'))
+        guard = HostGuard('example.com', rate=100, burst=10, failures=1)
+        self.assertEqual(guard.call(fetch, 'https://example.com/').status_code, 503)
+        self.assertEqual(len(fetch.headers), 1)
+        with self.assertRaises(HostUnavailable):
+            guard.call(fetch, 'https://example.com/')
+
+
+# ========= 爬取引擎 =========
+class _StubSite:
+    """
+    假的新聞網站：pages 為 {頁碼: [網址, ...]}，記錄抓取與解析過的頁碼。
+    """
+    def __init__(self, pages, block_page=None):
+        self.pages = pages
+        self.block_page = block_page
+        self.release = threading.Event()
+        self.fetched = []
+        self.parsed = []
+
+    def source(self):
+        return NewsSource('測試來源', self.build_url, self.parse_page, max_pages=len(self.pages), concurrency=1)
+
+    @staticmethod
+    def build_url(keyword, page, days):
+        return f'https://example.com/search/{keyword}/{page}'
+
+    def fetch_page(self, url, headers=None, timeout=None):
+        page = int(url.rsplit('/', 1)[1])
+        self.fetched.append(page)
+        if page == self.block_page:
+            self.release.wait(5)
+        return str(page)
+
+    def parse_page(self, html_text, keyword, cutoff):
+        page = int(html_text)
+        self.parsed.append(page)
+        return [{'news_url': url} for url in self.pages[page]], False
+
+
+class CrawlSourceTests(SimpleTestCase):
+    PAGES = {1: ['u1', 'u2'], 2: ['u3', 'u4'], 3: ['u5']}
+
+    def test_stops_at_first_known_url(self):
+        site = _StubSite(self.PAGES)
+        with mock.patch('analyzer.crawl_engine.fetch_page', site.fetch_page):
+            items = crawl_source(site.source(), '颱風', known_urls={'u4'})
+        self.assertEqual([item['news_url'] for item in items], ['u1', 'u2', 'u3'])
+        self.assertEqual(site.fetched, [1, 2])
+        self.assertEqual(site.parsed, [1, 2])
+
+    def test_without_known_urls_crawls_every_page(self):
+        site = _StubSite(self.PAGES)
+        with mock.patch('analyzer.crawl_engine.fetch_page', site.fetch_page):
+            items = crawl_source(site.source(), '颱風')
+        self.assertEqual([item['news_url'] for item in items], ['u1', 'u2', 'u3', 'u4', 'u5'])
+
+
+# ========= 爬取時間預算 =========
+class CrawlDeadlineTests(SimpleTestCase):
+    def test_expired_deadline_returns_partial_results(self):
+        site = _StubSite(CrawlSourceTests.PAGES, block_page=2)
+        partial_sources = set()
+        try:
+            with mock.patch('analyzer.crawl_engine.fetch_page', site.fetch_page):
+                items = crawl_source(site.source(), '颱風', deadline=Deadline(0.5), partial_sources=partial_sources)
+        finally:
+            site.release.set()
+        self.assertEqual([item['news_url'] for item in items], ['u1', 'u2'])
+        self.assertEqual(partial_sources, {'測試來源'})
+
+
+class PartialSourceWatermarkTests(TestCase):
+    @staticmethod
+    def article(url, source):
+        return {'title': url, 'date': '2026-10-01', 'summary': '颱風來襲', 'news_url': url, 'keyword': '颱風',
+                'source': source, 'category': '生活', 'sentiment': '中立', 'sentiment_score': 0.5}
+
+    def test_partial_source_keeps_its_watermark(self):
+        CrawlWatermark.objects.create(source='自由時報', keyword='颱風', known_urls=['https://example.com/old'])
+        _batch_save_news([self.article('https://example.com/ltn', '自由時報'),
+                          self.article('https://example.com/tvbs', 'TVBS新聞網')],
+                         partial_sources={'自由時報'})
+        marks = dict(CrawlWatermark.objects.filter(keyword='颱風').values_list('source', 'known_urls'))
+        self.assertEqual(marks, {'自由時報': ['https://example.com/old'], 'TVBS新聞網': ['https://example.com/tvbs']})
+
+
+# ========= PTT 文章快取 =========
+class PttArticleCacheTests(SimpleTestCase):
+    URL = 'https://www.ptt.cc/bbs/Gossiping/M.1.A.html'
+    POST = {'title': '[問卦] 颱風假', 'post_url': URL, 'summary': '放不放', 'comments': [], 'source': 'PTT'}
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = PttArticleCache(cache_dir=tmp.name)
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(ptt_article_cache.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_push_count_is_a_hit(self):
+        self.cache.store(self.URL, '12', self.POST, 123.0)
+        self.assertEqual(self.cache.lookup(self.URL, '12'), (self.POST, 123.0))
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+    def test_changed_push_count_invalidates(self):
+        self.cache.store(self.URL, '12', self.POST, 123.0)
+        self.assertIsNone(self.cache.lookup(self.URL, '15'))
+        self.assertEqual(self.cache.stats['changed'], 1)
+
+    def test_unknown_push_count_is_never_cached(self):
+        self.cache.store(self.URL, None, self.POST, 123.0)
+        self.assertIsNone(self.cache.lookup(self.URL, None))
+        self.assertEqual(self.cache.stats['stores'], 0)
+
+    def test_expires_after_ttl(self):
+        self.cache.store(self.URL, '12', self.POST, 123.0)
+        self.now += PTT_ARTICLE_TTL - 1
+        self.assertIsNotNone(self.cache.lookup(self.URL, '12'))
+        self.now += 1
+        self.assertIsNone(self.cache.lookup(self.URL, '12'))
+        self.assertEqual(self.cache.stats['expired'], 1)
+
+    def test_saturated_push_count_uses_shorter_ttl(self):
+        self.cache.store(self.URL, '爆', self.POST, 123.0)
+        self.now += PTT_SATURATED_TTL
+        self.assertIsNone(self.cache.lookup(self.URL, '爆'))
+
+    def test_prune_removes_old_files(self):
+        self.cache.store(self.URL, '12', self.POST, 123.0)
+        path = self.cache._path(self.URL)
+        os.utime(path, (self.now - 10, self.now - 10))
+        self.assertEqual(self.cache.prune(max_age=5), 1)
+        self.assertFalse(os.path.exists(path))
+
+
+# ========= 情緒分數服務 =========
+class _StubScorer:
+    def __init__(self, score=0.5):
+        self.score = score
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [self.score] * len(texts)
+
+
+class SentimentServiceTests(TestCase):
+    def setUp(self):
+        self.scorer = _StubScorer(0.9)
+        self.service = SentimentService(scorer=self.scorer)
+
+    def test_computes_once_and_writes_back(self):
+        self.assertEqual(self.service.score_texts(['好消息', '好消息']), [0.9, 0.9])
+        self.assertEqual(self.scorer.calls, [['好消息']])
+        self.assertEqual(SentimentCache.objects.get(content_hash=content_hash('好消息')).sentiment_score, 0.9)
+
+        # 第二次由行程內記憶體取得，不再查資料庫也不再計算
+        with self.assertNumQueries(0):
+            self.assertEqual(self.service.score_texts(['好消息']), [0.9])
+        self.assertEqual(len(self.scorer.calls), 1)
+        self.assertEqual(self.service.stats, {'memory': 1, 'cache_table': 0, 'stored_rows': 0, 'computed': 1})
+
+    def test_cache_table_before_stored_rows(self):
+        SentimentCache.objects.create(content_hash=content_hash('颱風來襲'), sentiment_score=0.3)
+        _news('https://example.com/a', '中立', 0.5).save()
+
+        self.assertEqual(self.service.score_texts(['颱風來襲'], ['https://example.com/a']), [0.3])
+        self.assertEqual(self.scorer.calls, [])
+        self.assertEqual(self.service.stats['cache_table'], 1)
+
+    def test_reuses_stored_row_with_same_text(self):
+        _news('https://example.com/a', '中立', 0.55).save()
+
+        self.assertEqual(self.service.score_texts(['颱風來襲'], ['https://example.com/a']), [0.55])
+        self.assertEqual(self.scorer.calls, [])
+        self.assertEqual(self.service.stats['stored_rows'], 1)
+        self.assertEqual(SentimentCache.objects.get(content_hash=content_hash('颱風來襲')).sentiment_score, 0.55)
+
+    def test_changed_text_at_same_url_is_recomputed(self):
+        _news('https://example.com/a', '中立', 0.55).save()
+
+        self.assertEqual(self.service.score_texts(['颱風已經離開'], ['https://example.com/a']), [0.9])
+        self.assertEqual(self.scorer.calls, [['颱風已經離開']])
+
+
+# ========= 資料庫彙總查詢 =========
+class AggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rows = [
+            ('https://example.com/1', '正面', '生活', _aware(2026, 10, 1)),
+            ('https://example.com/2', '負面', '生活', _aware(2026, 10, 1)),
+            ('https://example.com/3', '正面', '政治', _aware(2026, 10, 2)),
+            ('https://example.com/4', '中立', '政治', _aware(2026, 10, 5)),
+        ]
+        News.objects.bulk_create([_news(url, sentiment, 0.5, category=category, publish_date=publish_date)
+                                  for url, sentiment, category, publish_date in cls.rows])
+        News.objects.bulk_create([_news('https://example.com/other', '負面', 0.1, keyword='選舉')])
+
+    def articles(self, until=None):
+        return [{'sentiment': sentiment, 'category': category}
+                for _, sentiment, category, publish_date in self.rows if until is None or publish_date.day <= until]
+
+    def test_sentiment_counts(self):
+        self.assertEqual(sentiment_counts(News, keyword='颱風'), count_sentiment(self.articles()))
+
+    def test_sentiment_matrix(self):
+        self.assertEqual(sentiment_matrix(News, 'category', keyword='颱風'), sentiment_feq(self.articles(), 'category'))
+
+    def test_date_range_includes_whole_end_day(self):
+        filters = {'keyword': '颱風', 'start': date(2026, 10, 1), 'end': date(2026, 10, 2)}
+        self.assertEqual(sentiment_counts(News, **filters), count_sentiment(self.articles(until=2)))
+        self.assertEqual(sentiment_matrix(News, 'category', **filters), sentiment_feq(self.articles(until=2), 'category'))
+
+
+# ========= 每日情緒彙總 =========
+class RollupSignalTests(TestCase):
+    def rollup(self, sentiment, day=date(2026, 10, 1), category='生活'):
+        return SentimentRollup.objects.filter(keyword='颱風', source='TVBS', category=category,
+                                              day=day, sentiment=sentiment).first()
+
+    def test_create_update_delete(self):
+        _news('https://example.com/a', '正面', 0.8).save()
+        _news('https://example.com/b', '正面', 0.7).save()
+        self.assertEqual(self.rollup('正面').count, 2)
+        self.assertAlmostEqual(self.rollup('正面').score_sum, 1.5)
+
+        # 從資料庫載入時已記下舊值，更新時扣掉舊的貢獻、加到新的情緒
+        news = News.objects.get(url='https://example.com/a')
+        self.assertEqual(news._rollup_previous['sentiment'], '正面')
+        news.sentiment, news.sentiment_score = '負面', 0.2
+        news.save()
+        self.assertEqual(self.rollup('正面').count, 1)
+        self.assertAlmostEqual(self.rollup('正面').score_sum, 0.7)
+        self.assertEqual(self.rollup('負面').count, 1)
+
+        # 同一情緒只改分數時只更新分數總和
+        news.sentiment_score = 0.1
+        news.save()
+        self.assertEqual(self.rollup('負面').count, 1)
+        self.assertAlmostEqual(self.rollup('負面').score_sum, 0.1)
+
+        news.delete()
+        self.assertEqual(self.rollup('負面').count, 0)
+        self.assertEqual(self.rollup('正面').count, 1)
+
+    def test_update_or_create_moves_day(self):
+        _news('https://example.com/a', '正面', 0.8).save()
+        News.objects.update_or_create(url='https://example.com/a', defaults={'publish_date': _aware(2026, 10, 2)})
+        self.assertEqual(self.rollup('正面').count, 0)
+        self.assertEqual(self.rollup('正面', day=date(2026, 10, 2)).count, 1)
+
+    def test_posts_use_empty_category(self):
+        Posts.objects.create(keyword='颱風', source='PTT', title='標題', publish_date=_aware(2026, 10, 1),
+                             summary='停班停課', comments=[], url='https://example.com/p', sentiment='中立',
+                             sentiment_score=0.5)
+        rollup = SentimentRollup.objects.get(keyword='颱風', source='PTT')
+        self.assertEqual((rollup.category, rollup.count), ('', 1))
+
+    def test_rebuild_matches_incremental(self):
+        for i, (sentiment, score) in enumerate([('正面', 0.9), ('中立', 0.5), ('正面', 0.7)]):
+            _news(f'https://example.com/{i}', sentiment, score).save()
+        incremental = set(SentimentRollup.objects.filter(count__gt=0).values_list('sentiment', 'count'))
+        rebuild_rollups('颱風')
+        self.assertEqual(set(SentimentRollup.objects.values_list('sentiment', 'count')), incremental)
+
+
+# ========= 欄狀文章批次 =========
+class _StubSentimentService:
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = []
+
+    def score_texts(self, texts, urls=None):
+        self.calls.append((texts, urls))
+        return self.scores
+
+    def print_stats(self):
+        pass
+
+
+class ArticleBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.posts, self.scores = _synthetic_posts(500)
+        self.rows = [dict(post) for post in self.posts]
+        for row, score in zip(self.rows, self.scores):
+            row['sentiment_score'] = score
+            row['sentiment'] = sentiment_label(score)
+        self.batch = ArticleBatch([dict(post) for post in self.posts], url_key='post_url').set_scores(self.scores)
+
+    def test_stats_match_reference(self):
+        self.assertEqual(self.batch.sentiment_counts(), count_sentiment(self.rows))
+        self.assertEqual(self.batch.daily_counts(), news_post_counter(self.rows))
+        for column in ('source', 'category'):
+            matrix, expected = self.batch.sentiment_matrix(column), sentiment_feq(self.rows, column)
+            self.assertEqual(matrix, expected)
+            self.assertEqual(list(matrix), list(expected))  # 依第一次出現的順序
+
+    def test_write_back_matches_reference(self):
+        self.assertEqual(self.batch.write_back(), self.rows)
+
+    def test_score_sentiment_uses_service(self):
+        service = _StubSentimentService(self.scores)
+        rows = ArticleBatch([dict(post) for post in self.posts], url_key='post_url').score_sentiment(service)
+        texts, urls = service.calls[0]
+        self.assertEqual(texts, [post['summary'] for post in self.posts])
+        self.assertEqual(urls, [post['post_url'] for post in self.posts])
+        self.assertEqual(rows, self.rows)
+
+
+# ========= 向量化情緒模型 =========
+class VectorizedBayesTests(SimpleTestCase):
+    TEXTS = [
+        '這部電影真的很好看，演員表現非常出色',
+        '服務態度很差，等了一個小時還沒有上菜',
+        '今天台北天氣多雲，午後可能有雷陣雨',
+        '颱風造成多處停電，居民生活受到嚴重影響',
+    ]
+
+    def test_scores_match_snownlp(self):
+        from snownlp import SnowNLP
+
+        from .fast_sentiment import VectorizedBayes, tokenize_for_sentiment
+
+        model = VectorizedBayes.from_snownlp()
+        scores = model.score_tokens([tokenize_for_sentiment(text) for text in self.TEXTS])
+        for text, score in zip(self.TEXTS, scores.tolist()):
+            self.assertAlmostEqual(score, SnowNLP(text).sentiments, delta=1e-9, msg=text)
+
+
+# ========= NLP 行程池 =========
+def _scale_chunk(args):
+    values, factor = args
+    return [value * factor for value in values]
+
+
+class _BrokenPool:
+    def map(self, func, chunks):
+        raise BrokenProcessPool('測試用的損毀行程池')
+
+
+class NlpStageTests(SimpleTestCase):
+    def test_in_process_results_keep_input_order(self):
+        stage = NlpStage(workers=0, chunk_size=2, min_parallel=1)
+        self.assertEqual(stage._map(_scale_chunk, [1, 2, 3, 4, 5], 10), [10, 20, 30, 40, 50])
+        self.assertIsNone(stage._pool)
+
+    def test_broken_pool_falls_back_to_current_process(self):
+        stage = NlpStage(workers=1, chunk_size=2, min_parallel=1)
+        stage._pool = _BrokenPool()
+        self.assertEqual(stage._map(_scale_chunk, [1, 2, 3, 4, 5], 10), [10, 20, 30, 40, 50])
+        self.assertIsNone(stage._pool)  # 下一批會重新建立行程池
@@ -1,7 +1,11 @@
 from datetime import datetime, timedelta
+import atexit
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
 import time, json, random
 from dateutil import parser, tz
-import re
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -13,6 +17,35 @@ from selenium.common.exceptions import TimeoutException
 import jieba.analyse
 from selenium.common.exceptions import StaleElementReferenceException
 
+from .deadline import Deadline
+from .browser_pool import BrowserPool, BrowserUnavailable, PeakRss
+from .threads_payload import loads_payload, extract_threads_posts
+from .nlp_stage import analyze_documents, char_stats
+
+# ========= 可依需求修改的參數 =========
+MAX_TARGET = 30             # 最多收錄幾篇貼文
+MAX_SCROLLS = 100           # 最多滾動幾次
+MAX_NO_NEW_SCROLLS = 4      # 連續幾次滾動（每次都等到逾時）沒有新內容就停止
+MAX_DAYS = 7                # 只收錄最近 N 天的貼文
+# 擷取方式：'network' 讀取頁面載入的 graphql JSON 回應（DevTools 網路紀錄）；'dom' 以 XPath 擷取頁面元素
+THREADS_EXTRACTION_MODE = 'network'
+COMMENT_WORKERS = 2         # 同時抓留言的瀏覽器數（主瀏覽器繼續滾動，不必開分頁等待）
+COMMENT_LEASE_TIMEOUT = 30  # 留言工作等待可用瀏覽器的秒數上限
+BLOCK_RESOURCES = True      # 以輕量瀏覽器設定封鎖圖片、影音、字型與追蹤器
+BLOCKED_URL_PATTERNS = [    # CDP Network.setBlockedURLs 的網址樣式（* 為萬用字元）
+    '*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.heic*',
+    '*.mp4*', '*.m4s*', '*.m4a*', '*.webm*',
+    '*.woff*', '*.ttf*', '*.otf*',
+    '*doubleclick.net*', '*google-analytics.com*', '*googletagmanager.com*', '*connect.facebook.net*',
+]
+THREADS_TIME_BUDGET = 120   # 單次 Threads 爬取的時間上限（秒），與呼叫端的 deadline 取較早者
+SCROLL_WAIT_MIN = 1.0       # 滾動後等待新內容的秒數下限
+SCROLL_WAIT_MAX = 8.0       # 滾動後等待新內容的秒數上限
+SCROLL_WAIT_FACTOR = 3      # 等待上限 = 最近內容到達時間（EWMA）× 此倍數
+SCROLL_JITTER = (0.4, 1.2)  # 內容到達後的隨機停頓秒數，避免固定節奏
+COMMENT_WAIT = 10           # 留言頁等待留言區塊出現的秒數上限
+DOM_KEEP_NODES = 20         # 已處理的貼文節點最多保留幾個在 DOM 中，其餘移除以限制瀏覽器記憶體
+
 
 def login_to_threads(driver):
     IG_USERNAME = "leafwann_"
@@ -70,6 +103,99 @@ def login_to_threads(driver):
         return False
 
 
+def _threads_logged_in(driver):
+    """
+    套用保存的 cookie 後，判斷是否仍為登入狀態（未被導回登入頁且動態牆有貼文）。
+    """
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, "//div[@data-pressable-container='true']"))
+        )
+    except TimeoutException:
+        return False
+    return '/login' not in driver.current_url
+
+
+def _new_threads_driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("user-agent=Mozilla/5.0")
+    # 開啟 performance log，network 擷取模式從中取得 graphql 回應的 requestId
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    if BLOCK_RESOURCES:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--mute-audio")
+        options.add_argument("--autoplay-policy=user-gesture-required")
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.media_stream': 2,
+        })
+    driver = webdriver.Chrome(options=options)
+    if BLOCK_RESOURCES:
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            print(f"⚠️ 無法設定封鎖網址：{e}")
+    return driver
+
+
+def _prune_dom(driver, css, keep=DOM_KEEP_NODES):
+    """
+    清空符合 css 的節點中較舊的部分，只保留最後 keep 個完整內容，回傳本次清空的數量。
+    節點本身不移除（由 React 管理，移除會讓之後的 reconcile 出錯、無限捲動的觸發點失效），
+    只隱藏並清空其內部子節點，釋放圖片與文字佔用的記憶體；清空過的節點標上 data-pruned。
+    """
+    try:
+        return driver.execute_script(
+            "const nodes = document.querySelectorAll(arguments[0] + ':not([data-pruned])');"
+            "const extra = nodes.length - arguments[1];"
+            "for (let i = 0; i < extra; i++) {"
+            "  const node = nodes[i];"
+            "  node.setAttribute('data-pruned', '1');"
+            "  node.style.display = 'none';"
+            "  for (const child of node.children) child.replaceChildren();"
+            "}"
+            "return Math.max(extra, 0);",
+            css, keep,
+        )
+    except Exception:
+        return 0
+
+
+_browser_pool = None
+_browser_pool_pid = None    # 建立瀏覽器池的程序；fork 出的子程序不能共用父程序的 WebDriver 工作階段
+_browser_pool_lock = threading.Lock()
+
+
+def _close_browser_pool(pool, pid):
+    # atexit 會被 fork 出的子程序繼承，只由建立瀏覽器池的程序關閉瀏覽器
+    if os.getpid() == pid:
+        pool.close()
+
+
+def get_threads_browser_pool():
+    """
+    跨搜尋共用的 Threads 瀏覽器池（每個程序一個）；第一次取得時在背景預先啟動並登入瀏覽器。
+    """
+    global _browser_pool, _browser_pool_pid
+    pid = os.getpid()
+    if _browser_pool is None or _browser_pool_pid != pid:
+        with _browser_pool_lock:
+            if _browser_pool is None or _browser_pool_pid != pid:
+                pool = BrowserPool('threads', _new_threads_driver, login_to_threads,
+                                   "https://www.threads.com/", is_logged_in=_threads_logged_in,
+                                   size=1 + COMMENT_WORKERS)
+                pool.warm()
+                atexit.register(_close_browser_pool, pool, pid)
+                _browser_pool, _browser_pool_pid = pool, pid
+    return _browser_pool
+
+
 # --- 登入 Threads (Instagram)
 # def login_to_threads(driver):
 #     IG_USERNAME = "leafwann_"
@@ -116,189 +242,444 @@ def scrape_comments_from_post_page(driver):
     return comments
 
 
+def _fetch_comments(pool, post_url):
+    """
+    留言工作：向瀏覽器池借一個瀏覽器開啟貼文頁並擷取留言。
+    """
+    with pool.lease(timeout=COMMENT_LEASE_TIMEOUT) as driver:
+        driver.get(post_url)
+        try:
+            WebDriverWait(driver, COMMENT_WAIT).until(EC.presence_of_element_located(
+                (By.XPATH, "//div[contains(@class,'xb57i2i') and contains(@class,'x1q594ok')]")
+            ))
+        except TimeoutException:
+            return []  # 沒有留言區塊（無留言或頁面改版）
+        return scrape_comments_from_post_page(driver)
+
+
+class _AdaptiveScroller:
+    """
+    事件驅動的滾動：滾到底後等待「新內容出現」的條件成立，而不是固定睡眠。
+    等待上限依最近內容到達所需時間（EWMA）調整；內容到達後再加上短暫的隨機停頓，節奏不固定。
+    """
+    def __init__(self, driver, deadline):
+        self.driver = driver
+        self.deadline = deadline
+        self.latency = SCROLL_WAIT_MIN * 2
+        self.rounds = 0
+        self.waited = 0.0
+        self.timed_out = False
+
+    def time_up(self):
+        if not self.timed_out and self.deadline.expired():
+            print("⏰ Threads 超過時間預算，停止滾動")
+            self.timed_out = True
+        return self.timed_out
+
+    def _timeout(self):
+        timeout = min(SCROLL_WAIT_MAX, max(SCROLL_WAIT_MIN, self.latency * SCROLL_WAIT_FACTOR))
+        remaining = self.deadline.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def scroll_and_wait(self, condition):
+        """
+        滾到底並等待 condition(driver) 回傳真值，回傳該值；逾時回傳 None。
+        """
+        self.rounds += 1
+        self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        start = time.monotonic()
+        try:
+            result = WebDriverWait(self.driver, self._timeout(), poll_frequency=0.25).until(condition)
+        except TimeoutException:
+            result = None
+        elapsed = time.monotonic() - start
+        if result:
+            self.latency = 0.3 * elapsed + 0.7 * self.latency
+            pause = random.uniform(*SCROLL_JITTER)
+            remaining = self.deadline.remaining()
+            time.sleep(pause if remaining is None else min(pause, remaining))
+            elapsed = time.monotonic() - start
+        else:
+            self.latency = min(SCROLL_WAIT_MAX, self.latency * 1.5)  # 內容變慢時放寬下一次的等待
+        self.waited += elapsed
+        return result
+
+
+class _CommentFetcher:
+    """
+    留言擷取階段：主流程把貼文網址排進佇列後繼續滾動，
+    多個工作執行緒各自從瀏覽器池借瀏覽器同時抓留言，最後由 collect 填回各貼文。
+    """
+    def __init__(self, pool, workers=COMMENT_WORKERS):
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='threads-comments')
+        self.futures = {}   # {貼文網址: Future}
+
+    def submit(self, post_url):
+        if post_url != "N/A" and post_url not in self.futures:
+            self.futures[post_url] = self.executor.submit(_fetch_comments, self.pool, post_url)
+
+    def collect(self, posts, deadline):
+        """
+        在時間預算內等待留言工作完成，把結果寫回 posts 的 comments；未完成的工作取消、留言保持空白。
+        """
+        wait(self.futures.values(), timeout=deadline.remaining())
+        fetched = 0
+        for post in posts:
+            future = self.futures.get(post['post_url'])
+            if future is None or not future.done() or future.cancelled():
+                continue
+            try:
+                post['comments'] = future.result()
+                fetched += 1
+            except Exception as e:
+                print("留言抓取錯誤：", e)
+        if self.futures:
+            print(f"💬 留言工作：完成 {fetched} / {len(self.futures)} 篇")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
 # 產生主題 title（使用 jieba）
-def generate_title_with_keywords(text, topk=3):
+def generate_title_with_keywords(text, topk=3, analysis=None):
     """
     從一段文字中抽取關鍵詞作為主題。
     Args:
         text (str): 貼文內容
         topk (int): 選幾個關鍵詞組成主題
+        analysis (dict): 已有的文件分析結果（nlp_stage.analyze_text），有的話直接沿用 TF-IDF 排名，不再斷詞
     Returns:
         str: 由關鍵詞組成的主題，例如「沖繩｜推薦｜海」
     """
-    keywords = jieba.analyse.extract_tags(text, topK=topk)
+    keywords = analysis['ranked'][:topk] if analysis else jieba.analyse.extract_tags(text, topK=topk)
     return "｜".join(keywords) if keywords else "無法產生主題"
 
-def count_chinese_chars(text):
-    return len(re.findall(r'[\u4e00-\u9fff]', text))
+def _passes_language_filter(post_text, threshold=0.6):
+    """
+    中文比例與中文字數的過濾條件。只做字元統計，斷詞留到爬取結束後批次進行（見 _finish_posts）。
+    """
+    stats = char_stats(post_text)
+    if stats['chinese_chars'] / max(stats['chars'], 1) < threshold:
+        print("🌐 非中文主體貼文，跳過")
+        return False
+    if stats['chinese_chars'] < 30:
+        print("🔡 中文字數不足 30，跳過")
+        return False
+    return True
 
-def is_mostly_chinese(text, threshold=0.6):
-    chinese_chars = count_chinese_chars(text)
-    return (chinese_chars / max(len(text), 1)) >= threshold
+def _finish_posts(posts):
+    """
+    爬取結束後一次批次分析所有貼文（交給 nlp_stage 的行程池，不在瀏覽器執行緒上斷詞），再以分析結果產生主題。
+    """
+    analyze_documents(posts)
+    for post in posts:
+        post['title'] = generate_title_with_keywords(post['summary'], analysis=post['analysis'])
+    return posts
 
-def scrape_threads_by_keyword(keyword):
+def scrape_threads_by_keyword(keyword, deadline=None, partial_sources=None):
+    """
+    deadline: Deadline 或秒數；時間到時停止滾動，回傳已收錄的貼文，並把 'Threads' 加入 partial_sources（set）。
+              另外單次爬取最多 THREADS_TIME_BUDGET 秒（只因此上限停止時不視為部分資料）。
+    """
     keyword_to_search = keyword
-
-    MAX_TARGET = 30
-    MAX_SCROLLS = 100
-    MAX_NO_NEW_SCROLLS = 10
-    MAX_DAYS = 7
-
-    time_cutoff = datetime.now(tz=tz.gettz("Asia/Taipei")) - timedelta(days=MAX_DAYS)
+    deadline = Deadline.coerce(deadline)
 
     start_time = datetime.now()
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("user-agent=Mozilla/5.0")
-    driver = webdriver.Chrome(options=options)
-
+    # 從瀏覽器池借出已登入的瀏覽器，用完歸還而不是關閉
     try:
-        if not login_to_threads(driver):
-            return
+        with get_threads_browser_pool().lease() as driver:
+            posts = _scrape_with_driver(driver, keyword_to_search, deadline, partial_sources, start_time)
+    except BrowserUnavailable as e:
+        print(f"❌ {e}")
+        return
+    # 瀏覽器歸還後才斷詞與產生主題
+    return _finish_posts(posts)
 
-        driver.get("https://www.threads.com/search?hl=zh-tw")
-        search_input = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.XPATH, "//input[@type='search' and @placeholder='搜尋']"))
-        )
-        search_input.send_keys(keyword_to_search)
-        search_input.send_keys(Keys.ENTER)
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.XPATH, "//div[@data-pressable-container='true']"))
-        )
 
-        # ✅ 點選「最近」Tab
+def _scrape_with_driver(driver, keyword_to_search, deadline, partial_sources, start_time):
+    """
+    以已登入的 driver 搜尋關鍵字並滾動收集貼文。
+    """
+    time_cutoff = datetime.now(tz=tz.gettz("Asia/Taipei")) - timedelta(days=MAX_DAYS)
+    scroller = _AdaptiveScroller(driver, deadline.capped(THREADS_TIME_BUDGET))
+
+    capture = None
+    if THREADS_EXTRACTION_MODE == 'network':
         try:
-            recent_tab = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//a[@aria-label='最近']"))
-            )
-            recent_tab.click()
-            print("🕓 已點選『最近』Tab")
-            time.sleep(2)
+            capture = _NetworkCapture(driver)  # 在搜尋前建立，捨棄上次借用時留下的紀錄
         except Exception as e:
-            print(f"⚠️ 點選『最近』Tab 失敗：{e}")
-
-        all_posts_data = []
-        post_index = 0
-        scroll_round = 0
-        no_new_scrolls = 0
-        last_post_count = 0
-        main_window_handle = driver.current_window_handle
+            print(f"⚠️ 無法讀取瀏覽器網路紀錄，改用 DOM 擷取：{e}")
+
+    driver.get("https://www.threads.com/search?hl=zh-tw")
+    search_input = WebDriverWait(driver, 15).until(
+        EC.presence_of_element_located((By.XPATH, "//input[@type='search' and @placeholder='搜尋']"))
+    )
+    search_input.send_keys(keyword_to_search)
+    search_input.send_keys(Keys.ENTER)
+    WebDriverWait(driver, 15).until(
+        EC.presence_of_element_located((By.XPATH, "//div[@data-pressable-container='true']"))
+    )
+
+    # ✅ 點選「最近」Tab
+    try:
+        recent_tab = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.XPATH, "//a[@aria-label='最近']"))
+        )
+        first_post = driver.find_element(By.XPATH, "//div[@data-pressable-container='true']")
+        recent_tab.click()
+        print("🕓 已點選『最近』Tab")
+        try:
+            # 等待原本的搜尋結果被「最近」結果取代
+            WebDriverWait(driver, 3).until(EC.staleness_of(first_post))
+        except TimeoutException:
+            pass
+    except Exception as e:
+        print(f"⚠️ 點選『最近』Tab 失敗：{e}")
 
-        while len(all_posts_data) < MAX_TARGET and scroll_round < MAX_SCROLLS:
-            scroll_round += 1
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(2, 4))
+    comment_fetcher = _CommentFetcher(get_threads_browser_pool())
+    rss = PeakRss(driver)
+    try:
+        if capture is not None:
+            all_posts_data = _collect_from_network(capture, comment_fetcher, rss, scroller, time_cutoff)
+        else:
+            all_posts_data = _collect_from_dom(driver, comment_fetcher, rss, scroller, time_cutoff)
+        comment_fetcher.collect(all_posts_data, scroller.deadline)
+    finally:
+        comment_fetcher.shutdown()
+    rss.report('Threads')
+    print(f"⏱️ 滾動 {scroller.rounds} 次，等待新內容共 {scroller.waited:.1f} 秒")
+    if scroller.timed_out and deadline.expired() and partial_sources is not None:
+        partial_sources.add('Threads')
 
-            posts = driver.find_elements(By.XPATH, "//div[@data-pressable-container='true']")
-            new_posts_found = len(posts) > last_post_count
-            last_post_count = len(posts)
+    if len(all_posts_data) < MAX_TARGET:
+        print(f"⚠️ 貼文數未達 {MAX_TARGET}，僅收錄 {len(all_posts_data)} 篇")
 
-            post_index = 0  # 每次滾動後從新一輪貼文開始
+    elapsed = datetime.now() - start_time
 
-            while post_index < len(posts) and len(all_posts_data) < MAX_TARGET:
-                try:
-                    post = posts[post_index]
-                except IndexError:
-                    break  # 超出貼文列表長度
-                post_index += 1
+    print(f"📊 共抓取 {len(all_posts_data)} 筆，耗時 {elapsed.seconds // 60} 分 {elapsed.seconds % 60} 秒")
+    return all_posts_data
 
-                try:
-                    print(f"\n📝 正在處理第 {post_index} 篇貼文")
-
-                    # 發文時間過濾
-                    try:
-                        raw_time = post.find_element(By.XPATH, ".//time").get_attribute("datetime")
-                        taipei_time = parser.parse(raw_time).astimezone(tz.gettz("Asia/Taipei"))
-                        if taipei_time < time_cutoff:
-                            print(f"📅 發文時間 {taipei_time.strftime('%Y-%m-%d %H:%M:%S')} 超出日期區間，跳過")
-                            continue
-                        post_time = taipei_time.strftime("%Y-%m-%d")
-                    except Exception as e:
-                        print(f"⏳ 無法解析時間，跳過（錯誤：{e}）")
-                        continue
 
-                    # 內文抓取
-                    try:
-                        spans = post.find_elements(By.XPATH, ".//div[contains(@class,'x1a6qonq') and contains(@class,'x6ikm8r')]//span[contains(@class,'x1lliihq')]//span")
-                        parts = [s.text.strip() for s in spans if s.text.strip()]
-                        post_text = "\n".join(sorted(set(parts), key=parts.index))
-                    except:
-                        print("❌ 抓取貼文內容失敗，跳過")
-                        continue
+# --- network 模式：讀取頁面本身載入的 graphql JSON 回應
+class _NetworkCapture:
+    """
+    從 Chrome performance log 找出已完成的 graphql 回應，再以 CDP Network.getResponseBody 取得內容。
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.pending = {}   # {requestId: url}，已收到回應標頭、尚未載入完成
+        self.driver.get_log('performance')
+        self.stats = {'responses': 0, 'posts': 0}
+
+    def _finished_requests(self):
+        finished = []
+        for entry in self.driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            params = message.get('params', {})
+            if message.get('method') == 'Network.responseReceived':
+                url = params.get('response', {}).get('url', '')
+                if '/graphql' in url:
+                    self.pending[params['requestId']] = url
+            elif message.get('method') == 'Network.loadingFinished' and params.get('requestId') in self.pending:
+                finished.append(params['requestId'])
+        return finished
+
+    def drain(self):
+        """
+        回傳自上次呼叫以來完成的 graphql 回應（已解析的 JSON 物件清單）。
+        """
+        payloads = []
+        for request_id in self._finished_requests():
+            self.pending.pop(request_id, None)
+            try:
+                body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            except Exception:
+                continue  # 回應已被瀏覽器釋放
+            text = body.get('body', '')
+            if body.get('base64Encoded'):
+                text = base64.b64decode(text).decode('utf-8', 'ignore')
+            payloads.extend(loads_payload(text))
+        self.stats['responses'] += len(payloads)
+        return payloads
+
+    def embedded(self):
+        """
+        頁面內嵌的 JSON（伺服器端渲染的第一批資料不會經過 graphql 請求）。
+        """
+        texts = self.driver.execute_script(
+            "return Array.from(document.querySelectorAll('script[type=\"application/json\"]')).map(s => s.textContent);"
+        ) or []
+        payloads = []
+        for text in texts:
+            payloads.extend(loads_payload(text))
+        return payloads
+
+
+def _network_post_to_record(item, time_cutoff):
+    """
+    套用與 DOM 模式相同的過濾條件，把 payload 中的貼文轉成輸出格式；不符合時回傳 None。
+    """
+    if item['taken_at'] < time_cutoff:
+        print(f"📅 發文時間 {item['taken_at'].strftime('%Y-%m-%d %H:%M:%S')} 超出日期區間，跳過")
+        return None
+    post_text = item['text']
+    if not _passes_language_filter(post_text):
+        return None
+    return {
+        'title': '',    # 爬取結束後由 _finish_posts 填入
+        'date': item['taken_at'].strftime("%Y-%m-%d"),
+        'post_url': item['post_url'],
+        'summary': post_text,
+        'comments': item['replies'],
+        'source': 'Threads',
+    }
+
+
+def _collect_from_network(capture, comment_fetcher, rss, scroller, time_cutoff):
+    all_posts_data = []
+    seen_codes = set()
+    no_new_scrolls = 0
+    payloads = capture.embedded() + capture.drain()
+
+    while True:
+        new_posts_found = False
+        for payload in payloads:
+            for item in extract_threads_posts(payload):
+                if item['code'] in seen_codes:
+                    continue
+                seen_codes.add(item['code'])
+                new_posts_found = True
+                capture.stats['posts'] += 1
+                record = _network_post_to_record(item, time_cutoff)
+                if record:
+                    all_posts_data.append(record)
+                    if not record['comments'] and item['reply_count'] != 0:
+                        comment_fetcher.submit(record['post_url'])  # payload 沒有回覆預覽時另外抓留言
+                    print(f"✅ 收錄第 {len(all_posts_data)} 篇貼文")
+                    if len(all_posts_data) >= MAX_TARGET:
+                        return all_posts_data
 
-                    if not is_mostly_chinese(post_text):
-                        print("🌐 非中文主體貼文，跳過")
-                        continue
-                    if count_chinese_chars(post_text) < 30:
-                        print("🔡 中文字數不足 30，跳過")
-                        continue
+        if not new_posts_found:
+            no_new_scrolls += 1
+            if no_new_scrolls >= MAX_NO_NEW_SCROLLS:
+                print("⚠️ 多次滾動無新內容，停止。")
+                break
+        else:
+            no_new_scrolls = 0
+
+        if scroller.rounds >= MAX_SCROLLS or scroller.time_up():
+            break
+        # 等到有新的 graphql 回應載入完成為止
+        payloads = scroller.scroll_and_wait(lambda d: capture.drain()) or []
+        rss.sample()
+        # 資料來自 payload，畫面上的貼文節點只需保留最後幾個讓無限捲動繼續觸發
+        _prune_dom(capture.driver, "div[data-pressable-container='true']")
+
+    print(f"📡 network 模式：解析 {capture.stats['responses']} 個回應、{capture.stats['posts']} 篇貼文")
+    return all_posts_data
+
+
+# --- dom 模式：以 XPath 擷取頁面元素
+def _collect_from_dom(driver, comment_fetcher, rss, scroller, time_cutoff):
+    all_posts_data = []
+    seen_links = set()
+    post_index = 0
+    no_new_scrolls = 0
+
+    while len(all_posts_data) < MAX_TARGET and scroller.rounds < MAX_SCROLLS:
+        if scroller.time_up():
+            break
+        # 只取尚未處理過的貼文（處理過的會標上 data-scraped），等到出現新貼文為止
+        posts = scroller.scroll_and_wait(
+            lambda d: d.find_elements(By.XPATH, "//div[@data-pressable-container='true'][not(@data-scraped)]")
+        ) or []
+        new_posts_found = len(posts) > 0
+        rss.sample()
 
+        post_index = 0
 
-                    try:
-                        permalink = post.find_element(By.XPATH, ".//a[@role='link'][time]").get_attribute("href")
-                        post_link = "https://www.threads.com" + permalink if permalink.startswith("/") else permalink
-                    except:
-                        post_link = "N/A"
-
-                    post_title = generate_title_with_keywords(post_text)
-
-                    comments_data = []
-                    if post_link != "N/A":
-                        try:
-                            driver.execute_script("window.open(arguments[0]);", post_link)
-                            time.sleep(2)
-                            new_tab = [w for w in driver.window_handles if w != main_window_handle][-1]
-                            driver.switch_to.window(new_tab)
-                            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                            comments_data = scrape_comments_from_post_page(driver)
-                            driver.close()
-                            driver.switch_to.window(main_window_handle)
-                        except Exception as e:
-                            print("留言抓取錯誤：", e)
-                            if len(driver.window_handles) > 1:
-                                driver.close()
-                            driver.switch_to.window(main_window_handle)
-
-                    all_posts_data.append({
-                        'title': post_title,
-                        'date': post_time,
-                        'post_url': post_link,
-                        'summary': post_text,
-                        'comments': comments_data,
-                        'source': 'Threads',
-                    })
+        while post_index < len(posts) and len(all_posts_data) < MAX_TARGET and not scroller.time_up():
+            try:
+                post = posts[post_index]
+            except IndexError:
+                break  # 超出貼文列表長度
+            post_index += 1
 
-                    print(f"✅ 收錄第 {len(all_posts_data)} 篇貼文")
-                    time.sleep(random.uniform(1, 2))
+            try:
+                print(f"\n📝 正在處理第 {post_index} 篇貼文")
 
-                except StaleElementReferenceException:
-                    print(f"⚠️ 第 {post_index} 篇貼文失效（StaleElement），跳過")
+                # 發文時間過濾
+                try:
+                    raw_time = post.find_element(By.XPATH, ".//time").get_attribute("datetime")
+                    taipei_time = parser.parse(raw_time).astimezone(tz.gettz("Asia/Taipei"))
+                    if taipei_time < time_cutoff:
+                        print(f"📅 發文時間 {taipei_time.strftime('%Y-%m-%d %H:%M:%S')} 超出日期區間，跳過")
+                        continue
+                    post_time = taipei_time.strftime("%Y-%m-%d")
+                except Exception as e:
+                    print(f"⏳ 無法解析時間，跳過（錯誤：{e}）")
                     continue
 
-            if not new_posts_found:
-                no_new_scrolls += 1
-                if no_new_scrolls >= MAX_NO_NEW_SCROLLS:
-                    print("⚠️ 多次滾動無新內容，停止。")
-                    break
-            else:
-                no_new_scrolls = 0
-
+                # 內文抓取
+                try:
+                    spans = post.find_elements(By.XPATH, ".//div[contains(@class,'x1a6qonq') and contains(@class,'x6ikm8r')]//span[contains(@class,'x1lliihq')]//span")
+                    parts = [s.text.strip() for s in spans if s.text.strip()]
+                    post_text = "\n".join(sorted(set(parts), key=parts.index))
+                except:
+                    print("❌ 抓取貼文內容失敗，跳過")
+                    continue
 
-        if len(all_posts_data) < MAX_TARGET:
-            print(f"⚠️ 貼文數未達 {MAX_TARGET}，僅收錄 {len(all_posts_data)} 篇")
+                if not _passes_language_filter(post_text):
+                    continue
 
-        elapsed = datetime.now() - start_time
 
-        print(f"📊 共抓取 {len(all_posts_data)} 筆，耗時 {elapsed.seconds // 60} 分 {elapsed.seconds % 60} 秒")
-        return all_posts_data
+                try:
+                    permalink = post.find_element(By.XPATH, ".//a[@role='link'][time]").get_attribute("href")
+                    post_link = "https://www.threads.com" + permalink if permalink.startswith("/") else permalink
+                except:
+                    post_link = "N/A"
+                if post_link != "N/A" and post_link in seen_links:
+                    continue  # 標記失敗而再次出現的貼文
+                seen_links.add(post_link)
+
+                # 留言交給留言工作，主瀏覽器不必開分頁等待
+                comment_fetcher.submit(post_link)
+
+                all_posts_data.append({
+                    'title': '',    # 爬取結束後由 _finish_posts 填入
+                    'date': post_time,
+                    'post_url': post_link,
+                    'summary': post_text,
+                    'comments': [],
+                    'source': 'Threads',
+                })
+
+                print(f"✅ 收錄第 {len(all_posts_data)} 篇貼文")
+
+            except StaleElementReferenceException:
+                print(f"⚠️ 第 {post_index} 篇貼文失效（StaleElement），跳過")
+                continue
+
+        # 標記已處理的貼文，並移除較舊的已處理節點以限制 DOM 大小
+        try:
+            driver.execute_script("arguments[0].forEach(el => el.setAttribute('data-scraped', '1'));", posts[:post_index])
+        except Exception:
+            pass
+        _prune_dom(driver, "div[data-pressable-container='true'][data-scraped]")
+
+        if not new_posts_found:
+            no_new_scrolls += 1
+            if no_new_scrolls >= MAX_NO_NEW_SCROLLS:
+                print("⚠️ 多次滾動無新內容，停止。")
+                break
+        else:
+            no_new_scrolls = 0
 
-    finally:
-        print("🧹 關閉瀏覽器...")
-        driver.quit()
-        print("✅ 結束")
+    return all_posts_data
 
 
 # # --- 執行
@@ -0,0 +1,90 @@
+import json
+from datetime import datetime
+
+from dateutil import tz
+
+# Threads 的 graphql 回應可能帶有防 JSON 劫持的前綴
+_JSON_PREFIXES = ('for (;;);',)
+TAIPEI = tz.gettz("Asia/Taipei")
+
+
+def loads_payload(text):
+    """
+    解析一段 graphql 回應或頁面內嵌的 JSON，回傳解析出的物件清單（串流回應會有多行 JSON）。
+    """
+    text = text.strip()
+    for prefix in _JSON_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+    try:
+        return [json.loads(text)]
+    except ValueError:
+        pass
+    payloads = []
+    for line in text.splitlines():
+        try:
+            payloads.append(json.loads(line))
+        except ValueError:
+            continue
+    return payloads
+
+
+def _is_post(node):
+    return isinstance(node, dict) and 'taken_at' in node and 'code' in node and 'caption' in node
+
+
+def _caption_text(post):
+    caption = post.get('caption') or {}
+    return (caption.get('text') or '').strip() if isinstance(caption, dict) else ''
+
+
+def _walk_threads(node, found):
+    """
+    深度優先找出 thread：有 thread_items 的節點視為一串（第一則為主文、其後為回覆預覽），
+    不在任何 thread_items 之內的單篇貼文視為沒有回覆的 thread。
+    """
+    if isinstance(node, dict):
+        items = node.get('thread_items')
+        if isinstance(items, list):
+            posts = [item.get('post') for item in items if isinstance(item, dict) and _is_post(item.get('post'))]
+            if posts:
+                found.append(posts)
+                return
+        if _is_post(node):
+            found.append([node])
+            return
+        for value in node.values():
+            _walk_threads(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _walk_threads(value, found)
+
+
+def extract_threads_posts(payload, max_replies=10):
+    """
+    從 graphql 回應中擷取貼文。
+    :return: list of dict，欄位為 code / text / taken_at（台北時間 datetime）/ post_url / username /
+             replies / reply_count（回覆數，payload 沒有時為 None）
+    """
+    found = []
+    _walk_threads(payload, found)
+    posts = []
+    for thread in found:
+        main = thread[0]
+        username = ((main.get('user') or {}).get('username')) or ''
+        try:
+            taken_at = datetime.fromtimestamp(int(main['taken_at']), tz=TAIPEI)
+        except (TypeError, ValueError, OverflowError):
+            continue
+        replies = [text for text in (_caption_text(reply) for reply in thread[1:]) if text]
+        reply_count = (main.get('text_post_app_info') or {}).get('direct_reply_count')
+        posts.append({
+            'code': main['code'],
+            'text': _caption_text(main),
+            'taken_at': taken_at,
+            'post_url': f"https://www.threads.com/@{username}/post/{main['code']}" if username else 'N/A',
+            'username': username,
+            'replies': replies[:max_replies],
+            'reply_count': reply_count,
+        })
+    return posts
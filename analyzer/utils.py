@@ -5,17 +5,9 @@ from django.conf import settings
 # 🕒 時間與日期處理
 from datetime import datetime, timedelta
 
-# 🌐 網路請求與資料爬取
-import requests
-from bs4 import BeautifulSoup
-
 # 📊 資料處理與分析
 from collections import Counter, defaultdict
-
-# 🧠 自然語言處理（NLP）
-import jieba
-import jieba.analyse
-from snownlp import SnowNLP
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 # 🖼️ 視覺化與圖形產生
 from wordcloud import WordCloud
@@ -27,8 +19,17 @@ import google.generativeai as genai
 import re
 
 from .models import News, Posts, AnalysisResult
-from .ptt_crawler import get_ptt_posts,ptt_keyword
+from .ptt_crawler import get_ptt_posts_for_keyword
 from .threads_crawler import scrape_threads_by_keyword
+from .crawl_engine import NewsSource, crawl_source, crawl_sources, DEADLINE_GRACE
+from .deadline import Deadline
+from .article_batch import ArticleBatch
+from .nlp_stage import analyze_documents
+from .http_client import http_get
+from .host_guard import HostUnavailable
+from .watermarks import load_known_urls, merge_known_articles, update_watermarks
+from .html_parsing import extract_from_html
+from .parse_specs import TVBS_SPEC, ET_SPEC, LTN_SPEC, CHDTV_SPEC
 
 
 
@@ -39,6 +40,7 @@ def _save_single_news_article(news_data_item, history_search_instance=None):
     保存單篇新聞文章到 News 表。
     news_data_item: 字典，包含單篇新聞資訊。
     history_search_instance: HistorySearch 物件，可選，用於 ManyToMany 關聯。
+    回傳儲存後的 News 物件，失敗時回傳 None。
     """
     try:
         date = datetime.strptime(news_data_item.get('date'), "%Y-%m-%d")
@@ -62,8 +64,10 @@ def _save_single_news_article(news_data_item, history_search_instance=None):
         if history_search_instance:
             news_article.searches.add(history_search_instance)
         print(f"✅ News - {'創建' if created else '更新'}：{news_article.title}")
+        return news_article
     except Exception as e:
         print(f"❌ News 儲存失敗 ({news_data_item.get('title', '未知')}): {e}")
+        return None
 
 def _save_single_post_item(post_data_item, history_search_instance=None):
     """
@@ -130,6 +134,8 @@ def _save_analysis_result(analysis_n,analysis_p, history_search_instance,current
                 'post_trend_labels': analysis_p.get('post_trend_labels', []),
                 'post_trend_values': analysis_p.get('post_trend_values', []),
                 'post_report': analysis_p.get('post_report', ''),
+                'partial_sources': sorted(set(analysis_n.get('partial_sources', [])) |
+                                          set(analysis_p.get('post_partial_sources', []))),
             }
         )
         print(f"✅ AnalysisResult - {'創建' if created else '更新'}：{identifier_display} 關鍵字")
@@ -139,14 +145,24 @@ def _save_analysis_result(analysis_n,analysis_p, history_search_instance,current
         print(f"❌ AnalysisResult 儲存失敗 ({history_search_instance.keyword}): {e}")
         return None
 
-def _batch_save_news(news_list_data, history_search_instance=None):
+def _batch_save_news(news_list_data, history_search_instance=None, partial_sources=()):
     """
     批量保存新聞列表數據。
     news_list_data: 包含多個新聞字典的列表。
     history_search_instance: HistorySearch 物件，可選。
+    partial_sources: 本次超過時間預算、只爬到部分頁面的來源，不更新其水位線。
     """
+    saved = []
     for item_data in news_list_data:
-        _save_single_news_article(item_data, history_search_instance)
+        if _save_single_news_article(item_data, history_search_instance):
+            saved.append(item_data)
+    # 更新增量爬取的水位線（只記錄真的存進資料庫的文章）。
+    # 被截斷的來源保留舊水位線：否則下次增量爬取會停在這次的前段，中間沒讀到的文章永遠補不回來
+    saved = [item for item in saved if item.get('source') not in partial_sources]
+    try:
+        update_watermarks(saved)
+    except Exception as e:
+        print(f"❌ 水位線更新失敗：{e}")
 
 def _batch_save_posts(posts_list_data, history_search_instance=None):
     """
@@ -206,125 +222,64 @@ def parse_date(date_str, as_datetime=False):
     else:
         return now.strftime("%Y-%m-%d") # 將 now 物件格式化為字串
 
-def extract_tags(text, top_k=10, use_tfidf=True):
-    """
-    從一段中文文字中擷取關鍵字詞
-    :param text: 輸入的原始文字
-    :param top_k: 最多擷取幾個關鍵字（只有在 use_tfidf=True 時生效）
-    :param use_tfidf: 是否使用 TF-IDF 權重選字（否則就是純分詞）
-    :param stopwords: 停用詞清單（可以客製）
-    :return: 字詞標籤的 list
-    """
-    stopwords = set([
-      '的', '了', '是', '我', '你', '他', '她', '它', '我們', '你們', '他們', '這', '那', '和', '與',
-      '在', '不', '有', '也', '就', '都', '很', '而', '及', '或', '被', '還', '能', '會','核稿','編輯',
-      '內容','請見','發布','訂閱','進行','根據','報導','新聞','針對','一名','發現','結果','記得',
-    ])
-    if use_tfidf:
-        # 使用 TF-IDF 抽取關鍵詞
-        tags = jieba.analyse.extract_tags(text, topK=top_k)
-    else:
-        # 基本斷詞
-        tags = jieba.lcut(text)
-
-    # 過濾標點、空字元、停用詞
-    filtered_tags = []
-    for word in tags:
-        word = word.strip()
-        if word and re.match(r'^[\u4e00-\u9fff]+$', word) and word not in stopwords:
-            filtered_tags.append(word)
+# 未輸入關鍵字時的預設搜尋條件
+def _default_news_query(keyword, days):
+    if not keyword.strip():
+        return '新聞', 5  # 若未輸入關鍵字，預設用「新聞」並只抓 5 天內
+    return keyword, days
 
-    return filtered_tags
+NEWS_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}   # 模擬瀏覽器，避免被擋爬
 
 # TVBS 新聞爬蟲
-def get_tvbs_news(keyword='', max_pages=20, days=7):
-    results = []  # 用來儲存所有符合條件的新聞資料    
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}   # 模擬瀏覽器，避免被擋爬
-    if not keyword.strip():
-        keyword = '新聞'  # 若未輸入關鍵字，預設用「新聞」
-        if keyword == '新聞':
-            days=5
-    today = datetime.now()  # 現在的時間
-    seven_days_ago = today - timedelta(days=days)  # 幾天前的時間，用來過濾過舊新聞
-     
-    for page in range(1, max_pages + 1):  # 頁數從 1 到 max_pages
-        stop_crawling = False  # 控制是否中斷爬取（遇到太舊的新聞就中斷）
-        
-        # 構造查詢頁面的 URL
-        url = f"https://news.tvbs.com.tw/news/searchresult/{keyword}/news/{page}"
-        try:
-            # 發送 GET 請求，設定 timeout 避免網路無反應時卡住
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code != 200:
-                print(f"跳過第 {page} 頁：回應錯誤 {response.status_code}")
-                continue  # 若非成功回應，就跳過這頁
-        except Exception as e:
-            print(f"連線失敗：{e}")
-            continue  # 若發生例外也跳過
-
-        # 使用 BeautifulSoup 解析 HTML
-        html = BeautifulSoup(response.text, "html.parser")
-        
-        # 找到新聞清單
-        article_list = html.find('main').find('div', class_='list').find_all('li')
-        if not article_list:
-            break  # 如果沒有新聞條目，就結束爬取
-
-        for article in article_list:
-            # 擷取日期字串
-            time_tag = article.find('div', class_='time')
-            date_str = time_tag.text.strip() if time_tag else ''
-
-            # 將日期字串轉為 datetime 物件，供篩選用
-            date_obj = parse_date(date_str, True)
-            if not date_obj or date_obj < seven_days_ago:
-                stop_crawling = True  # 發現太舊新聞，設停止旗標
-                break  # 結束目前頁面的新聞處理
-
-            # 轉換為字串形式，存入結果中
-            date = parse_date(date_str)
-
-            # 擷取新聞連結
-            a_tag = article.find('a')
-            if not a_tag:
-                continue  # 若找不到連結則略過
-
-            # 擷取新聞標題
-            title_tag = article.find('h2', class_='txt')
-            title = title_tag.text.strip() if title_tag else ''
-
-            # 擷取連結 URL
-            news_url = a_tag['href'] if a_tag.has_attr('href') else ''
-            
-            # 擷取摘要內容
-            summary_tag = article.find('div', class_='summary')
-            summary = summary_tag.text.strip() if summary_tag else ''
-
-            # 擷取標籤列表（原始是字串格式）
-            tags_raw = a_tag.get('data-news_tag', '[]')
-            tags = [tag.strip(" '") for tag in tags_raw.strip('[]').split(',')]
-
-            # 擷取新聞類別
-            category_tag = article.find('div', class_='type').find('a')
-            category = category_tag.text.strip() if category_tag else ''
-
-            # 加入結果列表
-            results.append({
-                'keyword': keyword,
-                'title': title,
-                'date': date,  
-                'summary': summary,
-                'news_tag': tags,
-                'news_url': news_url,
-                'category': category,
-                'source': 'TVBS新聞網',
-            })
+def _tvbs_page_url(keyword, page, days):
+    return f"https://news.tvbs.com.tw/news/searchresult/{keyword}/news/{page}"
 
-        if stop_crawling:
-            break  # 若設定中斷爬取，跳出外層頁數迴圈
+def _parse_tvbs_page(html_text, keyword, cutoff):
+    """
+    解析 TVBS 搜尋結果的一頁。
+    :return: (本頁新聞列表, 是否停止往後翻頁)
+    """
+    results = []
+    # 依 parse_specs.TVBS_SPEC 擷取新聞清單
+    article_list = extract_from_html(html_text, TVBS_SPEC)
+    if not article_list:
+        return results, True  # 如果沒有新聞條目，就結束爬取
+
+    for article in article_list:
+        # 將日期字串轉為 datetime 物件，供篩選用
+        date_str = article['date'] or ''
+        date_obj = parse_date(date_str, True)
+        if not date_obj or date_obj < cutoff:
+            return results, True  # 發現太舊新聞，結束爬取
+
+        # 轉換為字串形式，存入結果中
+        date = parse_date(date_str)
+
+        # 若找不到連結則略過
+        if article['link'] is None:
+            continue
+
+        # 擷取標籤列表（原始是字串格式）
+        tags_raw = article['tags'] or '[]'
+        tags = [tag.strip(" '") for tag in tags_raw.strip('[]').split(',')]
+
+        # 加入結果列表
+        results.append({
+            'keyword': keyword,
+            'title': article['title'] or '',
+            'date': date,
+            'summary': article['summary'] or '',
+            'news_tag': tags,
+            'news_url': article['link'],
+            'category': article['category'] or '',
+            'source': 'TVBS新聞網',
+        })
+    return results, False
 
-    return results  # 回傳所有結果
-# 中時新聞爬蟲(被擋)
+def get_tvbs_news(keyword='', max_pages=20, days=7):
+    keyword, days = _default_news_query(keyword, days)
+    return crawl_source(TVBS_SOURCE, keyword, days=days, max_pages=max_pages)
+# 中時新聞爬蟲(被擋，host_guard 會在連續失敗後斷路)
 def get_chdtv_news(keyword, max_pages=3):
     results = []
     for page in range(1, max_pages + 1):
@@ -332,230 +287,168 @@ def get_chdtv_news(keyword, max_pages=3):
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
         }
-        # 發送 GET 請求
-        response = requests.get(url, headers=headers)
+        # 發送 GET 請求（共用連線池）；主機斷路時直接放棄，不再逐頁等待逾時
+        try:
+            response = http_get(url, headers=headers)
+        except HostUnavailable as e:
+            print(f"⛔ 中時新聞網暫停抓取：{e}")
+            break
+        except Exception as e:
+            print(f"連線失敗：{e}")
+            continue
         if response.status_code != 200:
             continue
-        html = BeautifulSoup(response.text, "html.parser")
-
-        # 抓取新聞區塊
-        article_list = html.find('div', class_='wrapper').find('ul', class_='vertical-list list-style-none').find_all('li')
-        for article in article_list:
-            a_tag = article.find('a')
-            if not a_tag:
-                continue    
-            # 標題
-            title_tag = article.find('h3', class_='title')
-            title = title_tag.text.strip() if title_tag else ''
-
-            # 新聞連結
-            news_url = a_tag['href'] if a_tag.has_attr('href') else ''
-
-            # 發布時間
-            time_tag = article.find('span', class_='date')
-            date = time_tag.text.strip() if time_tag else ''
-
-            # 摘要
-            summary_tag = article.find('p', class_='intro')
-            summary = summary_tag.text.strip() if summary_tag else ''
-
-            # 標籤
-            tags = extract_tags(summary)
+        # 依 parse_specs.CHDTV_SPEC 抓取新聞區塊
+        for article in extract_from_html(response.text, CHDTV_SPEC):
+            if article['link'] is None:
+                continue
+            title = article['title'] or ''
+            news_url = article['link']
+            date = article['date'] or ''
+            summary = article['summary'] or ''
 
             # 加入結果
             results.append({
                 'title': title,
                 'date': parse_date(date),
                 'summary': summary,
-                'news_tag': tags,
                 'news_url': news_url,
                 'source':'中時新聞網',
             })
+    # 全部頁面抓完後一次批次斷詞（標籤與後續統計共用）
+    analyze_documents(results)
+    for item in results:
+        item['news_tag'] = item['analysis']['tags']
     return results
 # 自由時報新聞爬蟲
-def get_LTN_news(keyword='', max_pages=25, days=7):
-    results = []
-
-    if not keyword.strip():
-        keyword = '新聞'
-        if keyword == '新聞':
-            days=5
-    stop_crawling = False
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-
+def _ltn_page_url(keyword, page, days):
     end_date = datetime.today()
     start_date = end_date - timedelta(days=days)
     end_time = end_date.strftime('%Y%m%d')
     start_time = start_date.strftime('%Y%m%d')
-    for page in range(1, max_pages + 1):
-        url = f'https://search.ltn.com.tw/list?keyword={keyword}&start_time={start_time}&end_time={end_time}&sort=date&type=all&page={page}'
-        
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code != 200:
-                print(f"跳過第 {page} 頁，HTTP 錯誤：{response.status_code}")
-                continue
-        except Exception as e:
-            print(f"連線錯誤：{e}")
-            continue
-        html = BeautifulSoup(response.text, 'html.parser')
-        # print(html)
-
-        # 抓取新聞區塊
-        article_list = html.find('section',class_='Searchnews').find('div',class_='page-name').find_all('li')
-
-        for article in article_list:
-            # 發布時間
-            time_tag = article.find('span', class_='time')
-            date_str = time_tag.text.strip() if time_tag else ''
-            date_init = parse_date(date_str,True)
-            if not date_init or date_init < start_date:
-                stop_crawling = True
-                break
-            date = parse_date(date_str)
-            
-            a_tag = article.find('a')
-            if not a_tag:
-                continue    
-        
-            # 摘要
-            summary_tag = article.find('p')
-            summary = summary_tag.text.strip() if summary_tag else ''
-
-            # 標籤
-            tags = extract_tags(summary)
-            if not tags:  
-                continue
-            # 標題
-            title = a_tag['title'] if a_tag.has_attr('title') else ''
+    return f'https://search.ltn.com.tw/list?keyword={keyword}&start_time={start_time}&end_time={end_time}&sort=date&type=all&page={page}'
 
-            # 新聞連結
-            news_url = a_tag['href'] if a_tag.has_attr('href') else ''
-
-            # 類別
-            category_tag = article.find('i')
-            category = category_tag.text.strip() if category_tag else ''
-
-            # 加入結果
-            results.append({
-                'keyword': keyword,
-                'title': title,
-                'date': date,
-                'summary': summary,
-                'news_tag': tags,
-                'news_url': news_url,
-                'category': category,
-                'source':'自由時報',
-            })
-        if stop_crawling:
-            break
-    return results
-# ETtoday新聞爬蟲
-def get_ET_news(keyword='', max_pages=30, days=7):
+def _parse_ltn_page(html_text, keyword, cutoff):
+    """
+    解析自由時報搜尋結果的一頁。
+    :return: (本頁新聞列表, 是否停止往後翻頁)
+    """
     results = []
-    if not keyword.strip():
-        keyword = '新聞'
-        if keyword == '新聞':
-            days=5
-    stop_crawling = False
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-
-    today = datetime.now()  # 現在的時間
-    days_ago = today - timedelta(days=days)  # 幾天前的時間，用來過濾過舊新聞
-
-    for page in range(1, max_pages + 1):
-        url = f"https://www.ettoday.net/news_search/doSearch.php?keywords={keyword}&idx=1&page={page}"
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code != 200:
-                print(f"跳過第 {page} 頁，HTTP 錯誤：{response.status_code}")
-                continue
-        except Exception as e:
-            print(f"連線錯誤：{e}")
+    # 依 parse_specs.LTN_SPEC 擷取新聞清單
+    for article in extract_from_html(html_text, LTN_SPEC):
+        # 發布時間
+        date_str = article['date'] or ''
+        date_init = parse_date(date_str,True)
+        if not date_init or date_init < cutoff:
+            return results, True
+        date = parse_date(date_str)
+
+        if article['link'] is None:
             continue
 
-        html = BeautifulSoup(response.text, "html.parser")
+        # 加入結果（斷詞與標籤在 search_news 爬取結束後批次處理）
+        results.append({
+            'keyword': keyword,
+            'title': article['title'] or '',
+            'date': date,
+            'summary': article['summary'] or '',
+            'news_url': article['link'],
+            'category': article['category'] or '',
+            'source':'自由時報',
+        })
+    return results, False
 
-        # 根據實際網頁結構定位文章區塊
-        article_list = html.select("div.archive.clearfix")
+def get_LTN_news(keyword='', max_pages=25, days=7):
+    keyword, days = _default_news_query(keyword, days)
+    return _tag_articles(crawl_source(LTN_SOURCE, keyword, days=days, max_pages=max_pages))
+# ETtoday新聞爬蟲
+def _et_page_url(keyword, page, days):
+    return f"https://www.ettoday.net/news_search/doSearch.php?keywords={keyword}&idx=1&page={page}"
 
-        for article in article_list:
-            # 發布時間
-            time_tag = article.select_one('.date')
-            date_str = time_tag.text.strip() if time_tag else ''
-            date_init = parse_date(date_str,True)
-            if not date_init or date_init < days_ago:
-                stop_crawling = True
-                break
-            date = parse_date(date_str)
+def _parse_et_page(html_text, keyword, cutoff):
+    """
+    解析 ETtoday 搜尋結果的一頁。
+    :return: (本頁新聞列表, 是否停止往後翻頁)
+    """
+    results = []
+    # 依 parse_specs.ET_SPEC 擷取新聞清單
+    for article in extract_from_html(html_text, ET_SPEC):
+        # 發布時間
+        date_str = article['date'] or ''
+        date_init = parse_date(date_str,True)
+        if not date_init or date_init < cutoff:
+            return results, True
+        date = parse_date(date_str)
+
+        if article['link'] is None:
+            continue
 
-            a_tag = article.find("a")
-            if not a_tag:
-                continue
+        # 斷詞與標籤在 search_news 爬取結束後批次處理
+        results.append({
+            "keyword": keyword,
+            "title": article['title'] or "",
+            "date": date,
+            "summary": article['summary'] or '',
+            "news_url": article['link'],
+            "category": article['category'] or '',
+            "source": "ETtoday新聞雲",
+        })
+    return results, False
 
-            # 標題
-            title_tag = article.find("h2")
-            title = title_tag.text.strip() if title_tag else ""
+def get_ET_news(keyword='', max_pages=30, days=7):
+    keyword, days = _default_news_query(keyword, days)
+    return _tag_articles(crawl_source(ET_SOURCE, keyword, days=days, max_pages=max_pages))
 
-            # 新聞連結
-            news_url = a_tag["href"] if a_tag.has_attr("href") else ""
+# 各新聞來源的爬取規格（順序即 search_news 合併結果的順序）
+TVBS_SOURCE = NewsSource('TVBS新聞網', _tvbs_page_url, _parse_tvbs_page, max_pages=20, headers=NEWS_HEADERS)
+ET_SOURCE = NewsSource('ETtoday新聞雲', _et_page_url, _parse_et_page, max_pages=30, headers=NEWS_HEADERS)
+LTN_SOURCE = NewsSource('自由時報', _ltn_page_url, _parse_ltn_page, max_pages=25, headers=NEWS_HEADERS)
+NEWS_SOURCES = [TVBS_SOURCE, ET_SOURCE, LTN_SOURCE]
 
-            # 摘要
-            summary_tag = article.find("p")
-            summary = summary_tag.text.strip() if summary_tag else ""
+# 整合新聞文章
+def search_news(keyword, max_workers=None, source_concurrency=None, incremental=True,
+                deadline=None, partial_sources=None):
+    """
+    同時爬取所有新聞來源，結果依 NEWS_SOURCES 順序合併（與逐一爬取的順序相同）。
+    :param max_workers: 全域同時請求上限，None 時使用 crawl_engine.CRAWL_MAX_WORKERS
+    :param source_concurrency: 單一來源的頁數並行上限，整數或 {來源名稱: 上限}
+    :param incremental: 是否依水位線增量爬取，只抓上次之後的新文章，其餘從 News 表補回
+    :param deadline: Deadline 或秒數，超時的來源名稱會加入 partial_sources（set）
+    """
+    keyword, days = _default_news_query(keyword, None)
+    known_urls = {}
+    if incremental:
+        try:
+            known_urls = load_known_urls(NEWS_SOURCES, keyword)
+        except Exception as e:
+            print(f"❌ 水位線讀取失敗，改為完整爬取：{e}")
 
-            # 標籤
-            tags = extract_tags(summary)
+    def _merge_known(source, items):
+        source_days = source.days if days is None else days
+        return merge_known_articles(items, known_urls.get(source.name), keyword, source_days)
 
-            # 類別
-            category_tag = article.find('span', class_='date').find('a')
-            category = category_tag.text.strip() if category_tag else ''
+    articles = crawl_sources(NEWS_SOURCES, keyword, days=days,
+                             max_workers=max_workers, source_concurrency=source_concurrency,
+                             known_urls=known_urls, postprocess=_merge_known,
+                             deadline=deadline, partial_sources=partial_sources)
+    return _tag_articles(articles)
 
-            results.append({
-                "keyword": keyword,
-                "title": title,
-                "date": date,
-                "summary": summary,
-                "news_tag": tags,
-                "news_url": news_url,
-                "category": category,
-                "source": "ETtoday新聞雲",
-            })
-        if stop_crawling:
-            break
-    return results
-# 整合新聞文章
-def search_news(keyword):
-    articles = (
-        get_tvbs_news(keyword) +
-        get_ET_news(keyword) +
-        get_LTN_news(keyword)
-    )
-    return articles
-# 使用 SnowNLP 分析字串情緒
-def analyze_sentiment(articles):
+def _tag_articles(articles):
     """
-    :param articles: 每篇文章為 dict，需包含 summary 和 title
-    :return: 回傳原始陣列，每篇文章加入 sentiment_score 及 sentiment 標籤（正面 / 負面 / 中立）
+    爬取結束後一次批次斷詞（交給 NLP 行程池，不占用抓取執行緒），補上 news_tag。
+    從 News 表補回的文章已帶有 news_tag，只補 analysis；自由時報沿用原本的過濾，沒有標籤的文章不收。
     """
+    analyze_documents(articles)
+    results = []
     for article in articles:
-        # 先使用 summary，若為空則用 title
-        text = article['summary'] if article.get('summary') else article.get('title', '')
-        
-        s = SnowNLP(text)
-        score = s.sentiments  # 分數介於 0~1，愈接近 1 越正面，接近 0 越負面
-        article['sentiment_score'] = score
-
-        # 加入中立判斷邏輯：0~0.4 負面、0.4~0.6 中立、0.6~1 正面
-        if score >= 0.6:
-            article['sentiment'] = '正面'   # 正面
-        elif score <= 0.4:
-            article['sentiment'] = '負面'  # 負面
-        else:
-            article['sentiment'] = '中立'   # 中立
-
-    return articles
-# 計算情緒分類次數
+        if 'news_tag' not in article:
+            tags = article['analysis']['tags']
+            if not tags and article['source'] == LTN_SOURCE.name:
+                continue
+            article['news_tag'] = tags
+        results.append(article)
+    return results
+# 計算情緒分類次數（dict 版參考實作：頁面改用 ArticleBatch，此函式保留給基準測試與單元測試比對結果）
 def count_sentiment(articles):
     sentiment_count = {
         '正面': sum(1 for a in articles if a['sentiment'] == '正面'),
@@ -568,12 +461,14 @@ def get_top_words(articles, top_n=5):
     """
     :param articles: 包含 'summary' 與 'sentiment' 欄位的文章列表
     :param top_n: 每個情緒類別中顯示的前 N 名高頻詞
-    :return: dict，包含三類詞彙的 top_n 結果
+    :return: dict，包含三類詞彙的 top_n 結果，以及 all：全部文章前 top_n 名的「詞(次數)」字串（給 prompt 用）
     """
     pos_words, neg_words, neu_words = [], [], []
 
+    # 尚未分析的摘要一次送進 NLP 行程池，已分析的直接沿用 article['analysis']
+    analyze_documents(articles)
     for article in articles:
-        words = extract_tags(article['summary'])
+        words = article['analysis']['tags']
         if article['sentiment'] == '正面':
             pos_words.extend(words)
         elif article['sentiment'] == '負面':
@@ -584,9 +479,10 @@ def get_top_words(articles, top_n=5):
     return {
         'positive': Counter(pos_words).most_common(top_n),
         'negative': Counter(neg_words).most_common(top_n),
-        'neutral': Counter(neu_words).most_common(top_n)
+        'neutral': Counter(neu_words).most_common(top_n),
+        'all': [f'{word}({count})' for word, count in Counter(pos_words + neg_words + neu_words).most_common(top_n)],
     }
-# 計算情緒出現頻率
+# 計算情緒出現頻率（dict 版參考實作，同上）
 def sentiment_feq(data,col):
     stats = defaultdict(lambda: {'positive': 0, 'neutral': 0, 'negative': 0})
     for d in data:
@@ -611,7 +507,7 @@ def generate_wordcloud(tags, save_path):
     )
     wc.generate(text)
     wc.to_file(save_path)
-# 計算時間序列新聞數量
+# 計算時間序列新聞數量（dict 版參考實作，同上）
 def news_post_counter(articles):
     # 將資料整理成每日數量 dict
     daily_counts = Counter()
@@ -652,18 +548,24 @@ def call_LLM(prompt, api_key):
     response = model.generate_content(prompt)
     return response.text.strip()
 # 執行新聞所有流程
-def news_work(keyword, api_key):
+def news_work(keyword, api_key, deadline=None):
+    """
+    deadline: Deadline 或秒數，爬取階段的時間預算；超時的來源只取已抓到的部分，
+    並記錄在 analysis['partial_sources']。
+    """
     start_time = datetime.now().strftime("%Y%m%d_%H%M")
-    # 1. 搜尋與情緒分析
-    articles = analyze_sentiment(search_news(keyword))
+    partial_sources = set()
+    # 1. 搜尋與情緒分析（轉成欄狀批次，統計以向量運算完成）
+    batch = ArticleBatch(search_news(keyword, deadline=deadline, partial_sources=partial_sources), url_key='news_url')
+    articles = batch.score_sentiment()
     # 2. 計算正負情緒數量
-    sentiment_count = count_sentiment(articles)
+    sentiment_count = batch.sentiment_counts()
     # 3. 趨勢分析（各時間點的新聞數量）
-    trend_labels,trend_values = news_post_counter(articles)
+    trend_labels,trend_values = batch.daily_counts()
     # 4. 分析詞彙貢獻
     top_word = get_top_words(articles)
     # 5. 分析分類情緒
-    category_stats = sentiment_feq(articles,'category')
+    category_stats = batch.sentiment_matrix('category')
     # 6. 統計標籤詞彙製作文字雲圖
     all_tags = []
     for art in articles:
@@ -691,23 +593,51 @@ def news_work(keyword, api_key):
         'trend_labels': trend_labels,
         'trend_values': trend_values,
         'report':report,
+        'partial_sources': sorted(partial_sources),
     }
     return articles, analysis
 
-def posts_work(keyword, api_key):
+def _wait_crawler(future, name, deadline, partial_sources):
+    """
+    在時間預算內等待爬蟲結果；超時則視為部分資料（爬蟲會在背景自行結束）。
+    """
+    remaining = deadline.remaining()
+    try:
+        return future.result(timeout=None if remaining is None else remaining + DEADLINE_GRACE) or []
+    except FutureTimeout:
+        print(f"⏰ {name} 未能在時間預算內交出結果，略過")
+        partial_sources.add(name)
+    except Exception as e:
+        print(f"❌ {name} 爬取失敗：{e}")
+    return []
+
+def posts_work(keyword, api_key, deadline=None):
+    """
+    deadline: Deadline 或秒數，爬取階段的時間預算；PTT 與 Threads 同時爬取，
+    超時的來源只取已抓到的部分，並記錄在 analysis['post_partial_sources']。
+    """
     start_time = datetime.now().strftime("%Y%m%d_%H%M")
-    ptt_posts = analyze_sentiment(get_ptt_posts())
-    threads_posts = analyze_sentiment(scrape_threads_by_keyword(keyword))
-    if keyword.strip():
-        ptt_posts = ptt_keyword(keyword,ptt_posts)
-    posts = ptt_posts + threads_posts
-    sentiment_count = count_sentiment(posts)
-    trend_labels,trend_values = news_post_counter(posts)
+    deadline = Deadline.coerce(deadline)
+    partial_sources = set()
+    crawler_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='posts-crawl')
+    try:
+        # PTT 依 ptt_crawler.PTT_KEYWORD_MODE 以看板搜尋或熱門文章快照取得符合關鍵字的文章
+        ptt_future = crawler_pool.submit(get_ptt_posts_for_keyword, keyword, deadline, partial_sources)
+        threads_future = crawler_pool.submit(scrape_threads_by_keyword, keyword, deadline, partial_sources)
+        ptt_posts = _wait_crawler(ptt_future, 'PTT', deadline, partial_sources)
+        threads_posts = _wait_crawler(threads_future, 'Threads', deadline, partial_sources)
+    finally:
+        crawler_pool.shutdown(wait=False)
+    # PTT 與 Threads 合成一批，情緒一次批次計分
+    batch = ArticleBatch(ptt_posts + threads_posts, url_key='post_url')
+    posts = batch.score_sentiment()
+    sentiment_count = batch.sentiment_counts()
+    trend_labels,trend_values = batch.daily_counts()
     top_word = get_top_words(posts)
-    source_stats = sentiment_feq(posts,'source')
+    source_stats = batch.sentiment_matrix('source')
     all_tags = []
     for post in posts:
-        all_tags.extend(extract_tags(post['summary']))
+        all_tags.extend(post['analysis']['tags'])
     print('tags:',len(all_tags))
     wordcloud_path = os.path.join(BASE_DIR, 'static', 'clouds', f'p-{keyword}{start_time}.png')
     os.makedirs(os.path.dirname(wordcloud_path), exist_ok=True)
@@ -729,6 +659,7 @@ def posts_work(keyword, api_key):
         'post_trend_labels': trend_labels,
         'post_trend_values': trend_values,
         'post_report':report,
+        'post_partial_sources': sorted(partial_sources),
     }
     return posts, analysis
     
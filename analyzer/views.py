@@ -7,13 +7,18 @@ from django.utils import timezone
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.db import connection
 from django.db.models import Q
 
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 from .utils import _batch_save_news,_batch_save_posts,_save_analysis_result,news_work,posts_work
 from .rag_service import RAGService
+from .deadline import Deadline
+from .aggregates import last_days
+from .rollups import daily_sentiment, sentiment_ratio
 from .models import News, Posts, AnalysisResult, HistorySearch
 
 def user_register(request):
@@ -46,6 +51,34 @@ def user_logout(request):
 
 rag_instance = RAGService(api_key=settings.GEMINI_API_KEY)
 
+# ========= 可依需求修改的參數 =========
+HISTORY_TREND_DAYS = 30     # 歷史情緒趨勢圖涵蓋的天數
+HISTORY_RATIO_DAYS = 90     # 歷史情緒比例涵蓋的天數
+
+def _history_context(keyword):
+    """
+    資料庫累積的歷史統計（新聞＋貼文），只讀每日情緒彙總表，不受本次爬取範圍限制。
+    """
+    days = daily_sentiment(keyword, *last_days(HISTORY_TREND_DAYS))
+    ratio = sentiment_ratio(keyword, *last_days(HISTORY_RATIO_DAYS))
+    return {
+        'history_trend_days': HISTORY_TREND_DAYS,
+        'history_ratio_days': HISTORY_RATIO_DAYS,
+        'history_labels': json.dumps(list(days)),
+        'history_positive': json.dumps([cell['positive'] for cell in days.values()]),
+        'history_neutral': json.dumps([cell['neutral'] for cell in days.values()]),
+        'history_negative': json.dumps([cell['negative'] for cell in days.values()]),
+        'history_ratio': {key: round(ratio[key] * 100, 1) for key in ('positive', 'neutral', 'negative')},
+        'history_total': ratio['total'],
+    }
+
+def _posts_work_in_thread(keyword, api_key, deadline):
+    # 在背景執行緒執行 posts_work，結束時關閉此執行緒自己的資料庫連線
+    try:
+        return posts_work(keyword, api_key, deadline)
+    finally:
+        connection.close()
+
 def index(request):
     keyword_from_user = None
     is_default_search = True
@@ -169,8 +202,13 @@ def get_or_fetch_data(request, user_search_keyword=None):
 
     if should_crawl:
         print(f"資料過期或不存在 (新聞/貼文或分析結果)，正在重新爬取和分析 '{current_keyword}'...")
-        articles_to_display, analysis_n = news_work(current_keyword, settings.GEMINI_API_KEY)
-        posts_to_display,analysis_p = posts_work(current_keyword,settings.GEMINI_API_KEY)
+        # 新聞與貼文同時爬取、共用同一個爬取時間預算（只涵蓋爬取階段），超時的來源只使用已取得的部分；
+        # 情緒分析、文字雲與 Gemini 報告在各自爬取結束後進行，不會佔用另一方的爬取時間
+        deadline = Deadline(settings.CRAWL_TIME_BUDGET)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='posts-work') as posts_pool:
+            posts_future = posts_pool.submit(_posts_work_in_thread, current_keyword, settings.GEMINI_API_KEY, deadline)
+            articles_to_display, analysis_n = news_work(current_keyword, settings.GEMINI_API_KEY, deadline)
+            posts_to_display,analysis_p = posts_future.result()
         # 把文章存進快取，供 RAG 使用
         #rag_instance = RAGService(api_key=settings.GEMINI_API_KEY)
         cache_key = f"rag_articles_{request.session.session_key}"
@@ -179,7 +217,7 @@ def get_or_fetch_data(request, user_search_keyword=None):
         
         # --- 4. 儲存到資料庫 (News, Posts, AnalysisResult) ---
         # 批量儲存新聞
-        _batch_save_news(articles_to_display, history_search_instance)
+        _batch_save_news(articles_to_display, history_search_instance, analysis_n.get('partial_sources', []))
         # 批量儲存貼文
         _batch_save_posts(posts_to_display, history_search_instance)
 
@@ -215,7 +253,7 @@ def get_or_fetch_data(request, user_search_keyword=None):
         # 如果 analysis_result 仍然是 None（雖然理論上現在 should_crawl=False 時，它應該不會是 None），
         # 則從 news_work 獲取一個臨時的字典用於顯示。
         if analysis_result is None:
-            _, temp_analysis_dict = news_work(current_keyword, settings.GEMINI_API_KEY)
+            _, temp_analysis_dict = news_work(current_keyword, settings.GEMINI_API_KEY, settings.CRAWL_TIME_BUDGET)
             analysis_result = temp_analysis_dict
             print(f"為'{current_keyword}'獲取臨時分析結果以供顯示 (因資料庫無近期記錄)。")
 
@@ -243,7 +281,9 @@ def get_or_fetch_data(request, user_search_keyword=None):
         'post_trend_labels': getattr(analysis_result , 'trend_labels', analysis_result .get('trend_labels', []) if isinstance(analysis_result , dict) else []),
         'post_trend_values': getattr(analysis_result , 'post_trend_values', analysis_result .get('post_trend_values', []) if isinstance(analysis_result , dict) else []),
         'post_report': getattr(analysis_result , 'post_report', analysis_result .get('post_report', '') if isinstance(analysis_result , dict) else ''),
+        'partial_sources': getattr(analysis_result , 'partial_sources', analysis_result .get('partial_sources', []) if isinstance(analysis_result , dict) else []),
     }
+    context.update(_history_context(current_keyword))
     
     return context
 
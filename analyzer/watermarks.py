@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import News, CrawlWatermark
+
+# ========= 可依需求修改的參數 =========
+MAX_KNOWN_URLS = 500    # 每個 (來源, 關鍵字) 最多記住幾個已儲存的網址
+
+
+def load_known_urls(sources, keyword):
+    """
+    讀取各來源在此關鍵字下的水位線。
+    :return: {來源名稱: 已儲存的網址集合}，沒有水位線的來源不會出現在結果中
+    """
+    names = [source.name for source in sources]
+    known = {}
+    for mark in CrawlWatermark.objects.filter(keyword=keyword, source__in=names):
+        if mark.known_urls:
+            known[mark.source] = set(mark.known_urls)
+    return known
+
+
+def _news_to_article(news_item, keyword):
+    return {
+        'keyword': keyword,
+        'title': news_item.title,
+        'date': timezone.localtime(news_item.publish_date).strftime('%Y-%m-%d'),
+        'summary': news_item.summary,
+        'news_tag': news_item.tags,
+        'news_url': news_item.url,
+        'category': news_item.category,
+        'source': news_item.source,
+        'sentiment': news_item.sentiment,
+        'sentiment_score': news_item.sentiment_score,
+    }
+
+
+def merge_known_articles(delta, known_urls, keyword, days):
+    """
+    把增量爬到的新文章與資料庫中已知、且仍在時間範圍內的文章合併，
+    讓下游分析拿到的仍是完整的 N 天資料。新文章在前，已知文章依發布日期新到舊排列。
+    """
+    if not known_urls:
+        return delta
+    cutoff = timezone.make_aware(datetime.now() - timedelta(days=days))
+    delta_urls = {item['news_url'] for item in delta}
+    stored = News.objects.filter(
+        url__in=[url for url in known_urls if url not in delta_urls],
+        publish_date__gte=cutoff,
+    ).order_by('-publish_date')
+    merged = delta + [_news_to_article(news_item, keyword) for news_item in stored]
+    print(f"💧 增量爬取：新文章 {len(delta)} 篇，沿用已儲存 {len(merged) - len(delta)} 篇")
+    return merged
+
+
+def update_watermarks(articles):
+    """
+    在新聞存進 News 表之後更新水位線。
+    articles 需為已成功儲存的文章，並維持爬取順序（新到舊）。
+    """
+    groups = {}
+    for article in articles:
+        key = (article.get('source', ''), article.get('keyword', '新聞'))
+        groups.setdefault(key, []).append(article)
+
+    for (source, keyword), items in groups.items():
+        urls = list(dict.fromkeys(item['news_url'] for item in items if item.get('news_url')))
+        CrawlWatermark.objects.update_or_create(
+            source=source,
+            keyword=keyword,
+            defaults={
+                'known_urls': urls[:MAX_KNOWN_URLS],
+            }
+        )